@@ -0,0 +1,204 @@
+from RequestsPlus.AsyncRequestsPlus import *
+from .CanvasAPI import CanvasAPI, DEFAULT_PER_PAGE
+from .ObjectCache import cachedObjects
+from .models import CanvasObject, makeCanvasObjects, Course, Assignment, User, OutcomeLink
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class AsyncCanvasAPI(AsyncRequestsPlus):
+    """
+    Coroutine versions of the CanvasAPI "get*Objects" methods.  They return
+    the same objects and records as CanvasAPI, but many of them may be awaited at
+    the same time on one event loop.  The same objects are kept in the object
+    cache, so a CanvasObjectCache may be shared with a CanvasAPI object.
+    """
+    _QueryURIs = CanvasAPI._QueryURIs
+
+    def __init__(self, apiBaseURL, contentType=MIME_TYPE_JSON, authZToken=None, authZType=AUTHZ_TYPE_BEARER,
+                 connectionLimit=DEFAULT_CONNECTION_LIMIT, perPage=DEFAULT_PER_PAGE, httpCache=None,
+                 objectCache=None, rateLimitGovernor=None, retryPolicy=None, metricsRegistry=None):
+        """
+        Set up AsyncCanvasAPI with the required authorization information
+
+        :param apiBaseURL: Base URL for the Canvas API, usually "https://school.instructure.com/api/v1/"
+        :type apiBaseURL: str
+        :param contentType: MIME type value for "Content-Type" request header
+        :type contentType: str
+        :param authZToken: Token part of "Authorization" request header
+        :type authZToken: str
+        :param authZType: Type part of "Authotization" request header
+        :type authZType: str
+        :param connectionLimit: Maximum number of connections to Canvas open at the same time
+        :type connectionLimit: int
+        :param perPage: Number of items to request in each page of paginated responses
+        :type perPage: int
+        :param httpCache: (optional) Cache for revalidating GET responses with conditional requests
+        :type httpCache: HTTPCache
+        :param objectCache: (optional) Cache of slowly changing objects, kept between runs
+        :type objectCache: CanvasObjectCache
+        :param rateLimitGovernor: (optional) Keeps requests within Canvas' rate limit
+        :type rateLimitGovernor: RateLimitGovernor
+        :param retryPolicy: (optional) Decides which failed requests are sent again
+        :type retryPolicy: RetryPolicy
+        :param metricsRegistry: (optional) Metrics of every request sent, labeled by endpoint
+        :type metricsRegistry: metrics.MetricsRegistry
+        :rtype: AsyncCanvasAPI
+        """
+
+        super(AsyncCanvasAPI, self).__init__(
+            apiBaseURL, contentType=contentType, authZToken=authZToken, authZType=authZType,
+            connectionLimit=connectionLimit, httpCache=httpCache, rateLimitGovernor=rateLimitGovernor,
+            retryPolicy=retryPolicy, metricsRegistry=metricsRegistry,
+            endpointTemplates=CanvasAPI.getQueryURITemplates()
+        )
+        self.perPage = perPage
+        self.objectCache = objectCache
+
+    def jsonObjectHook(self, jsonObject):
+        return CanvasObject(**jsonObject)
+
+    @cachedObjects('OUTCOMES')
+    async def getOutcomeObject(self, outcomeID):
+        """
+        Get Canvas Outcome object as CanvasObject parsed from JSON
+
+        :param outcomeID: ID number of the Canvas Outcome object to be retrieved
+        :type outcomeID: int
+        :return: An object representing the Canvas Outcome contained in the API response
+        :rtype: CanvasObject
+        """
+        assert type(outcomeID) is int
+
+        queryURI = self._QueryURIs.OUTCOMES.format(outcomeID=outcomeID)
+        return makeCanvasObjects(await self.getJSON(queryURI))
+
+    @cachedObjects('COURSES_OUTCOME_GROUP_LINKS', OutcomeLink)
+    async def getCoursesOutcomeGroupLinksObjects(self, courseID, fields=None):
+        """
+        Get Canvas Outcome Group objects as OutcomeLink records parsed from JSON
+
+        :param courseID: ID number of the Canvas Course object to find Outcome Group objects
+        :type courseID: int
+        :param fields: (optional) Names of the attributes to keep.  By default, OutcomeLink.FIELDS.
+        :type fields: iterable of str
+        :return: Objects representing the Canvas Outcome Groups from all response pages
+        :rtype: list of OutcomeLink
+        """
+        assert type(courseID) is int
+
+        queryURI = self._QueryURIs.COURSES_OUTCOME_GROUP_LINKS.format(courseID=courseID)
+        return OutcomeLink.fromJSONList(await self.getAllPagesJSON(queryURI, params={'per_page': self.perPage}),
+                                        fields)
+
+    async def getCoursesAssignmentsObjects(self, courseID, fields=None):
+        """
+        Get Canvas Assignment objects as Assignment records parsed from JSON
+
+        :param courseID: ID number of the Canvas Course object to find Assignment objects
+        :type courseID: int
+        :param fields: (optional) Names of the attributes to keep.  By default, Assignment.FIELDS.
+        :type fields: iterable of str
+        :return: Objects representing the Canvas Assignments from all response pages
+        :rtype: list of Assignment
+        """
+        assert type(courseID) is int
+
+        queryURI = self._QueryURIs.COURSES_ASSIGNMENTS.format(courseID=courseID)
+        return Assignment.fromJSONList(await self.getAllPagesJSON(queryURI, params={'per_page': self.perPage}),
+                                       fields)
+
+    async def getCoursesUsersObjects(self, courseID, enrollmentType=None, fields=None, **kwargs):
+        """
+        Get Canvas User objects as User records parsed from JSON
+
+        :param courseID: ID number of the Canvas Course object to find User objects
+        :type courseID: int
+        :param enrollmentType: (optional) Canvas user enrollment type: 'student', 'teacher', etc.
+        :type enrollmentType: str
+        :param fields: (optional) Names of the attributes to keep.  By default, User.FIELDS.
+        :type fields: iterable of str
+        :return: Objects representing the Canvas Users from all response pages
+        :rtype: list of User
+        """
+        assert type(courseID) is int
+
+        if enrollmentType:
+            if not isinstance(enrollmentType, str):
+                raise TypeError('enrollmentType must be string')
+            if 'enrollment_type' not in kwargs:
+                kwargs['enrollment_type'] = str(enrollmentType)
+
+        kwargs.setdefault('per_page', self.perPage)
+
+        queryURI = self._QueryURIs.COURSES_USERS.format(courseID=courseID)
+        return User.fromJSONList(await self.getAllPagesJSON(queryURI, params=kwargs), fields)
+
+    async def getCoursesUsersAndInstructorsObjects(self, courseID, fields=None, **kwargs):
+        """
+        Get all of a course's Canvas User objects and, separately, those of its instructors,
+        like CanvasAPI.getCoursesUsersAndInstructorsObjects().
+
+        :param courseID: ID number of the Canvas Course object to find User objects
+        :type courseID: int
+        :param fields: (optional) Names of the attributes to keep.  By default, User.FIELDS.
+            "enrollments" is always kept.
+        :type fields: iterable of str
+        :return: Objects representing all of the Canvas Users in the course, and the
+            instructors among them
+        :rtype: (list of User, list of User)
+        """
+        assert type(courseID) is int
+
+        include = kwargs.get('include[]', [])
+        include = [include] if isinstance(include, str) else list(include)
+        if 'enrollments' not in include:
+            include.append('enrollments')
+
+        # aiohttp takes repeated parameters as a list of pairs.
+        params = [(name, value) for (name, value) in kwargs.items() if name != 'include[]']
+        params.extend(('include[]', value) for value in include)
+        params.append(('per_page', self.perPage))
+
+        queryURI = self._QueryURIs.COURSES_USERS.format(courseID=courseID)
+        if fields is not None and 'enrollments' not in fields:
+            fields = tuple(fields) + ('enrollments',)
+        coursesUsers = User.fromJSONList(await self.getAllPagesJSON(queryURI, params=params), fields)
+
+        return coursesUsers, CanvasAPI.getInstructors(coursesUsers)
+
+    @cachedObjects('COURSES_PAGES_BY_NAME')
+    async def getCoursesPagesByNameObjects(self, courseID, pageName, **kwargs):
+        """
+        Get Canvas Page objects as CanvasObjects parsed from JSON
+
+        :param courseID: ID number of the Canvas Course object to find the Page
+        :type courseID: int
+        :param pageName: Name of the page, as found in its URL
+        :type pageName: str
+        :return: Objects representing the Canvas Pages from all response pages
+        :rtype: list of CanvasObject
+        """
+        assert isinstance(courseID, int)
+        assert isinstance(pageName, str)
+
+        queryURI = self._QueryURIs.COURSES_PAGES_BY_NAME.format(courseID=courseID, pageName=pageName)
+        return makeCanvasObjects(await self.getAllPagesJSON(queryURI, params=kwargs))
+
+    @cachedObjects('COURSES', Course)
+    async def getCourseObject(self, courseID, fields=None):
+        """
+        Get Canvas Course object as Course record parsed from JSON
+
+        :param courseID: ID number of the Canvas Course object to be retrieved
+        :type courseID: int
+        :param fields: (optional) Names of the attributes to keep.  By default, Course.FIELDS.
+        :type fields: iterable of str
+        :return: An object representing the Canvas Course contained in the API response
+        :rtype: Course
+        """
+        assert type(courseID) is int
+
+        queryURI = self._QueryURIs.COURSES.format(courseID=courseID)
+        return Course.fromJSON(await self.getJSON(queryURI), fields)
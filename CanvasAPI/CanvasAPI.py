@@ -1,9 +1,18 @@
 from RequestsPlus import *
-from .models import CanvasObject
+from .models import CanvasObject, makeCanvasObjects, Course, Assignment, User, OutcomeLink
+from .ObjectCache import cachedObjects
+from .graphQL import COURSE_DATA_QUERY, ASSIGNMENTS_CONNECTION, ENROLLMENTS_CONNECTION, courseJSON, \
+    assignmentJSON, usersJSON
 
 import logging
 logger = logging.getLogger(__name__)
 
+# Canvas won't return more than 100 items per page, no matter how many are requested.
+DEFAULT_PER_PAGE = 100
+
+ENROLLMENT_TYPE_TEACHER = 'TeacherEnrollment'  #: Enrollment "type" of users matched by enrollment_type=teacher
+
+
 class CanvasAPI(RequestsPlus):
     class _QueryURIs(object):
         COURSES = '/courses/{courseID}'  #: Get a single Course by ID
@@ -13,8 +22,12 @@ class CanvasAPI(RequestsPlus):
         COURSES_ASSIGNMENTS = '/courses/{courseID}/assignments'
         COURSES_USERS = '/courses/{courseID}/users'
         COURSES_PAGES_BY_NAME = '/courses/{courseID}/pages/{pageName}'
+        GRAPHQL = '../graphql'  #: Canvas GraphQL API, beside the REST API
 
-    def __init__(self, apiBaseURL, contentType=MIME_TYPE_JSON, authZToken=None, authZType=AUTHZ_TYPE_BEARER):
+    def __init__(self, apiBaseURL, contentType=MIME_TYPE_JSON, authZToken=None, authZType=AUTHZ_TYPE_BEARER,
+                 perPage=DEFAULT_PER_PAGE, pageWorkerCount=1, httpCache=None, objectCache=None,
+                 rateLimitGovernor=None, retryPolicy=None, poolHostCount=DEFAULT_POOL_HOST_COUNT,
+                 poolMaxSize=DEFAULT_POOL_MAX_SIZE, keepAlive=True, metricsRegistry=None):
         """
         Set up CanvasAPI with the required authorization information
 
@@ -26,12 +39,45 @@ class CanvasAPI(RequestsPlus):
         :type authZToken: str
         :param authZType: Type part of "Authotization" request header
         :type authZType: str
+        :param perPage: Number of items to request in each page of paginated responses
+        :type perPage: int
+        :param pageWorkerCount: Number of response pages that may be requested at the same time
+        :type pageWorkerCount: int
+        :param httpCache: (optional) Cache for revalidating GET responses with conditional requests
+        :type httpCache: HTTPCache
+        :param objectCache: (optional) Cache of slowly changing objects, kept between runs
+        :type objectCache: CanvasObjectCache
+        :param rateLimitGovernor: (optional) Keeps requests within Canvas' rate limit
+        :type rateLimitGovernor: RateLimitGovernor
+        :param retryPolicy: (optional) Decides which failed requests are sent again
+        :type retryPolicy: RetryPolicy
+        :param poolHostCount: Number of hosts whose connections are kept in the pool
+        :type poolHostCount: int
+        :param poolMaxSize: Number of connections kept in the pool for each host
+        :type poolMaxSize: int
+        :param keepAlive: If False, every connection is closed after one request
+        :type keepAlive: bool
+        :param metricsRegistry: (optional) Metrics of every request sent, labeled by its _QueryURIs template
+        :type metricsRegistry: metrics.MetricsRegistry
         :rtype: CanvasAPI
         """
 
         super(CanvasAPI, self).__init__(
-            apiBaseURL, contentType=contentType, authZToken=authZToken, authZType=authZType
+            apiBaseURL, contentType=contentType, authZToken=authZToken, authZType=authZType,
+            pageWorkerCount=pageWorkerCount, httpCache=httpCache, rateLimitGovernor=rateLimitGovernor,
+            retryPolicy=retryPolicy, poolHostCount=poolHostCount, poolMaxSize=poolMaxSize, keepAlive=keepAlive,
+            metricsRegistry=metricsRegistry, endpointTemplates=self.getQueryURITemplates()
         )
+        self.perPage = perPage
+        self.objectCache = objectCache
+
+    @classmethod
+    def getQueryURITemplates(cls):
+        """
+        :return: URI templates of the Canvas API endpoints used
+        :rtype: list of str
+        """
+        return [template for (name, template) in sorted(vars(cls._QueryURIs).items()) if not name.startswith('_')]
 
     def jsonObjectHook(self, jsonObject):
         return CanvasObject(**jsonObject)
@@ -52,6 +98,7 @@ class CanvasAPI(RequestsPlus):
 
         return outcomeResponse
 
+    @cachedObjects('OUTCOMES')
     def getOutcomeObject(self, outcomeID):
         """
         Get Canvas Outcome object as CanvasObject parsed from JSON
@@ -68,7 +115,7 @@ class CanvasAPI(RequestsPlus):
         outcomeResponse = self.getOutcome(outcomeID)
         if outcomeResponse.ok:
             outcomeObjects = self.responseCollection(outcomeResponse) \
-                .jsonObjects(object_hook=self.jsonObjectHook)
+                .jsonObjects(objectsFactory=makeCanvasObjects)
 
             outcomeObjectCount = len(outcomeObjects)
 
@@ -96,27 +143,30 @@ class CanvasAPI(RequestsPlus):
         assert type(courseID) is int
 
         queryURI = self._QueryURIs.COURSES_OUTCOME_GROUP_LINKS.format(courseID=courseID)
-        response = self.get(queryURI)
+        response = self.get(queryURI, params={'per_page': self.perPage})
 
         return response
 
-    def getCoursesOutcomeGroupLinksObjects(self, courseID):
+    @cachedObjects('COURSES_OUTCOME_GROUP_LINKS', OutcomeLink)
+    def getCoursesOutcomeGroupLinksObjects(self, courseID, fields=None):
         """
-        Get Canvas Outcome Group objects as CanvasObjects parsed from JSON
+        Get Canvas Outcome Group objects as OutcomeLink records parsed from JSON
 
         :param courseID: ID number of the Canvas Course object to find Outcome Group objects
         :type courseID: int
+        :param fields: (optional) Names of the attributes to keep.  By default, OutcomeLink.FIELDS.
+        :type fields: iterable of str
         :return: An object representing the Canvas Outcome Groups contained
             in the API response, otherwise :class:`None<None>`
-        :rtype: CanvasObject
+        :rtype: list of OutcomeLink
         """
         assert type(courseID) is int
 
         courseOutcomeGroupLinks = None
         response = self.getCoursesOutcomeGroupLinks(courseID)
         if response.ok:
-            courseOutcomeGroupLinks = self.responseCollection(response).collectAllResponsePages() \
-                .jsonObjects(object_hook=self.jsonObjectHook)
+            courseOutcomeGroupLinks = OutcomeLink.fromJSONList(
+                self.responseCollection(response).collectAllResponsePages().json(), fields)
 
         return courseOutcomeGroupLinks
 
@@ -132,30 +182,51 @@ class CanvasAPI(RequestsPlus):
         assert type(courseID) is int
 
         queryURI = self._QueryURIs.COURSES_ASSIGNMENTS.format(courseID=courseID)
-        response = self.get(queryURI)
+        response = self.get(queryURI, params={'per_page': self.perPage})
 
         return response
 
-    def getCoursesAssignmentsObjects(self, courseID):
+    def getCoursesAssignmentsObjects(self, courseID, fields=None):
         """
-        Get Canvas Assignment objects as CanvasObjects parsed from JSON
+        Get Canvas Assignment objects as Assignment records parsed from JSON
 
         :param courseID: ID number of the Canvas Course object to find Assignment objects
         :type courseID: int
+        :param fields: (optional) Names of the attributes to keep.  By default, Assignment.FIELDS.
+        :type fields: iterable of str
         :return: An object representing the Canvas Assignments contained
             in the API response, otherwise :class:`None<None>`
-        :rtype: CanvasObject
+        :rtype: list of Assignment
         """
         assert type(courseID) is int
 
         coursesAssignments = None
         response = self.getCoursesAssignments(courseID)
         if response.ok:
-            coursesAssignments = self.responseCollection(response).collectAllResponsePages() \
-                .jsonObjects(object_hook=self.jsonObjectHook)
+            coursesAssignments = Assignment.fromJSONList(
+                self.responseCollection(response).collectAllResponsePages().json(), fields)
 
         return coursesAssignments
 
+    def iterCoursesAssignments(self, courseID, fields=None):
+        """
+        Generator of Canvas Assignment objects as Assignment records parsed from JSON.
+        Each response page is requested only when the previous one has been used up.
+
+        :param courseID: ID number of the Canvas Course object to find Assignment objects
+        :type courseID: int
+        :param fields: (optional) Names of the attributes to keep.  By default, Assignment.FIELDS.
+        :type fields: iterable of str
+        :return: Objects representing the Canvas Assignments contained in the API responses
+        :rtype: generator of Assignment
+        """
+        assert type(courseID) is int
+
+        response = self.getCoursesAssignments(courseID)
+        if response.ok:
+            for courseAssignment in self.responseCollection(response).iterJSON():
+                yield Assignment.fromJSON(courseAssignment, fields)
+
     def getCoursesUsers(self, courseID, enrollmentType=None, **kwargs):
         """
         Get Canvas Users objects as requests Response object.  May be one of multiple pages.
@@ -175,33 +246,82 @@ class CanvasAPI(RequestsPlus):
             if 'enrollment_type' not in kwargs:
                 kwargs['enrollment_type'] = str(enrollmentType)
 
+        kwargs.setdefault('per_page', self.perPage)
+
         queryURI = self._QueryURIs.COURSES_USERS.format(courseID=courseID)
         response = self.get(queryURI, params=kwargs)
 
         return response
 
-    def getCoursesUsersObjects(self, courseID, enrollmentType=None, **kwargs):
+    def getCoursesUsersObjects(self, courseID, enrollmentType=None, fields=None, **kwargs):
         """
-        Get Canvas User objects as CanvasObjects parsed from JSON
+        Get Canvas User objects as User records parsed from JSON
 
         :param courseID: ID number of the Canvas Course object to find User objects
         :type courseID: int
         :param enrollmentType:
         :type enrollmentType: str
+        :param fields: (optional) Names of the attributes to keep.  By default, User.FIELDS.
+        :type fields: iterable of str
         :return: An object representing the Canvas Users contained
             in the API response, otherwise :class:`None<None>`
-        :rtype: CanvasObject
+        :rtype: list of User
         """
         assert type(courseID) is int
 
         coursesUsers = None
         response = self.getCoursesUsers(courseID, enrollmentType=enrollmentType, **kwargs)
         if response.ok:
-            coursesUsers = self.responseCollection(response).collectAllResponsePages() \
-                .jsonObjects(object_hook=self.jsonObjectHook)
+            coursesUsers = User.fromJSONList(
+                self.responseCollection(response).collectAllResponsePages().json(), fields)
 
         return coursesUsers
 
+    def getCoursesUsersAndInstructorsObjects(self, courseID, fields=None, **kwargs):
+        """
+        Get all of a course's Canvas User objects and, separately, those of its instructors.
+        The users are requested only once, including their enrollments in the course, which
+        are used to pick out the instructors.
+
+        :param courseID: ID number of the Canvas Course object to find User objects
+        :type courseID: int
+        :param fields: (optional) Names of the attributes to keep.  By default, User.FIELDS.
+            "enrollments" is always kept.
+        :type fields: iterable of str
+        :return: Objects representing all of the Canvas Users in the course, and the
+            instructors among them, otherwise :class:`None<None>` for both
+        :rtype: (list of User, list of User)
+        """
+        assert type(courseID) is int
+
+        include = kwargs.get('include[]', [])
+        include = [include] if isinstance(include, str) else list(include)
+        if 'enrollments' not in include:
+            include.append('enrollments')
+        kwargs['include[]'] = include
+
+        if fields is not None and 'enrollments' not in fields:
+            fields = tuple(fields) + ('enrollments',)
+
+        coursesUsers = self.getCoursesUsersObjects(courseID, fields=fields, **kwargs)
+        if coursesUsers is None:
+            return None, None
+
+        return coursesUsers, self.getInstructors(coursesUsers)
+
+    @staticmethod
+    def getInstructors(users):
+        """
+        Pick out the instructors from User objects that include their enrollments.
+
+        :param users: Objects representing Canvas Users, with their "enrollments"
+        :type users: list of User
+        :return: Objects representing the Canvas Users with teacher enrollments
+        :rtype: list of User
+        """
+        return [user for user in users
+                if any(enrollment.type == ENROLLMENT_TYPE_TEACHER for enrollment in user.enrollments or [])]
+
     def getCoursesPagesByName(self, courseID, pageName, **kwargs):
         """
         Get Canvas Users objects as requests Response object.  May be one of multiple pages.
@@ -221,6 +341,7 @@ class CanvasAPI(RequestsPlus):
 
         return response
 
+    @cachedObjects('COURSES_PAGES_BY_NAME')
     def getCoursesPagesByNameObjects(self, courseID, pageName, **kwargs):
         """
         Get Canvas User objects as CanvasObjects parsed from JSON
@@ -240,7 +361,7 @@ class CanvasAPI(RequestsPlus):
         response = self.getCoursesPagesByName(courseID, pageName, **kwargs)
         if response.ok:
             coursesPages = self.responseCollection(response).collectAllResponsePages() \
-                .jsonObjects(object_hook=self.jsonObjectHook)
+                .jsonObjects(objectsFactory=makeCanvasObjects)
 
         return coursesPages
 
@@ -260,23 +381,25 @@ class CanvasAPI(RequestsPlus):
 
         return response
 
-    def getCourseObject(self, courseID):
+    @cachedObjects('COURSES', Course)
+    def getCourseObject(self, courseID, fields=None):
         """
-        Get Canvas Course object as CanvasObject parsed from JSON
+        Get Canvas Course object as Course record parsed from JSON
 
         :param courseID: ID number of the Canvas Course object to find User objects
         :type courseID: int
+        :param fields: (optional) Names of the attributes to keep.  By default, Course.FIELDS.
+        :type fields: iterable of str
         :return: An object representing the Canvas Users contained
             in the API response, otherwise :class:`None<None>`
-        :rtype: CanvasObject
+        :rtype: Course
         """
         assert type(courseID) is int
 
         course = None
         response = self.getCourse(courseID)
         if response.ok:
-            courseObjects = self.responseCollection(response) \
-                .jsonObjects(object_hook=self.jsonObjectHook)
+            courseObjects = Course.fromJSONList(self.responseCollection(response).json(), fields)
 
             courseCount = len(courseObjects)
 
@@ -291,3 +414,106 @@ class CanvasAPI(RequestsPlus):
                 course = courseObjects.pop()
 
         return course
+
+    def postGraphQL(self, query, variables=None):
+        """
+        Send a query to the Canvas GraphQL API.
+
+        :param query: GraphQL query document
+        :type query: str
+        :param variables: (optional) Values of the query's variables
+        :type variables: dict
+        :return: The "data" part of the result
+        :rtype: dict
+        :raises RuntimeError: If there is no response, or the result has errors
+        """
+        response = self.post(self._QueryURIs.GRAPHQL, json={'query': query, 'variables': variables or {}})
+
+        if response is None:
+            raise RuntimeError('No response for GraphQL query')
+
+        if not response.ok:
+            raise RuntimeError('Error {response.status_code} "{response.reason}" for GraphQL query'
+                               .format(**locals()))
+
+        result = decodeResponseJSON(response)
+        if result.get('errors'):
+            raise RuntimeError('Errors in GraphQL result: {}'.format(
+                '; '.join(error.get('message', str(error)) for error in result['errors'])))
+
+        return result.get('data') or {}
+
+    def getCourseDataObjects(self, courseID, courseFields=None, assignmentFields=None, userFields=None):
+        """
+        Get a course, its assignments, and its users with their enrollments using the
+        GraphQL API.  The first request gets all of them, up to perPage assignments and
+        enrollments.  Only if there are more, further requests get the next pages of
+        just the assignments and/or enrollments.
+
+        The records are like those made from the REST API by getCourseObject(),
+        getCoursesAssignmentsObjects(), and getCoursesUsersAndInstructorsObjects().
+        Assignment rubrics only include the "outcome_id" of their criteria.  GraphQL
+        has no SIS login ID, so users' "sis_login_id" is their login ID (see usersJSON()).
+
+        :param courseID: ID number of the Canvas Course
+        :type courseID: int
+        :param courseFields: (optional) Names of the Course attributes to keep
+        :type courseFields: iterable of str
+        :param assignmentFields: (optional) Names of the Assignment attributes to keep
+        :type assignmentFields: iterable of str
+        :param userFields: (optional) Names of the User attributes to keep.  Keep "enrollments"
+            to pick out the instructors with getInstructors().
+        :type userFields: iterable of str
+        :return: The course, its assignments and its users, otherwise :class:`None<None>`
+            if the course wasn't found
+        :rtype: (Course, list of Assignment, list of User) or None
+        :raises RuntimeError: If a response has a next page without a new cursor for it
+        """
+        assert type(courseID) is int
+
+        variables = {
+            'courseID': str(courseID),
+            'pageSize': self.perPage,
+            'withCourse': True,
+            'withAssignments': True,
+            'assignmentsCursor': None,
+            'withEnrollments': True,
+            'enrollmentsCursor': None,
+        }
+        connections = (
+            (ASSIGNMENTS_CONNECTION, 'withAssignments', 'assignmentsCursor', []),
+            (ENROLLMENTS_CONNECTION, 'withEnrollments', 'enrollmentsCursor', []),
+        )
+
+        courseNode = None
+        while courseNode is None or any(variables[includeName] for (_, includeName, _, _) in connections):
+            courseNodePage = self.postGraphQL(COURSE_DATA_QUERY, variables).get('course')
+            if courseNodePage is None:
+                logger.info('log: successful GraphQL response, but no course returned for ID: {}.'
+                            .format(courseID))
+                return None
+
+            courseNode = courseNode or courseNodePage
+            variables['withCourse'] = False
+
+            for (connectionName, includeName, cursorName, nodes) in connections:
+                if not variables[includeName]:
+                    continue
+                connection = courseNodePage.get(connectionName) or {}
+                nodes.extend(connection.get('nodes') or [])
+                pageInfo = connection.get('pageInfo') or {}
+                hasNextPage = bool(pageInfo.get('hasNextPage'))
+                endCursor = pageInfo.get('endCursor')
+                # Requesting the same page again would never end.
+                if hasNextPage and (endCursor is None or endCursor == variables[cursorName]):
+                    raise RuntimeError('GraphQL {connectionName} of course {courseID} has a next page, but no new '
+                                       'cursor for it (endCursor: {endCursor!r})'.format(**locals()))
+                variables[includeName] = hasNextPage
+                variables[cursorName] = endCursor
+
+        ((_, _, _, assignmentNodes), (_, _, _, enrollmentNodes)) = connections
+
+        return (Course.fromJSON(courseJSON(courseNode), courseFields),
+                Assignment.fromJSONList([assignmentJSON(assignmentNode, courseID)
+                                         for assignmentNode in assignmentNodes], assignmentFields),
+                User.fromJSONList(usersJSON(enrollmentNodes, courseID), userFields))
@@ -0,0 +1,178 @@
+# Cache of CanvasObjects that change slowly enough to be reused between runs.
+
+import functools
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+from .models import CanvasObject, CanvasRecord
+
+
+def _toJSONValue(canvasObject):
+    if isinstance(canvasObject, CanvasRecord):
+        return canvasObject.toJSON()
+    return vars(canvasObject)
+
+
+class CanvasObjectCache(object):
+    """
+    The :class:`CanvasObjectCache<CanvasAPI.CanvasObjectCache>` object keeps
+    CanvasObjects in a SQLite database, so they survive from one run to the
+    next.  Each kind of object (named like the CanvasAPI._QueryURIs attributes,
+    e.g. "COURSES") has its own time to live.  Kinds without a time to live
+    aren't cached.
+    """
+
+    def __init__(self, databasePath, timesToLive, refresh=False):
+        """
+        :param databasePath: Path of the SQLite database file.  Created if needed.
+        :type databasePath: str
+        :param timesToLive: Number of seconds objects may be reused, keyed by kind
+        :type timesToLive: dict
+        :param refresh: If True, don't use any cached objects, but store new ones
+        :type refresh: bool
+        """
+        databaseDirectory = os.path.dirname(databasePath)
+        if databaseDirectory:
+            os.makedirs(databaseDirectory, exist_ok=True)
+
+        self.timesToLive = timesToLive
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(databasePath, timeout=30, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS canvas_objects ('
+                                     'kind TEXT NOT NULL, key TEXT NOT NULL, stored_at REAL NOT NULL, '
+                                     'value TEXT NOT NULL, PRIMARY KEY (kind, key))')
+        self.removeExpired()
+
+    def _isExpired(self, kind, storedAt, now):
+        return storedAt + self.timesToLive.get(kind, 0) < now
+
+    def removeExpired(self):
+        """
+        Remove objects which can no longer be used.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            rows = self._connection.execute('SELECT kind, key, stored_at FROM canvas_objects').fetchall()
+            expiredRows = [(kind, key) for (kind, key, storedAt) in rows if self._isExpired(kind, storedAt, now)]
+            self._connection.executemany('DELETE FROM canvas_objects WHERE kind = ? AND key = ?', expiredRows)
+
+    def get(self, kind, key, recordType=None):
+        """
+        :param kind: Kind of the object, e.g. "COURSES"
+        :type kind: str
+        :param key: Identifies the object within its kind
+        :type key: str
+        :param recordType: (optional) CanvasRecord subclass of the object(s), otherwise CanvasObject
+        :type recordType: type
+        :return: The cached object(s), or None if they're missing, expired, or being refreshed
+        :rtype: CanvasObject or CanvasRecord or list or None
+        """
+        row = None
+        if not self.refresh:
+            with self._lock:
+                row = self._connection.execute('SELECT stored_at, value FROM canvas_objects WHERE kind = ? AND key = ?',
+                                               (kind, key)).fetchone()
+
+        if row is None or self._isExpired(kind, row[0], time.time()):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+
+        if recordType is None:
+            return json.loads(row[1], object_hook=lambda jsonObject: CanvasObject(**jsonObject))
+
+        # Records were stored with just their kept fields, so those are the fields to keep again.
+        value = json.loads(row[1])
+        if isinstance(value, list):
+            return [recordType.fromJSON(jsonObject, list(jsonObject.keys())) for jsonObject in value]
+        return recordType.fromJSON(value, list(value.keys()))
+
+    def put(self, kind, key, value):
+        """
+        :param kind: Kind of the object, e.g. "COURSES"
+        :type kind: str
+        :param key: Identifies the object within its kind
+        :type key: str
+        :param value: Object(s) to be cached
+        :type value: CanvasObject or CanvasRecord or list
+        """
+        if self.timesToLive.get(kind, 0) <= 0:
+            return
+
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO canvas_objects (kind, key, stored_at, value) '
+                                     'VALUES (?, ?, ?, ?)',
+                                     (kind, key, time.time(), json.dumps(value, default=_toJSONValue)))
+
+    def getStats(self):
+        """
+        :return: Counts of cache hits and misses
+        :rtype: dict
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+def cachedObjects(kind, recordType=None):
+    """
+    Decorator for CanvasAPI methods returning CanvasObjects that may be kept in
+    the instance's objectCache.  The method's arguments identify the object(s).
+
+    :param kind: Kind of the objects, e.g. "COURSES"
+    :type kind: str
+    :param recordType: (optional) CanvasRecord subclass the method returns, otherwise CanvasObject
+    :type recordType: type
+    """
+
+    def decorator(method):
+        def isCached(self):
+            return self.objectCache is not None and self.objectCache.timesToLive.get(kind, 0) > 0
+
+        # AsyncCanvasAPI's coroutine methods share the same cache.
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def asyncWrapper(self, *args, **kwargs):
+                if not isCached(self):
+                    return await method(self, *args, **kwargs)
+
+                key = json.dumps([args, kwargs], sort_keys=True)
+                value = self.objectCache.get(kind, key, recordType)
+                if value is None:
+                    value = await method(self, *args, **kwargs)
+                    if value is not None:
+                        self.objectCache.put(kind, key, value)
+                return value
+
+            return asyncWrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not isCached(self):
+                return method(self, *args, **kwargs)
+
+            key = json.dumps([args, kwargs], sort_keys=True)
+            value = self.objectCache.get(kind, key, recordType)
+            if value is None:
+                value = method(self, *args, **kwargs)
+                if value is not None:
+                    self.objectCache.put(kind, key, value)
+            return value
+
+        return wrapper
+
+    return decorator
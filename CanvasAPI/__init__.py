@@ -1 +1,2 @@
 from . CanvasAPI import *
+from . ObjectCache import *
@@ -0,0 +1,153 @@
+# Canvas GraphQL query for everything kartograafr needs from one course, and
+# conversion of its results to the JSON the REST API would have returned, so
+# the same records are made from either.
+
+from collections import OrderedDict
+
+# The course's fields are included only in the first request.  Later requests
+# get the next page of just the connection(s) that have more pages.
+COURSE_DATA_QUERY = '''
+query KartograafrCourseData($courseID: ID!, $pageSize: Int!, $withCourse: Boolean!,
+                            $withAssignments: Boolean!, $assignmentsCursor: String,
+                            $withEnrollments: Boolean!, $enrollmentsCursor: String) {
+  course(id: $courseID) {
+    _id
+    name @include(if: $withCourse)
+    courseCode @include(if: $withCourse)
+    assignmentsConnection(first: $pageSize, after: $assignmentsCursor) @include(if: $withAssignments) {
+      nodes {
+        _id
+        name
+        dueAt
+        lockAt
+        rubric {
+          criteria {
+            _id
+            outcome {
+              _id
+            }
+          }
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+    enrollmentsConnection(first: $pageSize, after: $enrollmentsCursor) @include(if: $withEnrollments) {
+      nodes {
+        type
+        state
+        user {
+          _id
+          name
+          sortableName
+          loginId
+          email
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+  }
+}
+'''
+
+ASSIGNMENTS_CONNECTION = 'assignmentsConnection'
+ENROLLMENTS_CONNECTION = 'enrollmentsConnection'
+
+# Like the REST API's users in a course, only users with these enrollment states are included.
+ENROLLMENT_STATES = frozenset(('active', 'invited'))
+
+
+def _toID(graphQLID):
+    return int(graphQLID) if graphQLID is not None else None
+
+
+def courseJSON(courseNode):
+    """
+    :param courseNode: Course from a query result
+    :type courseNode: dict
+    :return: The course, as the REST API would return it
+    :rtype: dict
+    """
+    return {
+        'id': _toID(courseNode['_id']),
+        'name': courseNode.get('name'),
+        'course_code': courseNode.get('courseCode'),
+    }
+
+
+def assignmentJSON(assignmentNode, courseID):
+    """
+    :param assignmentNode: Assignment from a query result
+    :type assignmentNode: dict
+    :param courseID: ID of the assignment's course
+    :type courseID: int
+    :return: The assignment, as the REST API would return it.  Only "outcome_id" of
+        the rubric's criteria is included.
+    :rtype: dict
+    """
+    rubric = None
+    if assignmentNode.get('rubric') is not None:
+        rubric = [{'id': criterion.get('_id'),
+                   'outcome_id': _toID((criterion.get('outcome') or {}).get('_id'))}
+                  for criterion in assignmentNode['rubric'].get('criteria') or []]
+
+    return {
+        'id': _toID(assignmentNode['_id']),
+        'name': assignmentNode.get('name'),
+        'course_id': courseID,
+        'due_at': assignmentNode.get('dueAt'),
+        'lock_at': assignmentNode.get('lockAt'),
+        'rubric': rubric,
+    }
+
+
+def usersJSON(enrollmentNodes, courseID):
+    """
+    Combine enrollments into users.  A user enrolled more than once, e.g. in
+    several sections, is one user with several enrollments.
+
+    Canvas' GraphQL User has no SIS login ID, only "loginId" and "sisId" (the SIS
+    user ID, which isn't a login).  So "sis_login_id" is set to the login ID.  It's
+    the same for users whose logins come from the SIS, as at U-M, but may differ
+    elsewhere.  main.emailCourseLogs() makes instructors' addresses from it.
+
+    :param enrollmentNodes: Enrollments from query results
+    :type enrollmentNodes: list of dict
+    :param courseID: ID of the enrollments' course
+    :type courseID: int
+    :return: The users, in order of their first enrollment, as the REST API would return
+        them with "include[]=enrollments"
+    :rtype: list of dict
+    """
+    users = OrderedDict()
+    for enrollmentNode in enrollmentNodes:
+        userNode = enrollmentNode.get('user')
+        if userNode is None or enrollmentNode.get('state') not in ENROLLMENT_STATES:
+            continue
+
+        userID = _toID(userNode['_id'])
+        user = users.get(userID)
+        if user is None:
+            user = users[userID] = {
+                'id': userID,
+                'name': userNode.get('name'),
+                'sortable_name': userNode.get('sortableName'),
+                'login_id': userNode.get('loginId'),
+                # Not in GraphQL; see above.
+                'sis_login_id': userNode.get('loginId'),
+                'email': userNode.get('email'),
+                'enrollments': [],
+            }
+        user['enrollments'].append({
+            'type': enrollmentNode.get('type'),
+            'enrollment_state': enrollmentNode.get('state'),
+            'course_id': courseID,
+            'user_id': userID,
+        })
+
+    return list(users.values())
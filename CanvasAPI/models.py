@@ -1,24 +1,25 @@
 from argparse import Namespace
 
+from RequestsPlus.JSONDecoder import JSON_CONTAINER_TYPES, makeJSONObjects
+
 
 class CanvasObject(Namespace):
-    def __getattribute__(self, name):
+    def __getattr__(self, name):
         """
         Unlike the default implementation, this method returns
         ``None`` rather than raise an ``AttributeError`` exception
-        if an attribute doesn't exist.
+        if an attribute doesn't exist.  It's only called for
+        attributes that weren't found the usual way.
 
         :param name: Name of the attribute to retrieve
         :type name: str
-        :return: Value of the named attribute or None
-        :rtype: mixed
+        :return: None
+        :rtype: None
         """
-        attrValue = None
-        try:
-            attrValue = object.__getattribute__(self, name)
-        except AttributeError:
-            pass
-        return attrValue
+        # Special names must stay missing, for copy, pickle, etc.
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return None
 
     def __str__(self):
         """
@@ -31,3 +32,137 @@ class CanvasObject(Namespace):
         :rtype: str
         """
         return '"{}" ({})'.format(self.title or self.name, self.id)
+
+
+def makeCanvasObjects(value):
+    """
+    Convert dictionaries parsed from JSON, including those nested in lists and
+    other dictionaries, to CanvasObjects.
+
+    :param value: Value parsed from JSON
+    :type value: Any
+    :return: The value, with dictionaries replaced by CanvasObjects
+    :rtype: Any
+    """
+    return makeJSONObjects(value, CanvasObject)
+
+
+_recordTypes = {}
+
+
+def _restoreRecord(entityType, fields, values):
+    recordType = entityType.project(fields)
+    record = recordType.__new__(recordType)
+    for (name, value) in zip(fields, values):
+        setattr(record, name, value)
+    return record
+
+
+class CanvasRecord(object):
+    """
+    Compact alternative to CanvasObject for the objects kartograafr gets in
+    large numbers.  Only the attributes in FIELDS are kept, in slots.  Like
+    CanvasObject, attributes that Canvas didn't return, or that weren't kept,
+    are ``None``.
+
+    Subclasses name the Canvas entity and its usual FIELDS, but have no slots
+    of their own.  Records are made by project(), which makes a subclass with
+    slots for just the fields to be kept.
+    """
+    __slots__ = ()
+    FIELDS = ()
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return None
+
+    @classmethod
+    def project(cls, fields=None):
+        """
+        :param fields: Names of the attributes to keep.  By default, the class' FIELDS.
+        :type fields: iterable of str
+        :return: Record type with slots for the fields.  The same type is returned for the same fields.
+        :rtype: type
+        """
+        fields = cls.FIELDS if fields is None else tuple(fields)
+        recordTypeKey = (cls, fields)
+        recordType = _recordTypes.get(recordTypeKey)
+        if recordType is None:
+            recordType = type(cls.__name__, (cls,), {'__slots__': fields, 'FIELDS': fields})
+            _recordTypes[recordTypeKey] = recordType
+        return recordType
+
+    @classmethod
+    def fromJSON(cls, jsonObject, fields=None):
+        """
+        :param jsonObject: Object parsed from JSON, with nested objects as dictionaries
+        :type jsonObject: dict
+        :param fields: Names of the attributes to keep.  By default, the class' FIELDS.
+        :type fields: iterable of str
+        :return: Record of the projected type
+        :rtype: CanvasRecord
+        """
+        return cls.fromJSONList([jsonObject], fields)[0]
+
+    @classmethod
+    def fromJSONList(cls, jsonObjects, fields=None):
+        """
+        Like fromJSON(), for a list of objects.  The record type and its slots
+        are looked up once for the whole list.
+
+        :rtype: list of CanvasRecord
+        """
+        recordType = cls.project(fields)
+        newRecord = recordType.__new__
+        slotSetters = [(name, getattr(recordType, name).__set__) for name in recordType.FIELDS]
+
+        records = []
+        for jsonObject in jsonObjects:
+            record = newRecord(recordType)
+            for (name, setSlot) in slotSetters:
+                value = jsonObject.get(name)
+                if type(value) in JSON_CONTAINER_TYPES:
+                    value = makeCanvasObjects(value)
+                setSlot(record, value)
+            records.append(record)
+        return records
+
+    def toJSON(self):
+        """
+        :return: The kept attributes, for serializing as JSON
+        :rtype: dict
+        """
+        return dict((name, getattr(self, name)) for name in self.FIELDS)
+
+    def __reduce__(self):
+        # Projected types are made at run time, so records are pickled by entity type and fields.
+        entityType = self.__class__.__bases__[0]
+        return _restoreRecord, (entityType, self.FIELDS, tuple(getattr(self, name) for name in self.FIELDS))
+
+    def __str__(self):
+        return '"{}" ({})'.format(self.title or self.name, self.id)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__,
+                               ', '.join('{}={!r}'.format(name, getattr(self, name)) for name in self.FIELDS))
+
+
+class Course(CanvasRecord):
+    __slots__ = ()
+    FIELDS = ('id', 'name', 'course_code')
+
+
+class Assignment(CanvasRecord):
+    __slots__ = ()
+    FIELDS = ('id', 'name', 'course_id', 'due_at', 'lock_at', 'rubric')
+
+
+class User(CanvasRecord):
+    __slots__ = ()
+    FIELDS = ('id', 'name', 'sortable_name', 'login_id', 'sis_login_id', 'email', 'enrollments')
+
+
+class OutcomeLink(CanvasRecord):
+    __slots__ = ()
+    FIELDS = ('context_id', 'context_type', 'outcome')
@@ -0,0 +1,275 @@
+# asyncio version of RequestsPlus.  Requests are sent with a single aiohttp
+# session, so many requests can be waiting on one event loop at the same time.
+
+import asyncio
+import datetime
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+logger = logging.getLogger(__name__)
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+from yarl import URL
+
+import util
+from .RequestsPlus import RequestsPlus, MIME_TYPE_JSON, AUTHZ_TYPE_BEARER
+from .ResponseCollection import getNumberedPageURLs
+from .JSONDecoder import decodeResponseJSON
+
+DEFAULT_CONNECTION_LIMIT = 20
+
+
+class AsyncRequestsPlus(util.UtilMixin, object):
+    """
+    Requests are sent like RequestsPlus sends them: GET requests are
+    revalidated with the HTTP cache, the rate limit governor decides when
+    they're sent, the retry policy decides whether they're sent again, and
+    each time one is sent is recorded in the metrics.  Any of them may be
+    shared with a RequestsPlus object, so a run has one rate limit quota, one
+    retry budget and one set of metrics whichever way its requests are sent.
+    Responses are returned as requests' Response objects.
+    """
+
+    def __init__(self, apiBaseURL, contentType=MIME_TYPE_JSON, authZToken=None, authZType=AUTHZ_TYPE_BEARER,
+                 connectionLimit=DEFAULT_CONNECTION_LIMIT, httpCache=None, rateLimitGovernor=None,
+                 retryPolicy=None, metricsRegistry=None, endpointTemplates=()):
+        """
+        :param connectionLimit: Maximum number of connections open at the same time
+        :type connectionLimit: int
+        :param httpCache: (optional) Cache for revalidating GET responses with conditional requests
+        :type httpCache: HTTPCache
+        :param rateLimitGovernor: (optional) Keeps requests within the API's rate limit
+        :type rateLimitGovernor: RateLimitGovernor
+        :param retryPolicy: (optional) Decides which failed requests are sent again.  Without one,
+            each request is sent once.
+        :type retryPolicy: RetryPolicy
+        :param metricsRegistry: (optional) Metrics of every request sent, labeled by endpoint
+        :type metricsRegistry: metrics.MetricsRegistry
+        :param endpointTemplates: URI templates of the API's endpoints, like "/courses/{courseID}",
+            used as the metrics' endpoint labels
+        :type endpointTemplates: iterable of str
+        """
+        self._name = self.__class__.__name__
+        self.apiBaseURL = apiBaseURL
+        self.contentType = contentType
+        self.authZToken = authZToken
+        self.authZType = authZType
+        self.connectionLimit = connectionLimit
+        self.httpCache = httpCache
+        self.rateLimitGovernor = rateLimitGovernor
+        self.retryPolicy = retryPolicy
+        self.metricsRegistry = metricsRegistry
+        self._endpointPatterns = [(self._getEndpointPattern(template), template) for template in endpointTemplates]
+        self._session = None
+        # The governor makes threads wait, so they wait here instead of in the event loop or its default
+        # executor, which aiohttp needs for resolving host names.
+        self._governorExecutor = None
+
+    # Headers and URLs are prepared, and requests are retried and recorded, exactly like the synchronous version.
+    _authZHeader = RequestsPlus._authZHeader
+    _contentTypeHeader = RequestsPlus._contentTypeHeader
+    _prepareHeaders = RequestsPlus._prepareHeaders
+    _prepareURL = RequestsPlus._prepareURL
+    _getEndpointPattern = RequestsPlus._getEndpointPattern
+    getEndpointLabel = RequestsPlus.getEndpointLabel
+    _recordRequestMetrics = RequestsPlus._recordRequestMetrics
+    _finishAttempt = RequestsPlus._finishAttempt
+
+    @property
+    def session(self):
+        """
+        The aiohttp session is created on first use, because it must be
+        created while the event loop that will use it is running.
+
+        :rtype: aiohttp.ClientSession
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connectionLimit),
+                headers=self._prepareHeaders())
+        return self._session
+
+    async def close(self):
+        """
+        Close the aiohttp session and all of its connections.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._governorExecutor is not None:
+            self._governorExecutor.shutdown()
+            self._governorExecutor = None
+
+    async def _acquireRateLimit(self):
+        if self._governorExecutor is None:
+            self._governorExecutor = ThreadPoolExecutor(max_workers=self.connectionLimit)
+        await asyncio.get_event_loop().run_in_executor(self._governorExecutor, self.rateLimitGovernor.acquire)
+
+    async def _send(self, preparedRequest):
+        """
+        Send a request once and read the whole response body.
+
+        :param preparedRequest: The request to be sent
+        :type preparedRequest: requests.PreparedRequest
+        :return: The response, with its body
+        :rtype: requests.Response
+        :raises requests.exceptions.ConnectionError: If the request couldn't be sent
+        :raises requests.exceptions.Timeout: If the response didn't arrive in time
+        """
+        start = time.perf_counter()
+        try:
+            # The URL's parameters were already encoded when the request was prepared.
+            async with self.session.request(preparedRequest.method, URL(preparedRequest.url, encoded=True),
+                                            headers=dict(preparedRequest.headers)) as clientResponse:
+                body = await clientResponse.read()
+        except asyncio.TimeoutError as exception:
+            raise requests.exceptions.Timeout(str(exception), request=preparedRequest)
+        except aiohttp.ClientError as exception:
+            raise requests.exceptions.ConnectionError(str(exception), request=preparedRequest)
+
+        response = requests.Response()
+        response.status_code = clientResponse.status
+        response.reason = clientResponse.reason
+        response.headers = CaseInsensitiveDict(clientResponse.headers)
+        response.url = str(clientResponse.url)
+        response.request = preparedRequest
+        response.elapsed = datetime.timedelta(seconds=time.perf_counter() - start)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = body
+        return response
+
+    async def _getPage(self, url, params=None):
+        """
+        Send a GET request, like RequestsPlus._sendPreparedRequest().
+
+        :param url: Full URL for the query
+        :type url: str
+        :param params: Parameters to be sent along with the request
+        :type params: dict or list of (str, str)
+        :return: The response, whose body has been read
+        :rtype: requests.Response
+        """
+        preparedRequest = requests.Request('GET', url, params=params).prepare()
+        cacheEntry = self.httpCache.addValidators(preparedRequest) if self.httpCache is not None else None
+
+        attempt = 1
+        while True:
+            response = None
+            exception = None
+            if self.rateLimitGovernor is not None:
+                await self._acquireRateLimit()
+            start = time.perf_counter()
+            try:
+                response = await self._send(preparedRequest)
+            except requests.exceptions.RequestException as e:
+                exception = e
+            finally:
+                if self.rateLimitGovernor is not None:
+                    self.rateLimitGovernor.release(response)
+
+            retryDelay = self._finishAttempt(preparedRequest, response, exception, attempt,
+                                             time.perf_counter() - start)
+            if retryDelay is None:
+                break
+
+            await asyncio.sleep(retryDelay)
+            attempt += 1
+
+        if exception is not None:
+            raise exception
+
+        if self.httpCache is not None:
+            response = self.httpCache.handleResponse(preparedRequest, response, cacheEntry)
+
+        if not response.ok:
+            raise RuntimeError('Error {response.status_code} "{response.reason}" for request: {url}'
+                               .format(**locals()))
+
+        return response
+
+    async def getJSON(self, apiQueryURI, params=None, object_hook=None):
+        """
+        Get JSON from a single page of an API response.
+
+        :param apiQueryURI: URI for the query, to be appended to the base URL
+        :type apiQueryURI: str
+        :param params: Parameters to be sent along with the request
+        :type params: dict
+        :param object_hook: Passed along to json.loads()
+        :type object_hook: callable
+        :return: JSON from the response
+        :rtype: Any
+        """
+        response = await self._getPage(self._prepareURL(apiQueryURI), params=params)
+        return self._decodeBody(response, object_hook)
+
+    async def getAllPagesJSON(self, apiQueryURI, params=None, object_hook=None):
+        """
+        Get JSON from every page of an API response, combined into one list like
+        ResponseCollection.json().  When the number of remaining pages is known,
+        they are all requested at the same time.  Otherwise, the "next" links are
+        followed one page at a time.
+
+        :param apiQueryURI: URI for the query, to be appended to the base URL
+        :type apiQueryURI: str
+        :param params: Parameters to be sent along with the first request
+        :type params: dict or list of (str, str)
+        :param object_hook: Passed along to json.loads()
+        :type object_hook: callable
+        :return: Combined list of JSON from all pages
+        :rtype: list of Any
+        """
+        response = await self._getPage(self._prepareURL(apiQueryURI), params=params)
+        pages = [response]
+
+        pageURLs = getNumberedPageURLs(self._getLinkURL(response, 'next'), self._getLinkURL(response, 'last'))
+        if pageURLs:
+            pages.extend(await asyncio.gather(*[self._getPage(pageURL) for pageURL in pageURLs]))
+        else:
+            # The "next" link already contains all of the parameters.
+            nextPageURL = self._getLinkURL(response, 'next')
+            while nextPageURL is not None:
+                response = await self._getPage(nextPageURL)
+                pages.append(response)
+                nextPageURL = self._getLinkURL(response, 'next')
+
+        allResponseJSON = []
+        for response in pages:
+            responseJSON = self._decodeBody(response, object_hook)
+            if type(responseJSON) is not list:
+                allResponseJSON.append(responseJSON)
+            else:
+                allResponseJSON.extend(responseJSON)
+
+        return allResponseJSON
+
+    @staticmethod
+    def _decodeBody(response, object_hook=None):
+        """
+        Without an object_hook, the body is decoded by the fastest JSON library installed.
+
+        :param response: Response whose body was read
+        :type response: requests.Response
+        :param object_hook: Passed along to json.loads()
+        :type object_hook: callable
+        :return: JSON from the response
+        :rtype: Any
+        """
+        if object_hook is None:
+            return decodeResponseJSON(response)
+        return json.loads(response.content.decode(response.encoding or 'utf-8'), object_hook=object_hook)
+
+    @staticmethod
+    def _getLinkURL(response, relation):
+        """
+        :param response: Response whose "Link" header is checked
+        :type response: requests.Response
+        :param relation: Relation of the link, like "next" or "last"
+        :type relation: str
+        :return: URL of the link, if one exists.  Otherwise, None.
+        :rtype: str
+        """
+        return response.links.get(relation, {}).get('url')
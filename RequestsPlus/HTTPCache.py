@@ -0,0 +1,232 @@
+# On-disk cache of HTTP GET responses, revalidated with conditional requests.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+EVICTION_LOW_WATER_FRACTION = 0.9  # Eviction leaves the bodies taking up this fraction of maxBytes
+
+HTTP_HEADER_ETAG = 'ETag'
+HTTP_HEADER_LAST_MODIFIED = 'Last-Modified'
+HTTP_HEADER_IF_NONE_MATCH = 'If-None-Match'
+HTTP_HEADER_IF_MODIFIED_SINCE = 'If-Modified-Since'
+HTTP_STATUS_NOT_MODIFIED = 304
+
+# These describe the bytes sent over the network, not the cached body.
+_UNCACHED_HEADERS = ('content-length', 'content-encoding', 'transfer-encoding', 'connection')
+
+_METADATA_EXTENSION = '.json'
+_BODY_EXTENSION = '.body'
+
+
+class HTTPCache(object):
+    """
+    The :class:`HTTPCache<RequestsPlus.HTTPCache>` object keeps the bodies of
+    GET responses that have an "ETag" or "Last-Modified" validator, keyed by
+    URL (including the query parameters).  Later requests for the same URL send
+    "If-None-Match" / "If-Modified-Since", and a "304 Not Modified" response is
+    answered with the body from disk.
+
+    When the bodies take up more than maxBytes, the least recently used ones
+    are removed until they take up less than EVICTION_LOW_WATER_FRACTION of
+    it, so a full cache isn't evicted from on every store.  The order of use
+    is kept in memory, and in the files' modification times between runs.
+
+    Responses are kept as they were received, e.g. Canvas users with their
+    names and email addresses, so the directory and its files are made
+    readable only by their owner.
+    """
+
+    def __init__(self, directory, maxBytes=DEFAULT_MAX_BYTES):
+        """
+        :param directory: Directory where the cached responses are kept.  Created if needed.
+        :type directory: str
+        :param maxBytes: Maximum total size of the cached response bodies
+        :type maxBytes: int
+        """
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytesSaved = 0
+
+        # Sizes of the cached bodies by entry path, least recently used first.
+        self._bodySizes = OrderedDict()
+        bodyFiles = sorted(((entry.stat().st_mtime, entry.path[:-len(_BODY_EXTENSION)], entry.stat().st_size)
+                            for entry in os.scandir(directory) if entry.name.endswith(_BODY_EXTENSION)))
+        for (_, entryPath, bodySize) in bodyFiles:
+            self._bodySizes[entryPath] = bodySize
+        self._totalBytes = sum(self._bodySizes.values())
+
+    @staticmethod
+    def _openPrivate(path, mode):
+        return open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), mode)
+
+    def _entryPath(self, preparedRequest):
+        key = hashlib.sha256(' '.join([preparedRequest.method, preparedRequest.url]).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key)
+
+    def _readEntry(self, entryPath):
+        try:
+            with open(entryPath + _METADATA_EXTENSION, 'r') as metadataFile:
+                return json.load(metadataFile)
+        except (OSError, ValueError):
+            return None
+
+    def addValidators(self, preparedRequest):
+        """
+        Add conditional request headers for a cached response to the request.
+        Validators left over from a copied request are removed first.
+
+        :param preparedRequest: GET request about to be sent
+        :type preparedRequest: requests.PreparedRequest
+        :return: Metadata of the cached response, or None if there isn't one
+        :rtype: dict or None
+        """
+        preparedRequest.headers.pop(HTTP_HEADER_IF_NONE_MATCH, None)
+        preparedRequest.headers.pop(HTTP_HEADER_IF_MODIFIED_SINCE, None)
+
+        entry = self._readEntry(self._entryPath(preparedRequest))
+        if entry is None:
+            return None
+
+        if entry.get('etag'):
+            preparedRequest.headers[HTTP_HEADER_IF_NONE_MATCH] = entry['etag']
+        if entry.get('lastModified'):
+            preparedRequest.headers[HTTP_HEADER_IF_MODIFIED_SINCE] = entry['lastModified']
+
+        return entry
+
+    def handleResponse(self, preparedRequest, response, entry):
+        """
+        Answer a "304 Not Modified" response from the cache, or store a new
+        response that has validators.
+
+        :param preparedRequest: GET request that was sent
+        :type preparedRequest: requests.PreparedRequest
+        :param response: Response received for the request
+        :type response: requests.Response
+        :param entry: Metadata returned by addValidators() for the request
+        :type entry: dict or None
+        :return: The response to use in place of the one received
+        :rtype: requests.Response
+        """
+        entryPath = self._entryPath(preparedRequest)
+
+        if response.status_code == HTTP_STATUS_NOT_MODIFIED and entry is not None:
+            cachedResponse = self._makeCachedResponse(entryPath, entry, response)
+            if cachedResponse is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.bytesSaved += len(cachedResponse.content)
+                return cachedResponse
+
+        with self._lock:
+            self.misses += 1
+
+        if response.ok and (HTTP_HEADER_ETAG in response.headers or HTTP_HEADER_LAST_MODIFIED in response.headers):
+            self._storeResponse(entryPath, response)
+
+        return response
+
+    def _makeCachedResponse(self, entryPath, entry, notModifiedResponse):
+        try:
+            with open(entryPath + _BODY_EXTENSION, 'rb') as bodyFile:
+                body = bodyFile.read()
+            os.utime(entryPath + _BODY_EXTENSION)
+        except OSError:
+            return None
+
+        with self._lock:
+            if entryPath in self._bodySizes:
+                self._bodySizes.move_to_end(entryPath)
+
+        headers = CaseInsensitiveDict(entry['headers'])
+        headers.update((name, value) for (name, value) in notModifiedResponse.headers.items()
+                       if name.lower() not in _UNCACHED_HEADERS)
+
+        cachedResponse = requests.Response()
+        cachedResponse.status_code = entry['status']
+        cachedResponse.reason = entry['reason']
+        cachedResponse.headers = headers
+        cachedResponse.url = notModifiedResponse.url
+        cachedResponse.request = notModifiedResponse.request
+        cachedResponse.elapsed = notModifiedResponse.elapsed
+        cachedResponse.encoding = requests.utils.get_encoding_from_headers(headers)
+        cachedResponse._content = body
+
+        return cachedResponse
+
+    def _storeResponse(self, entryPath, response):
+        body = response.content
+        entry = {
+            'url': response.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'etag': response.headers.get(HTTP_HEADER_ETAG),
+            'lastModified': response.headers.get(HTTP_HEADER_LAST_MODIFIED),
+            'headers': dict((name, value) for (name, value) in response.headers.items()
+                            if name.lower() not in _UNCACHED_HEADERS),
+        }
+
+        # Write to temporary files first, so a partly written entry is never used.
+        temporaryPath = entryPath + '.{}.tmp'.format(threading.get_ident())
+        with self._openPrivate(temporaryPath + _BODY_EXTENSION, 'wb') as bodyFile:
+            bodyFile.write(body)
+        with self._openPrivate(temporaryPath + _METADATA_EXTENSION, 'w') as metadataFile:
+            json.dump(entry, metadataFile)
+
+        with self._lock:
+            os.replace(temporaryPath + _BODY_EXTENSION, entryPath + _BODY_EXTENSION)
+            os.replace(temporaryPath + _METADATA_EXTENSION, entryPath + _METADATA_EXTENSION)
+
+            self._totalBytes += len(body) - self._bodySizes.pop(entryPath, 0)
+            self._bodySizes[entryPath] = len(body)
+            self.stores += 1
+            if self._totalBytes > self.maxBytes:
+                self._evict(int(self.maxBytes * EVICTION_LOW_WATER_FRACTION))
+
+    def _evict(self, targetBytes):
+        """
+        Remove the least recently used responses until the total size is at
+        most targetBytes.  Must be called while holding the lock.
+        """
+        while self._bodySizes and self._totalBytes > targetBytes:
+            (entryPath, bodySize) = self._bodySizes.popitem(last=False)
+            for path in (entryPath + _BODY_EXTENSION, entryPath + _METADATA_EXTENSION):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._totalBytes -= bodySize
+            self.evictions += 1
+
+    def getStats(self):
+        """
+        :return: Counts of cache hits, misses, stores and evictions, plus bytes
+            served from disk instead of the network and bytes currently cached
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'bytesSaved': self.bytesSaved,
+                'bytesCached': self._totalBytes,
+            }
@@ -0,0 +1,126 @@
+# Decodes JSON response bodies with the fastest JSON library installed.
+# orjson and ujson are optional, the standard library's json is always available.
+
+import json
+import logging
+from argparse import Namespace
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+UTF8_ENCODINGS = frozenset(('utf-8', 'utf8'))
+
+JSON_CONTAINER_TYPES = (dict, list)
+
+
+def _decodeStandard(content, encoding):
+    return json.loads(content.decode(encoding or 'utf-8'))
+
+
+def _decodeOrjson(content, encoding):
+    return orjson.loads(content)
+
+
+def _decodeUjson(content, encoding):
+    return ujson.loads(content)
+
+
+# Decoders in order of preference.  Only the standard one accepts encodings other than UTF-8.
+JSON_DECODERS = [(name, decoder) for (name, module, decoder) in (
+    ('orjson', orjson, _decodeOrjson),
+    ('ujson', ujson, _decodeUjson),
+    ('json', json, _decodeStandard),
+) if module is not None]
+
+_decoderName, _decoder = JSON_DECODERS[0]
+
+
+def getJSONDecoderName():
+    """
+    :return: Name of the library used by decodeJSON()
+    :rtype: str
+    """
+    return _decoderName
+
+
+def setJSONDecoder(name):
+    """
+    Choose the library used by decodeJSON(), e.g. to compare them.
+
+    :param name: "orjson", "ujson", or "json"
+    :type name: str
+    :return: Name of the library used before
+    :rtype: str
+    """
+    global _decoderName, _decoder
+
+    decoders = dict(JSON_DECODERS)
+    if name not in decoders:
+        raise ValueError('JSON decoder "{}" is not installed (available: {})'
+                         .format(name, ', '.join(decoders)))
+
+    previousName = _decoderName
+    (_decoderName, _decoder) = (name, decoders[name])
+    return previousName
+
+
+def decodeJSON(content, encoding=None):
+    """
+    :param content: Encoded JSON, e.g. a response body
+    :type content: bytes
+    :param encoding: (optional) Encoding of the content.  UTF-8 by default.
+    :type encoding: str
+    :return: Value decoded from the JSON
+    :rtype: Any
+    :raises ValueError: If the content isn't valid JSON
+    """
+    if encoding is not None and encoding.lower() not in UTF8_ENCODINGS:
+        return _decodeStandard(content, encoding)
+    return _decoder(content, encoding)
+
+
+def decodeResponseJSON(response):
+    """
+    Like requests' Response.json(), but decoded by decodeJSON().
+
+    :param response: Response with a JSON body
+    :type response: requests.Response
+    :return: Value decoded from the response body
+    :rtype: Any
+    """
+    return decodeJSON(response.content, response.encoding)
+
+
+def makeJSONObjects(value, objectClass=Namespace):
+    """
+    Convert dictionaries parsed from JSON, including those nested in lists and
+    other dictionaries, to objects whose attributes are the dictionaries' items.
+
+    :param value: Value parsed from JSON
+    :type value: Any
+    :param objectClass: Namespace, or a subclass of it, to make the objects from
+    :type objectClass: type
+    :return: The value, with dictionaries replaced by objectClass objects
+    :rtype: Any
+    """
+    # Made for many objects at a time, so it avoids Namespace's __init__() and
+    # calls itself only for values that need converting.
+    valueType = type(value)
+    if valueType is dict:
+        jsonObject = objectClass.__new__(objectClass)
+        jsonObject.__dict__ = {name: makeJSONObjects(item, objectClass) if type(item) in JSON_CONTAINER_TYPES
+                               else item for (name, item) in value.items()}
+        return jsonObject
+    if valueType is list:
+        return [makeJSONObjects(item, objectClass) if type(item) in JSON_CONTAINER_TYPES else item
+                for item in value]
+    return value
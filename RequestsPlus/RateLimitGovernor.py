@@ -0,0 +1,162 @@
+# Keeps requests within an API's rate limit, using the quota reported in
+# response headers.  Canvas uses a "leaky bucket": each request adds its cost
+# to the bucket, the bucket leaks over time, and requests are refused with
+# "403 Forbidden (Rate Limit Exceeded)" when it's full.
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HTTP_HEADER_RATE_LIMIT_REMAINING = 'X-Rate-Limit-Remaining'
+HTTP_HEADER_REQUEST_COST = 'X-Request-Cost'
+HTTP_STATUS_FORBIDDEN = 403
+RATE_LIMIT_EXCEEDED_MESSAGE = 'rate limit exceeded'
+
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_LOW_REMAINING = 200  # Below this, fewer requests are sent at the same time and requests wait
+DEFAULT_HIGH_REMAINING = 500  # Above this, more requests may be sent at the same time
+DEFAULT_LEAK_RATE = 10.0  # Approximate quota regained per second
+MAX_DELAY_SECONDS = 60
+
+DEFAULT_PHASE = 'default'
+
+
+class RateLimitGovernor(object):
+    """
+    The :class:`RateLimitGovernor<RequestsPlus.RateLimitGovernor>` object is
+    shared by all threads sending requests with a RequestsPlus object.  It
+    limits the number of requests in flight at the same time, halving the
+    limit when the remaining quota is low or a request is throttled and
+    raising it by one while the quota is high.  When the quota is low,
+    requests wait until enough of it should have been regained.
+
+    The number and cost of requests are counted for each phase of a run,
+    as set by setPhase().
+    """
+
+    def __init__(self, maxInFlight=DEFAULT_MAX_IN_FLIGHT, lowRemaining=DEFAULT_LOW_REMAINING,
+                 highRemaining=DEFAULT_HIGH_REMAINING, leakRate=DEFAULT_LEAK_RATE):
+        """
+        :param maxInFlight: Most requests ever in flight at the same time
+        :type maxInFlight: int
+        :param lowRemaining: Remaining quota below which requests are slowed down
+        :type lowRemaining: float
+        :param highRemaining: Remaining quota above which requests are sped up
+        :type highRemaining: float
+        :param leakRate: Quota regained per second
+        :type leakRate: float
+        """
+        self.maxInFlight = max(1, maxInFlight)
+        self.lowRemaining = lowRemaining
+        self.highRemaining = highRemaining
+        self.leakRate = leakRate
+
+        self.inFlightLimit = self.maxInFlight
+        self.remaining = None
+        self.phase = DEFAULT_PHASE
+        self._inFlight = 0
+        self._resumeTime = 0
+        self._phaseStats = {}
+        self._condition = threading.Condition()
+
+    def setPhase(self, phase):
+        """
+        :param phase: Name of the phase of the run, under which requests are counted from now on
+        :type phase: str
+        """
+        with self._condition:
+            self.phase = phase
+
+    def _getPhaseStats(self):
+        return self._phaseStats.setdefault(self.phase, {
+            'requests': 0, 'cost': 0.0, 'throttled': 0, 'delaySeconds': 0.0})
+
+    def acquire(self):
+        """
+        Wait until another request may be sent.  Every call must be followed by release().
+        """
+        with self._condition:
+            while self._inFlight >= self.inFlightLimit:
+                self._condition.wait()
+            self._inFlight += 1
+            delay = self._resumeTime - time.time()
+            if delay > 0:
+                self._getPhaseStats()['delaySeconds'] += delay
+
+        if delay > 0:
+            logger.debug('Waiting {:.1f} seconds for the rate limit quota'.format(delay))
+            time.sleep(delay)
+
+    def release(self, response=None):
+        """
+        Record the quota and cost from a response and allow another request to be sent.
+
+        :param response: Response received, or None if no response was received
+        :type response: requests.Response
+        """
+        with self._condition:
+            self._inFlight -= 1
+            if response is not None:
+                self._update(response)
+            self._condition.notify_all()
+
+    def _update(self, response):
+        """
+        Must be called while holding the condition's lock.
+        """
+        phaseStats = self._getPhaseStats()
+        phaseStats['requests'] += 1
+
+        try:
+            phaseStats['cost'] += float(response.headers.get(HTTP_HEADER_REQUEST_COST, 0))
+        except ValueError:
+            pass
+
+        if self.isThrottled(response):
+            phaseStats['throttled'] += 1
+            self.remaining = 0
+            self._slowDown()
+            return
+
+        try:
+            self.remaining = float(response.headers[HTTP_HEADER_RATE_LIMIT_REMAINING])
+        except (KeyError, ValueError):
+            return
+
+        if self.remaining < self.lowRemaining:
+            self._slowDown()
+        elif self.remaining > self.highRemaining and self.inFlightLimit < self.maxInFlight:
+            self.inFlightLimit += 1
+
+    def _slowDown(self):
+        self.inFlightLimit = max(1, self.inFlightLimit // 2)
+        delay = min(MAX_DELAY_SECONDS, (self.lowRemaining - self.remaining) / self.leakRate)
+        self._resumeTime = max(self._resumeTime, time.time() + delay)
+        logger.info('Rate limit quota low ({}), sending at most {} requests at the same time'
+                    .format(self.remaining, self.inFlightLimit))
+
+    @staticmethod
+    def isThrottled(response):
+        """
+        :param response: Response received
+        :type response: requests.Response
+        :return: True if the request was refused because the rate limit was exceeded
+        :rtype: bool
+        """
+        return response is not None and response.status_code == HTTP_STATUS_FORBIDDEN \
+            and RATE_LIMIT_EXCEEDED_MESSAGE in response.text.lower()
+
+    def getStats(self):
+        """
+        :return: Current in-flight limit and remaining quota, and the number, total cost,
+            throttled count and delay of requests in each phase
+        :rtype: dict
+        """
+        with self._condition:
+            return {
+                'inFlightLimit': self.inFlightLimit,
+                'remaining': self.remaining,
+                'phases': dict((phase, dict(stats)) for (phase, stats) in self._phaseStats.items()),
+            }
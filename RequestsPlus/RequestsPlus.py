@@ -1,9 +1,13 @@
 # The request types are now hard coded rather than obtained from variable.  
 
 import logging
+import re
+import time
+from urllib.parse import urlsplit
 logger = logging.getLogger(__name__)
 
 import requests
+from requests.adapters import HTTPAdapter
 from url_normalize import url_normalize
 
 import util
@@ -13,20 +17,66 @@ HTTP_HEADER_AUTHORIZATION = 'Authorization'
 AUTHZ_TYPE_BEARER = 'Bearer'
 MIME_TYPE_JSON = 'application/json'
 HTTP_HEADER_CONTENT_TYPE = 'Content-type'
+HTTP_HEADER_CONNECTION = 'Connection'
+
+DEFAULT_POOL_HOST_COUNT = 10  #: Hosts whose connections are kept
+DEFAULT_POOL_MAX_SIZE = 10  #: Connections kept for each host
+
+OTHER_ENDPOINT_LABEL = 'other'  #: Endpoint label of URLs not matching any endpoint template
+_TEMPLATE_FIELD_PATTERN = re.compile(r'\{[^{}]*\}')
 
 
 class RequestsPlus(util.UtilMixin, object):
-    def __init__(self, apiBaseURL, contentType=MIME_TYPE_JSON, authZToken=None, authZType=AUTHZ_TYPE_BEARER):
+    def __init__(self, apiBaseURL, contentType=MIME_TYPE_JSON, authZToken=None, authZType=AUTHZ_TYPE_BEARER,
+                 pageWorkerCount=1, httpCache=None, rateLimitGovernor=None, retryPolicy=None,
+                 poolHostCount=DEFAULT_POOL_HOST_COUNT, poolMaxSize=DEFAULT_POOL_MAX_SIZE, keepAlive=True,
+                 metricsRegistry=None, endpointTemplates=()):
+        """
+        :param pageWorkerCount: Number of response pages that may be requested at the same time
+        :type pageWorkerCount: int
+        :param httpCache: (optional) Cache for revalidating GET responses with conditional requests
+        :type httpCache: HTTPCache
+        :param rateLimitGovernor: (optional) Keeps requests within the API's rate limit
+        :type rateLimitGovernor: RateLimitGovernor
+        :param retryPolicy: (optional) Decides which failed requests are sent again.  Without one,
+            each request is sent once.
+        :type retryPolicy: RetryPolicy
+        :param poolHostCount: Number of hosts whose connections are kept in the pool
+        :type poolHostCount: int
+        :param poolMaxSize: Number of connections kept in the pool for each host.  Should be at least
+            the number of requests sent at the same time, or extra connections are opened and closed.
+        :type poolMaxSize: int
+        :param keepAlive: If False, every connection is closed after one request
+        :type keepAlive: bool
+        :param metricsRegistry: (optional) Metrics of every request sent, labeled by endpoint
+        :type metricsRegistry: metrics.MetricsRegistry
+        :param endpointTemplates: URI templates of the API's endpoints, like "/courses/{courseID}",
+            used as the metrics' endpoint labels
+        :type endpointTemplates: iterable of str
+        """
         self._name = self.__class__.__name__
         self.apiBaseURL = apiBaseURL
         self.contentType = contentType
         self.authZToken = authZToken
         self.authZType = authZType
+        self.pageWorkerCount = pageWorkerCount
+        self.httpCache = httpCache
+        self.rateLimitGovernor = rateLimitGovernor
+        self.retryPolicy = retryPolicy
+        self.keepAlive = keepAlive
+        self.metricsRegistry = metricsRegistry
+        self._endpointPatterns = [(self._getEndpointPattern(template), template) for template in endpointTemplates]
+
+        # All requests, including those from ResponseCollections, share the session's connection pool.
         self.session = requests.Session()
+        self._httpAdapter = HTTPAdapter(pool_connections=poolHostCount, pool_maxsize=poolMaxSize)
+        self.session.mount('https://', self._httpAdapter)
+        self.session.mount('http://', self._httpAdapter)
         self.session.headers.update(self._prepareHeaders())
+        if not keepAlive:
+            self.session.headers[HTTP_HEADER_CONNECTION] = 'close'
 
-    @staticmethod
-    def responseCollection(response):
+    def responseCollection(self, response):
         """
         Convenience method to make a ResponseCollection
         object for a response.
@@ -36,7 +86,9 @@ class RequestsPlus(util.UtilMixin, object):
         :return: ResponseCollection object containing multiple response pages
         :rtype: ResponseCollection
         """
-        return ResponseCollection(response)
+        return ResponseCollection(response, session=self.session, pageWorkerCount=self.pageWorkerCount,
+                                  requestSender=self._sendPreparedRequest, metricsRegistry=self.metricsRegistry,
+                                  endpointLabeler=self.getEndpointLabel)
 
     @property
     def _authZHeader(self):
@@ -54,6 +106,27 @@ class RequestsPlus(util.UtilMixin, object):
         headers.update(self._authZHeader)
         return headers
 
+    def getConnectionStats(self):
+        """
+        Count the connections opened and the requests sent by the pools in the
+        session's connection pool.  Pools of hosts that have been dropped from the
+        pool aren't counted.
+
+        :return: Numbers of new connections opened, and of requests sent over
+            connections that were already open
+        :rtype: dict
+        """
+        pools = self._httpAdapter.poolmanager.pools
+        newConnections = 0
+        requestCount = 0
+        for poolKey in list(pools.keys()):
+            pool = pools.get(poolKey)
+            if pool is not None:
+                newConnections += pool.num_connections
+                requestCount += pool.num_requests
+
+        return {'newConnections': newConnections, 'reusedConnections': max(0, requestCount - newConnections)}
+
     def _prepareURL(self, apiQueryURI):
         """
         If the URI (actually just a partial URL, usually the path part) doesn't begin with
@@ -73,6 +146,71 @@ class RequestsPlus(util.UtilMixin, object):
 
         return url_normalize(self.apiBaseURL + '/' + apiQueryURI)
 
+    def _getEndpointPattern(self, endpointTemplate):
+        """
+        :return: Pattern matching the paths of URLs made from the template, with any value for each field
+        :rtype: re.Pattern
+        """
+        fields = _TEMPLATE_FIELD_PATTERN.findall(endpointTemplate)
+        placeholder = 'ENDPOINTFIELD'
+        templatePath = urlsplit(self._prepareURL(_TEMPLATE_FIELD_PATTERN.sub(placeholder, endpointTemplate))).path
+        pattern = re.escape(templatePath).replace(placeholder, '[^/]+') if fields else re.escape(templatePath)
+        return re.compile(pattern + '$')
+
+    def getEndpointLabel(self, url):
+        """
+        :param url: URL of a request
+        :type url: str
+        :return: Template of the URL's endpoint, or OTHER_ENDPOINT_LABEL if it doesn't match any
+        :rtype: str
+        """
+        path = urlsplit(url).path
+        for (endpointPattern, endpointTemplate) in self._endpointPatterns:
+            if endpointPattern.match(path):
+                return endpointTemplate
+        return OTHER_ENDPOINT_LABEL
+
+    def _recordRequestMetrics(self, preparedRequest, response, exception, seconds, retrying):
+        endpoint = self.getEndpointLabel(preparedRequest.url)
+        method = preparedRequest.method
+
+        status = str(response.status_code) if response is not None else exception.__class__.__name__
+        self.metricsRegistry.increment('http_requests_total', endpoint=endpoint, method=method, status=status)
+        self.metricsRegistry.observe('http_request_duration_seconds', seconds, endpoint=endpoint, method=method)
+        if response is not None:
+            self.metricsRegistry.increment('http_response_bytes_total', len(response.content), endpoint=endpoint,
+                                           method=method)
+        else:
+            self.metricsRegistry.increment('http_request_errors_total', endpoint=endpoint, method=method,
+                                           error=status)
+        if retrying:
+            self.metricsRegistry.increment('http_request_retries_total', endpoint=endpoint, method=method)
+
+    def _finishAttempt(self, preparedRequest, response, exception, attempt, seconds):
+        """
+        Decide whether a request that was just sent should be sent again, and
+        record it in the metrics.  Used by every way of sending requests.
+
+        :param preparedRequest: Request that was sent
+        :type preparedRequest: requests.PreparedRequest
+        :param response: Response received, or None
+        :type response: requests.Response
+        :param exception: Exception raised while sending the request, or None
+        :type exception: Exception
+        :param attempt: Number of times the request has been sent
+        :type attempt: int
+        :param seconds: Time taken to send the request and receive the response
+        :type seconds: float
+        :return: Seconds to wait before sending the request again, or None if it shouldn't be
+        :rtype: float or None
+        """
+        retryDelay = None
+        if self.retryPolicy is not None:
+            retryDelay = self.retryPolicy.getRetryDelay(preparedRequest, response, exception, attempt)
+        if self.metricsRegistry is not None:
+            self._recordRequestMetrics(preparedRequest, response, exception, seconds, retryDelay is not None)
+        return retryDelay
+
     def _sendRequest(self, httpMethod, apiQueryURI, **kwargs):
         """
         Append the specified query URI to the base URL,
@@ -87,12 +225,63 @@ class RequestsPlus(util.UtilMixin, object):
         """
         preparedAPIQueryURL = self._prepareURL(apiQueryURI)
         response = None
-        sessionRequestMethod = self.session.__getattribute__(httpMethod)
+        request = requests.Request(httpMethod.upper(), preparedAPIQueryURL, **kwargs)
 
         try:
-            response = sessionRequestMethod(preparedAPIQueryURL, **kwargs)
+            response = self._sendPreparedRequest(self.session.prepare_request(request))
         except requests.exceptions.RequestException as e:
-            logger.info( self._name + ' error: ' + e) # Python 3 message doesn't exist anymore? 
+            logger.warning('{} error for request {}: {}'.format(self._name, preparedAPIQueryURL, e))
+
+        return response
+
+    def _sendPreparedRequest(self, preparedRequest):
+        """
+        Send a prepared request with the session.  All requests, including those for
+        additional response pages, are sent by this method.  If there is an HTTP
+        cache, GET requests are revalidated with it.  If there is a rate limit
+        governor, it decides when the request is sent.  If there is a retry
+        policy, failed requests may be sent again.  If there is a metrics registry,
+        each time the request is sent is recorded in it.
+
+        :param preparedRequest: The request to be sent
+        :type preparedRequest: requests.PreparedRequest
+        :return: Response object
+        :rtype: requests.Response
+        """
+        useHTTPCache = self.httpCache is not None and preparedRequest.method == 'GET'
+
+        cacheEntry = self.httpCache.addValidators(preparedRequest) if useHTTPCache else None
+
+        sendSettings = self.session.merge_environment_settings(preparedRequest.url, {}, None, None, None)
+
+        attempt = 1
+        while True:
+            response = None
+            exception = None
+            if self.rateLimitGovernor is not None:
+                self.rateLimitGovernor.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.send(preparedRequest, **sendSettings)
+            except requests.exceptions.RequestException as e:
+                exception = e
+            finally:
+                if self.rateLimitGovernor is not None:
+                    self.rateLimitGovernor.release(response)
+
+            retryDelay = self._finishAttempt(preparedRequest, response, exception, attempt,
+                                             time.perf_counter() - start)
+            if retryDelay is None:
+                break
+
+            time.sleep(retryDelay)
+            attempt += 1
+
+        if exception is not None:
+            raise exception
+
+        if useHTTPCache:
+            response = self.httpCache.handleResponse(preparedRequest, response, cacheEntry)
 
         return response
 
@@ -129,6 +318,9 @@ class RequestsPlus(util.UtilMixin, object):
 
         response = self._sendRequest("get", apiQueryURI, **kwargs)
 
+        if response is None:
+            raise RuntimeError('No response for request: {apiQueryURI}'.format(**locals()))
+
         if not response.ok:
             raise RuntimeError('Error {response.status_code} "{response.reason}" for request: {apiQueryURI}'
                                .format(**locals()))
@@ -144,7 +336,7 @@ class RequestsPlus(util.UtilMixin, object):
         :return: ResponseCollection containing all response pages
         :rtype: RequestsPlus.ResponseCollection
         """
-        return ResponseCollection(response, session=self.session).collectAllResponsePages()
+        return self.responseCollection(response).collectAllResponsePages()
 
     def post(self, apiQueryURI, params=None, **kwargs):
         """
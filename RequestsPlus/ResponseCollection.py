@@ -1,7 +1,59 @@
 from argparse import Namespace
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 import requests
 
+import util
+from .JSONDecoder import decodeResponseJSON, makeJSONObjects
+
+PAGE_PARAM_NAME = 'page'
+
+
+def makeNamespaces(value):
+    """
+    Convert dictionaries parsed from JSON, including those nested in lists and
+    other dictionaries, to Namespace objects.
+
+    :param value: Value parsed from JSON
+    :type value: Any
+    :return: The value, with dictionaries replaced by Namespace objects
+    :rtype: Any
+    """
+    return makeJSONObjects(value, Namespace)
+
+
+def getNumberedPageURLs(nextPageURL, lastPageURL):
+    """
+    When the "next" and "last" page links use page numbers, make the URLs of
+    all the pages from "next" through "last".  Opaque page bookmarks can't
+    be counted like that, so they can only be followed one "next" link at a time.
+
+    :param nextPageURL: URL from the "next" link
+    :type nextPageURL: str
+    :param lastPageURL: URL from the "last" link
+    :type lastPageURL: str
+    :return: URLs of the remaining pages, in page order, or None if they can't be computed
+    :rtype: list of str or None
+    """
+    if nextPageURL is None or lastPageURL is None:
+        return None
+
+    nextPageURLParts = urlsplit(nextPageURL)
+    nextPageParams = parse_qsl(nextPageURLParts.query, keep_blank_values=True)
+    nextPageNumber = dict(nextPageParams).get(PAGE_PARAM_NAME, '')
+    lastPageNumber = dict(parse_qsl(urlsplit(lastPageURL).query)).get(PAGE_PARAM_NAME, '')
+
+    if not (nextPageNumber.isdigit() and lastPageNumber.isdigit()):
+        return None
+
+    pageURLs = []
+    for pageNumber in range(int(nextPageNumber), int(lastPageNumber) + 1):
+        pageParams = [(name, str(pageNumber) if name == PAGE_PARAM_NAME else value)
+                      for (name, value) in nextPageParams]
+        pageURLs.append(urlunsplit(nextPageURLParts._replace(query=urlencode(pageParams))))
+
+    return pageURLs
+
 
 class ResponseCollection(object):
     """
@@ -12,55 +64,159 @@ class ResponseCollection(object):
 
     class _LinksKeys(object):
         NEXT = 'next'
+        LAST = 'last'
         CHILD_URL = 'url'
 
-    def __init__(self, response=None, session=None):
+    def __init__(self, response=None, session=None, pageWorkerCount=1, requestSender=None, metricsRegistry=None,
+                 endpointLabeler=None):
         """
         :param response: A Response object
         :type response: requests.Response
         :param session: A Session object, helpful for reusing headers, etc.
         :type session: requests.Session
+        :param pageWorkerCount: Number of pages that may be requested at the same time
+        :type pageWorkerCount: int
+        :param requestSender: (optional) Function to send each page's PreparedRequest and
+            return its Response.  The session's send() method is used by default.
+        :type requestSender: callable
+        :param metricsRegistry: (optional) Metrics the number of pages collected is recorded in
+        :type metricsRegistry: metrics.MetricsRegistry
+        :param endpointLabeler: (optional) Function returning the endpoint label of a URL.
+            Its path is used by default.
+        :type endpointLabeler: callable
         """
         assert isinstance(response, requests.Response)
         self._currentResponse = response
         self._responses = [response]
         self._session = session if isinstance(session, requests.Session) \
             else requests.Session()
+        self._pageWorkerCount = pageWorkerCount
+        self._sendRequest = requestSender or self._session.send
+        self._metricsRegistry = metricsRegistry
+        self._endpointLabeler = endpointLabeler or (lambda url: urlsplit(url).path)
+        self._decodedJSON = {}  # JSON of each page in the collection, keyed by id() of its Response
+
+    def _getResponseJSON(self, response, **kwargs):
+        """
+        Decode the JSON of a page in the collection only the first time it's needed.
+        With arguments for Response.json(), the page is decoded by it every time instead.
+
+        :return: JSON items from the Response object
+        :rtype: list of Any
+        """
+        if kwargs:
+            return self._listJSON(response.json(**kwargs))
+
+        responseJSON = self._decodedJSON.get(id(response))
+        if responseJSON is None:
+            responseJSON = self._listJSON(decodeResponseJSON(response))
+            self._decodedJSON[id(response)] = responseJSON
+        return responseJSON
 
     def json(self, **kwargs):
         """
         Like the method from the requests Response class, return JSON from the
         response.  Since this operates on a collection, it gets the JSON from
         each Response object in the collection and combines them into one.
+        Each page is decoded once, by the fastest JSON library installed, unless
+        arguments for Response.json() are given.
 
-        :param kwargs: Arguments to pass to Response.json()
+        :param kwargs: (optional) Arguments to pass to Response.json()
         :type kwargs: mixed
         :return: Combined list of JSON from all Response objects
         :rtype: list of Any
         """
         allResponseJSON = []
-        for (responseNumber, response) in enumerate(self._responses):
-            responseJSON = response.json(**kwargs)
-            if type(responseJSON) is not list:
-                allResponseJSON.append(responseJSON)
-            else:
-                allResponseJSON.extend(responseJSON)
+        for response in self._responses:
+            allResponseJSON.extend(self._getResponseJSON(response, **kwargs))
 
         return allResponseJSON
 
-    def jsonObjects(self, **kwargs):
+    def jsonObjects(self, objectsFactory=makeNamespaces, **kwargs):
         """
+        Objects are made from all of the decoded JSON in one call of objectsFactory,
+        rather than one call of an object_hook for each dictionary.
 
-        :param kwargs: Optional keyword arguments to pass along to `json()`
+        :param objectsFactory: (optional) Function to make a list of objects from a list of
+            JSON items.  By default, dictionaries become Namespace objects.
+        :type objectsFactory: callable
+        :param kwargs: Optional keyword arguments to pass along to `json()`.  If an
+            object_hook is given, it's used instead of objectsFactory.
         :return: Namespace objects (not dictionaries) representing data from the JSON
         :rtype: list of Namespace
         """
-        OBJECT_HOOK_KEY = 'object_hook'
+        if kwargs:
+            return self.json(**kwargs)
+
+        return objectsFactory(self.json())
+
+    def iterJSON(self, **kwargs):
+        """
+        Generator version of json().  It yields the JSON items from each page as
+        soon as that page arrives, following the "next" links as it goes.  Pages
+        requested this way are not kept in the collection, so only one page at a
+        time needs to be held in memory.
+
+        :param kwargs: Arguments to pass to Response.json()
+        :type kwargs: mixed
+        :return: JSON items from each Response object, in order
+        :rtype: generator of Any
+        """
+        for pageJSON in self.iterPagesJSON(**kwargs):
+            for responseJSON in pageJSON:
+                yield responseJSON
+
+    def iterPagesJSON(self, **kwargs):
+        """
+        Like iterJSON(), but yields the list of JSON items from each page.
+
+        :param kwargs: Arguments to pass to Response.json()
+        :type kwargs: mixed
+        :return: List of JSON items from each Response object, in order
+        :rtype: generator of list
+        """
+        response = None
+        for response in self._responses:
+            yield self._getResponseJSON(response, **kwargs)
+
+        while response is not None and response.ok:
+            response = self._sendNextPageRequest(response)
+            if response is None:
+                break
+
+            self._currentResponse = response
+            if kwargs:
+                yield self._listJSON(response.json(**kwargs))
+            else:
+                yield self._listJSON(decodeResponseJSON(response))
+
+    def iterObjects(self, objectsFactory=makeNamespaces, **kwargs):
+        """
+        Generator version of jsonObjects().  Objects are made from each page's JSON
+        in one call of objectsFactory.
 
-        if OBJECT_HOOK_KEY not in kwargs:
-            kwargs[OBJECT_HOOK_KEY] = lambda jsonObject: Namespace(**jsonObject)
+        :param objectsFactory: (optional) Function to make a list of objects from a list of
+            JSON items.  By default, dictionaries become Namespace objects.
+        :type objectsFactory: callable
+        :param kwargs: Optional keyword arguments to pass along to `iterJSON()`.  If an
+            object_hook is given, it's used instead of objectsFactory.
+        :return: Namespace objects (not dictionaries) representing data from the JSON
+        :rtype: generator of Namespace
+        """
+        if kwargs:
+            for jsonObject in self.iterJSON(**kwargs):
+                yield jsonObject
+            return
 
-        return self.json(**kwargs)
+        for pageJSON in self.iterPagesJSON():
+            for jsonObject in objectsFactory(pageJSON):
+                yield jsonObject
+
+    @staticmethod
+    def _listJSON(responseJSON):
+        if type(responseJSON) is not list:
+            return [responseJSON]
+        return responseJSON
 
     def getNextPageURI(self, response=None):
         """
@@ -74,6 +230,18 @@ class ResponseCollection(object):
 
         return response.links.get(self._LinksKeys.NEXT, {}).get(self._LinksKeys.CHILD_URL)
 
+    def getLastPageURI(self, response=None):
+        """
+        :param response: The Response object queried for last page URI
+        :type response: requests.models.Response
+        :return: The URI from the "url" key of the Response object's "last" link, if one exists.  Otherwise, None.
+        :rtype: str
+        """
+        response = response or self._currentResponse
+        assert isinstance(response, requests.models.Response)
+
+        return response.links.get(self._LinksKeys.LAST, {}).get(self._LinksKeys.CHILD_URL)
+
     def getNextPageParams(self, response=None):
         """
         :param response: The Response object queried for next page params
@@ -93,24 +261,88 @@ class ResponseCollection(object):
 
     def collectAllResponsePages(self):
         """
+        When the number of remaining pages is known and more than one page worker is
+        allowed, the remaining pages are requested at the same time.  Otherwise, the
+        "next" links are followed one page at a time.
+
         :return: A ResponsePager object containing all pages following the initial Response
         :rtype: ResponseCollection
         """
         response = self._currentResponse
         """:type response: requests.models.Response"""
 
+        if response.ok and self._pageWorkerCount > 1:
+            pageURLs = getNumberedPageURLs(self.getNextPageURI(response), self.getLastPageURI(response))
+            if pageURLs:
+                self._collectNumberedPages(response, pageURLs)
+                self._recordPageCount()
+                return self
+
         while response.ok:
-            nextPageParams = self.getNextPageParams(response)
-            if nextPageParams is None:
+            response = self._sendNextPageRequest(response)
+            if response is None:
                 break
-            nextPageRequest = response.request.copy()
-            """:type nextPageRequest: requests.PreparedRequest"""
-            nextPageRequest.prepare_url(nextPageRequest.url, nextPageParams)
-            response = self._session.send(nextPageRequest)
 
             self._responses.append(response)
             self._currentResponse = response
 
+        self._recordPageCount()
+        return self
+
+    def _recordPageCount(self):
+        if self._metricsRegistry is None:
+            return
+
+        firstRequest = self._responses[0].request
+        endpoint = self._endpointLabeler(firstRequest.url) if firstRequest is not None else 'unknown'
+        self._metricsRegistry.observe('response_collection_pages', len(self._responses), endpoint=endpoint)
+
+    def _sendNextPageRequest(self, response):
+        """
+        :param response: The Response object whose "next" link is followed
+        :type response: requests.models.Response
+        :return: The next page's Response object, or None if there isn't a next page
+        :rtype: requests.models.Response or None
+        """
+        nextPageParams = self.getNextPageParams(response)
+        if nextPageParams is None:
+            return None
+        nextPageRequest = response.request.copy()
+        """:type nextPageRequest: requests.PreparedRequest"""
+        nextPageRequest.prepare_url(nextPageRequest.url, nextPageParams)
+        return self._sendRequest(nextPageRequest)
+
+    def _collectNumberedPages(self, response, pageURLs):
+        """
+        Request the listed pages at the same time, then add them to the collection
+        in page order.  Like following the "next" links, pages after the first
+        unsuccessful one are ignored.
+
+        :param response: The Response object whose request is copied for each page
+        :type response: requests.models.Response
+        :param pageURLs: URLs of the remaining pages, in page order
+        :type pageURLs: list of str
+        :return: This ResponseCollection, containing all of the pages
+        :rtype: ResponseCollection
+        """
+
+        def sendPageRequest(pageURL):
+            pageRequest = response.request.copy()
+            """:type pageRequest: requests.PreparedRequest"""
+            pageRequest.prepare_url(pageURL, None)
+            return self._sendRequest(pageRequest)
+
+        for (pageURL, pageResponse, exception) in util.mapConcurrently(sendPageRequest, pageURLs,
+                                                                       self._pageWorkerCount):
+            if exception is not None:
+                raise exception
+
+            self._responses.append(pageResponse)
+            self._currentResponse = pageResponse
+
+            if not pageResponse.ok:
+                break
+
         return self
 
     def getCurrentResponse(self):
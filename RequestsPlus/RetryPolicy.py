@@ -0,0 +1,167 @@
+# Decides whether a failed request should be sent again, and after how long.
+
+import email.utils
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+import requests
+
+from .RateLimitGovernor import RateLimitGovernor
+
+HTTP_HEADER_RETRY_AFTER = 'Retry-After'
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+RETRY_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY_SECONDS = 0.5
+DEFAULT_MAX_DELAY_SECONDS = 30
+DEFAULT_RETRY_BUDGET = 50
+DEFAULT_MAX_THROTTLED_ATTEMPTS = 8
+
+THROTTLED_REASON = 'rate limit exceeded'
+
+
+class RetryPolicy(object):
+    """
+    The :class:`RetryPolicy<RequestsPlus.RetryPolicy>` object allows idempotent
+    requests to be sent again after connection errors, timeouts, "429 Too Many
+    Requests", 5xx errors, and requests refused by Canvas' rate limit.
+
+    The delay before each retry is the response's "Retry-After" time, if it has
+    one.  Otherwise, it's random, up to an exponentially growing maximum ("full
+    jitter"), so threads that failed together don't retry together.
+
+    The budget limits the total number of retries by everything using the
+    policy, so a run against an unhealthy server fails quickly instead of
+    retrying every request.  Requests refused by the rate limit aren't
+    retried from the budget: a busy run may be throttled many times while
+    Canvas is healthy, and the rate limit governor already holds requests
+    until the quota leaks back.  They are limited by 'maxThrottledAttempts'
+    instead, and are retried whatever their method, since Canvas didn't
+    process them.
+    """
+
+    def __init__(self, maxAttempts=DEFAULT_MAX_ATTEMPTS, baseDelay=DEFAULT_BASE_DELAY_SECONDS,
+                 maxDelay=DEFAULT_MAX_DELAY_SECONDS, retryBudget=DEFAULT_RETRY_BUDGET,
+                 maxThrottledAttempts=DEFAULT_MAX_THROTTLED_ATTEMPTS):
+        """
+        :param maxAttempts: Most times one request is sent, including the first
+        :type maxAttempts: int
+        :param baseDelay: Maximum delay in seconds before the first retry, doubled for each later retry
+        :type baseDelay: float
+        :param maxDelay: Longest delay in seconds before any retry
+        :type maxDelay: float
+        :param retryBudget: Most retries of all requests together, not counting those of requests refused
+            by the rate limit.  None for no limit.
+        :type retryBudget: int
+        :param maxThrottledAttempts: Most times one request is sent while it's refused by the rate limit
+        :type maxThrottledAttempts: int
+        """
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.retryBudget = retryBudget
+        self.maxThrottledAttempts = maxThrottledAttempts
+
+        self.retries = 0
+        self.throttledRetries = 0  # Retries of requests refused by the rate limit, not taken from the budget
+        self.retriesRefused = 0  # Retries not made because the budget was used up
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def getRetryReason(response, exception):
+        """
+        :param response: Response received, or None
+        :type response: requests.Response
+        :param exception: Exception raised while sending the request, or None
+        :type exception: Exception
+        :return: Why the request may be retried, or None if it shouldn't be
+        :rtype: str or None
+        """
+        if isinstance(exception, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return exception.__class__.__name__
+        if response is None:
+            return None
+        if response.status_code in RETRY_STATUS_CODES:
+            return 'HTTP {}'.format(response.status_code)
+        if RateLimitGovernor.isThrottled(response):
+            return THROTTLED_REASON
+        return None
+
+    def _getRetryAfter(self, response):
+        retryAfter = response.headers.get(HTTP_HEADER_RETRY_AFTER) if response is not None else None
+        if not retryAfter:
+            return None
+
+        try:
+            return max(0.0, float(retryAfter))
+        except ValueError:
+            pass
+
+        retryTime = email.utils.parsedate_tz(retryAfter)
+        if retryTime is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(retryTime) - time.time())
+
+    def getRetryDelay(self, preparedRequest, response, exception, attempt):
+        """
+        Decide whether to send a request again.  Each retry allowed is taken from the budget,
+        unless the request was refused by the rate limit.
+
+        :param preparedRequest: Request that was sent
+        :type preparedRequest: requests.PreparedRequest
+        :param response: Response received, or None
+        :type response: requests.Response
+        :param exception: Exception raised while sending the request, or None
+        :type exception: Exception
+        :param attempt: Number of times the request has been sent
+        :type attempt: int
+        :return: Seconds to wait before sending the request again, or None if it shouldn't be
+        :rtype: float or None
+        """
+        reason = self.getRetryReason(response, exception)
+        if reason is None:
+            return None
+
+        if reason == THROTTLED_REASON:
+            if attempt >= self.maxThrottledAttempts:
+                return None
+            with self._lock:
+                self.throttledRetries += 1
+        else:
+            if preparedRequest.method not in IDEMPOTENT_METHODS or attempt >= self.maxAttempts:
+                return None
+
+            with self._lock:
+                if self.retryBudget is not None and self.retries >= self.retryBudget:
+                    if self.retriesRefused == 0:
+                        logger.warning('Retry budget of {} used up, requests will not be retried'
+                                       .format(self.retryBudget))
+                    self.retriesRefused += 1
+                    return None
+                self.retries += 1
+
+        delay = self._getRetryAfter(response)
+        if delay is None:
+            delay = random.uniform(0, self.baseDelay * 2 ** (attempt - 1))
+        delay = min(delay, self.maxDelay)
+
+        logger.warning('Retrying request in {:.1f} seconds ({}, attempt {} of {}): {}'
+                       .format(delay, reason, attempt + 1,
+                               self.maxThrottledAttempts if reason == THROTTLED_REASON else self.maxAttempts,
+                               preparedRequest.url))
+        return delay
+
+    def getStats(self):
+        """
+        :return: Number of retries made from the budget, refused because the budget was used up, and
+            made for requests refused by the rate limit
+        :rtype: dict
+        """
+        with self._lock:
+            return {'retries': self.retries, 'retriesRefused': self.retriesRefused,
+                    'throttledRetries': self.throttledRetries}
@@ -1,2 +1,6 @@
 from . RequestsPlus import *
+from . JSONDecoder import *
 from . ResponseCollection import *
+from . HTTPCache import *
+from . RateLimitGovernor import *
+from . RetryPolicy import *
@@ -2,6 +2,7 @@
 
 import datetime
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +15,7 @@ import config
 # secrets really is used during (import to change sensitive properties).
 import secrets  # @UnusedImport
 
+import metrics
 import util
 
 ##### Improved code tracebacks for exceptions
@@ -32,10 +34,25 @@ RUN_START_TIME_FORMATTED = RUN_START_TIME.strftime('%Y%m%d%H%M%S')
 # Hold parsed options
 options = None
 
+# All groups created for assignments have this tag.
+KARTOGRAAFR_GROUP_TAG = 'kartograafr'
+
 # TODO: required in this module?
 courseLogHandlers = dict()
 courseLoggers = dict()
 
+# Limits the ArcGIS calls made at the same time by all threads, whether they update different groups or
+# different chunks of one group's members.
+callSemaphore = threading.BoundedSemaphore(config.Application.Concurrency.ARCGIS_MAX_IN_FLIGHT_CALLS)
+
+def callArcGIS(operation, function, *args, **kwargs):
+    """Call an ArcGIS API function, recording it in the run's metrics as the named operation.  Waits while
+    Concurrency.ARCGIS_MAX_IN_FLIGHT_CALLS other calls are being made.  The wait isn't part of the recorded time."""
+    with callSemaphore:
+        with metrics.registry.timeOperation(operation):
+            return function(*args, **kwargs)
+
+
 def getArcGISConnection(securityinfo):
     """
     Get a connection object for ArcGIS based on configuration options
@@ -50,9 +67,10 @@ def getArcGISConnection(securityinfo):
         raise TypeError('Argument securityinfo type should be dict')
 
     try:
-        arcGIS = GIS(securityinfo['org_url'],
-                     securityinfo['username'],
-                     securityinfo['password']);
+        arcGIS = callArcGIS('connect', GIS,
+                            securityinfo['org_url'],
+                            securityinfo['username'],
+                            securityinfo['password']);
     except RuntimeError as exp:
         logger.error("RuntimeError: getArcGISConnection: {}".format(exp))
         raise RuntimeError(str('ArcGIS connection invalid: {}'.format(exp)))
@@ -80,7 +98,7 @@ def getArcGISGroupByTitle(arcGISAdmin, title):
     logger.debug("group search string: escaped: {}".format(searchString))
     
     try:
-        gis_groups = arcGISAdmin.groups.search(searchString)
+        gis_groups = callArcGIS('groups.search', arcGISAdmin.groups.search, searchString)
     except RuntimeError as exp:
         logger.error("arcGIS error finding group: {} exception: {}".format(searchString,exp))
         return None
@@ -91,22 +109,199 @@ def getArcGISGroupByTitle(arcGISAdmin, title):
     return None
 
 
-def addCanvasUsersToGroup(instructorLog, group, courseUsers):
-    """Add new users to the ArcGIS group.  """
+class ArcGISGroupIndex(object):
+    """
+    Index of the ArcGIS groups created for assignments, loaded with a single
+    tag search at the start of a run.  Lookups are answered from the index and
+    only groups missing from it are searched for individually.
+
+    Group titles have the form "{courseName}_{courseID}_{assignmentName}_{assignmentID}".
+    The names may contain underscores, so groups are also indexed by assignment ID,
+    which is always the last part of the title.
+    """
+
+    def __init__(self, arcGIS, tag=KARTOGRAAFR_GROUP_TAG, maxGroups=None):
+        """
+        :param arcGIS: ArcGIS connection object
+        :type arcGIS: GIS
+        :param tag: Tag of the groups to be indexed
+        :type tag: str
+        :param maxGroups: Maximum number of groups to get from the search
+        :type maxGroups: int
+        """
+        self.arcGIS = arcGIS
+        self.tag = tag
+        self.maxGroups = maxGroups or config.ArcGIS.GROUP_INDEX_MAX_GROUPS
+        self.hits = 0
+        self.misses = 0
+        self._groupsByTitle = {}
+        self._groupsByAssignmentID = {}
+        self._lock = threading.Lock()
+
+        self.load()
+
+    def load(self):
+        """
+        Replace the contents of the index with the results of a tag search.
+        If the search fails, the index is left empty and every lookup falls
+        back to a title search.
+        """
+        try:
+            groups = callArcGIS('groups.search', self.arcGIS.groups.search, 'tags:' + self.tag,
+                                max_groups=self.maxGroups)
+        except RuntimeError as exception:
+            logger.error('ArcGIS error loading groups tagged "{}": {}'.format(self.tag, exception))
+            groups = []
+
+        with self._lock:
+            self._groupsByTitle = {}
+            self._groupsByAssignmentID = {}
+        for group in groups:
+            # The search may also match tags that merely contain this one.
+            if self.tag in (getattr(group, 'tags', None) or [self.tag]):
+                self.add(group)
+
+        logger.info('Indexed {} ArcGIS groups tagged "{}"'.format(len(self._groupsByTitle), self.tag))
+        if len(groups) >= self.maxGroups:
+            logger.warning('ArcGIS group index may be incomplete, {} groups found'.format(len(groups)))
+
+    @staticmethod
+    def getAssignmentIDFromTitle(title):
+        """
+        :param title: Group title
+        :type title: str
+        :return: Assignment ID from the end of the title, or None if the title doesn't end with one
+        :rtype: int or None
+        """
+        idString = title.rpartition('_')[2]
+        return int(idString) if idString.isdigit() else None
+
+    def add(self, group):
+        """
+        Add a group, e.g. one that was just created, to the index.
+
+        :param group: ArcGIS group
+        :type group: Group
+        """
+        with self._lock:
+            self._groupsByTitle[group.title] = group
+            assignmentID = self.getAssignmentIDFromTitle(group.title)
+            if assignmentID is not None:
+                self._groupsByAssignmentID[assignmentID] = group
+
+    def getGroupForAssignment(self, courseID, assignmentID):
+        """
+        :param courseID: Canvas course ID
+        :type courseID: int
+        :param assignmentID: Canvas assignment ID
+        :type assignmentID: int
+        :return: Indexed group for the assignment, even if its title has changed, or None
+        :rtype: Group or None
+        """
+        with self._lock:
+            group = self._groupsByAssignmentID.get(assignmentID)
+        if group is not None and '_{}_'.format(courseID) in group.title:
+            return group
+        return None
+
+    def getGroupByTitle(self, title):
+        """
+        Find a group with the title in the index, or search for it if it isn't there.
+
+        :param title: Group title to be found
+        :type title: str
+        :return: ArcGIS Group object or None
+        :rtype: Group or None
+        """
+        with self._lock:
+            group = self._groupsByTitle.get(title)
+            if group is not None:
+                self.hits += 1
+                return group
+            self.misses += 1
+
+        group = getArcGISGroupByTitle(self.arcGIS, title)
+        if group is not None:
+            self.add(group)
+        return group
+
+    def getStats(self):
+        """
+        :return: Counts of groups indexed and of lookups answered from the index (hits) or by searching (misses)
+        :rtype: dict
+        """
+        with self._lock:
+            return {'groups': len(self._groupsByTitle), 'hits': self.hits, 'misses': self.misses}
+
+
+def changeMembersInChunks(changeMembers, users, resultKey, chunkSize=None, workerCount=None):
+    """Call changeMembers for chunks of users, with some chunks at the same time, so no
+    single ArcGIS request contains too many users.  The users not changed (results[resultKey])
+    by every chunk are combined in order into a single result.
+
+    :param changeMembers: Function adding or removing a list of users, returning ArcGIS' results
+    :type changeMembers: callable
+    :param users: ArcGIS usernames
+    :type users: list of str
+    :param resultKey: Key of the users not changed in ArcGIS' results, e.g. "notAdded"
+    :type resultKey: str
+    :param chunkSize: Most users in one request.  By default, config.ArcGIS.MEMBERSHIP_CHUNK_SIZE.
+    :type chunkSize: int
+    :param workerCount: Most requests at the same time.  By default,
+        config.Application.Concurrency.ARCGIS_MEMBERSHIP_WORKER_COUNT.
+    :type workerCount: int
+    :return: Combined results
+    :rtype: dict
+    :raises Exception: The first exception raised for any chunk, after all chunks were tried
+    """
+    if chunkSize is None:
+        chunkSize = config.ArcGIS.MEMBERSHIP_CHUNK_SIZE
+    if workerCount is None:
+        workerCount = config.Application.Concurrency.ARCGIS_MEMBERSHIP_WORKER_COUNT
+
+    chunks = util.chunkList(users, chunkSize)
+    if len(chunks) > 1:
+        logger.info('Changing {} ArcGIS group members in {} requests of up to {}'
+                    .format(len(users), len(chunks), chunkSize))
+
+    results = {resultKey: []}
+    firstException = None
+    for (chunk, chunkResults, exception) in util.mapConcurrently(changeMembers, chunks, workerCount):
+        if exception is not None:
+            logger.error('Exception while changing ArcGIS group members {}: {}'.format(chunk, exception))
+            firstException = firstException or exception
+            continue
+        results[resultKey].extend((chunkResults or {}).get(resultKey) or [])
+
+    if firstException is not None:
+        raise firstException
+
+    return results
+
+
+def addCanvasUsersToGroup(instructorLog, group, courseUsers, usersNotAddable=frozenset()):
+    """Add new users to the ArcGIS group, in chunks.  Return the updated log and results from ArcGIS.
+    ArcGIS users already known not to be addable (usersNotAddable) aren't sent, but are reported as not added."""
     groupNameAndID = util.formatNameAndID(group)
     
     logger.info("addCanvasUsersToGroup: enter")
     
     if len(courseUsers) == 0:
         logger.info('No new users to add to ArcGIS Group {}'.format(groupNameAndID))
-        return instructorLog
+        return instructorLog, {}
 
     logger.info('Adding Canvas Users to ArcGIS Group {}: {}'.format(groupNameAndID, courseUsers))
     # ArcGIS usernames are U-M uniqnames with the ArcGIS organization name appended.
     arcGISFormatUsers = formatUsersNamesForArcGIS(courseUsers)
     logger.debug("addCanvasUsersToGroup: formatted: {}".format(arcGISFormatUsers))
     
-    results = group.add_users(arcGISFormatUsers)
+    skippedUsers = [user for user in arcGISFormatUsers if user in usersNotAddable]
+    results = {'notAdded': []}
+    if len(skippedUsers) < len(arcGISFormatUsers):
+        results = changeMembersInChunks(lambda chunk: callArcGIS('group.add_users', group.add_users, chunk),
+                                        [user for user in arcGISFormatUsers if user not in usersNotAddable],
+                                        'notAdded')
+    results['notAdded'] = skippedUsers + results['notAdded']
     logger.debug("adding: results: {}".format(results))
 
     usersNotAdded = results.get('notAdded')
@@ -124,14 +319,14 @@ def addCanvasUsersToGroup(instructorLog, group, courseUsers):
     logger.debug("aCUTG: instructorLog 3: [{}]".format(instructorLog))
 
     logger.info("addCanvasUsersToGroup: instructorLog: [{}]".format(instructorLog))
-    return instructorLog
+    return instructorLog, results
 
 
 def getCurrentArcGISMembers(group, groupNameAndID):
     groupAllMembers = {}
 
     try:
-        groupAllMembers = group.get_members()
+        groupAllMembers = callArcGIS('group.get_members', group.get_members)
     except RuntimeError as exception:
         logger.error('Exception while getting users for ArcGIS group "{}": {}'.format(groupNameAndID, exception))
             
@@ -140,7 +335,7 @@ def getCurrentArcGISMembers(group, groupNameAndID):
     return groupUsers
 
 def removeListOfUsersFromArcGISGroup(group, groupNameAndID, groupUsers):
-    """Remove only listed users from ArcGIS group."""
+    """Remove only listed users from ArcGIS group, in chunks."""
 
     if len(groupUsers) == 0:
         logger.info('No obsolete users to remove from ArcGIS Group {}'.format(groupNameAndID))
@@ -149,7 +344,9 @@ def removeListOfUsersFromArcGISGroup(group, groupNameAndID, groupUsers):
     logger.info('ArcGIS Users to be removed from ArcGIS Group [{}] [{}]'.format(groupNameAndID, ','.join(groupUsers)))
     results = None
     try:
-            results = group.removeUsersFromGroup(','.join(groupUsers))
+            results = changeMembersInChunks(lambda chunk: callArcGIS('group.removeUsersFromGroup',
+                                                                     group.removeUsersFromGroup, ','.join(chunk)),
+                                            groupUsers, 'notRemoved')
     except RuntimeError as exception:
             logger.error('Exception while removing users from ArcGIS group "{}": {}'.format(groupNameAndID, exception))
             return None
@@ -183,20 +380,24 @@ def createNewArcGISGroup(arcGIS, groupTags, groupTitle,instructorLog):
     logger.info('Creating ArcGIS group: "{}"'.format(groupTitle))
     instructorLog += 'Creating ArcGIS group: "{}"\n'.format(groupTitle)
     try:
-        group = arcGIS.groups.create(groupTitle,groupTags)
+        group = callArcGIS('groups.create', arcGIS.groups.create, groupTitle, groupTags)
     except RuntimeError as exception:
         logger.exception('Exception while creating ArcGIS group "{}": {}'.format(groupTitle, exception))
     
     return group, instructorLog
 
 # Get ArcGIS group with this title (if it exists)
-def lookForExistingArcGISGroup(arcGIS, groupTitle):
-    """Find an ArgGIS group with a matching title."""
+def lookForExistingArcGISGroup(arcGIS, groupTitle, groupIndex=None):
+    """Find an ArgGIS group with a matching title, in the group index if one is given."""
     logger.info('Searching for existing ArcGIS group "{}"'.format(groupTitle))
+    group = None
     try:
+        if groupIndex is not None:
+            group = groupIndex.getGroupByTitle(groupTitle)
+        else:
             group = getArcGISGroupByTitle(arcGIS, groupTitle)
     except RuntimeError as exception:
-            logger.exception('Exception while searching for ArcGIS group "{}": {}'.format(groupTitle, exception))
+        logger.exception('Exception while searching for ArcGIS group "{}": {}'.format(groupTitle, exception))
             
     return group
 
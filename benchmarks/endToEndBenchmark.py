@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# End-to-end benchmark of kartograafr runs against a fake Canvas server and a
+# fake ArcGIS organization, with synthetic courses of different sizes.
+#
+# Each run of main.main() is made in a new process, so its peak memory use
+# (RSS) is its own.  The fake Canvas server runs in this process, the fake
+# ArcGIS organization in the run's process, in place of the arcgis package.
+# Logs, caches and sync state of a scenario's runs are kept in a temporary
+# directory, so later runs show the effect of the caches and the sync state.
+#
+# Usage:
+#   python benchmarks/endToEndBenchmark.py [--scenario small ...] [--runs N]
+#       [--canvas-latency SECONDS] [--arcgis-latency SECONDS] [--async | --graphql] [--mail]
+#   python benchmarks/endToEndBenchmark.py --courses 100 --assignments 4 --roster 30
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIRECTORY))
+
+from fakeCanvas import FakeCanvas, DEFAULT_REQUEST_COST, DEFAULT_BUCKET_SIZE
+from scenarios import SCENARIOS, Scenario, CONFIG_COURSE_ID, CONFIG_COURSE_PAGE_NAME, TARGET_OUTCOME_ID
+
+ARCGIS_GROUPS_FILE_NAME = 'arcgis-groups.json'
+
+
+def configure(config, workDirectory, apiBaseURL, useGraphQL=False):
+    """
+    Point kartograafr's configuration at the fake Canvas server, and keep
+    everything it writes in the work directory.
+    """
+    logDirectory = os.path.join(workDirectory, 'log')
+    stateDirectory = os.path.join(logDirectory, 'state')
+
+    config.Application.Logging.DIRECTORY = logDirectory
+    config.Application.Logging.COURSE_DIRECTORY = os.path.join(logDirectory, 'courses')
+    config.Application.STATE_DIRECTORY = stateDirectory
+    config.Application.SYNC_STATE_PATH = os.path.join(stateDirectory, 'sync-state.sqlite')
+    config.Application.OUTBOX_DIRECTORY = os.path.join(stateDirectory, 'outbox')
+    config.Application.METRICS_TEXTFILE_PATH = os.path.join(stateDirectory, 'metrics', 'kartograafr.prom')
+    config.Application.METRICS_JSON_PATH = os.path.join(stateDirectory, 'metrics', 'kartograafr.json')
+    if config.Canvas.HTTP_CACHE_DIRECTORY is not None:
+        config.Canvas.HTTP_CACHE_DIRECTORY = os.path.join(stateDirectory, 'http-cache')
+    if config.Canvas.OBJECT_CACHE_PATH is not None:
+        config.Canvas.OBJECT_CACHE_PATH = os.path.join(stateDirectory, 'canvas-objects.sqlite')
+
+    config.Canvas.API_BASE_URL = apiBaseURL
+    config.Canvas.TARGET_OUTCOME_ID = TARGET_OUTCOME_ID
+    config.Canvas.CONFIG_COURSE_ID = CONFIG_COURSE_ID
+    config.Canvas.CONFIG_COURSE_PAGE_NAME = CONFIG_COURSE_PAGE_NAME
+    config.Canvas.USE_GRAPHQL = useGraphQL
+
+    for directory in (config.Application.Logging.COURSE_DIRECTORY, stateDirectory):
+        os.makedirs(directory, exist_ok=True)
+
+
+def getPeakRSSMegabytes():
+    """
+    :return: Peak resident set size of this process
+    :rtype: float
+    """
+    maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return maxRSS / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0)
+
+
+def getHTTPRequestCount(metricsSummary):
+    return sum(series['value'] for series in metricsSummary.get('kartograafr_http_requests_total', []))
+
+
+def runMain(spec):
+    """
+    Run main.main() once, in this process, as given by the spec from runInProcess().
+    """
+    scenario = Scenario(**spec['scenario'])
+
+    from fakeArcGIS import FakeArcGISService, installModule
+    arcGISService = FakeArcGISService(
+        latency=spec['arcGISLatency'],
+        hasAccount=lambda username: scenario.hasArcGISAccount(username.rpartition('_')[0]))
+    groupsPath = os.path.join(spec['workDirectory'], ARCGIS_GROUPS_FILE_NAME)
+    if os.path.exists(groupsPath):
+        arcGISService.loadGroups(groupsPath)
+    installModule(arcGISService)
+
+    import config
+    configure(config, spec['workDirectory'], spec['apiBaseURL'], spec['useGraphQL'])
+
+    import main
+    import metrics
+
+    sys.argv = ['main.py'] + spec['mainArguments']
+    start = time.perf_counter()
+    error = None
+    try:
+        main.main()
+    except Exception as exception:
+        error = '{}: {}'.format(type(exception).__name__, exception)
+    wallSeconds = time.perf_counter() - start
+
+    main.reportPhaseTimes()
+    arcGISService.saveGroups(groupsPath)
+
+    return OrderedDict([
+        ('wallSeconds', wallSeconds),
+        ('peakRSSMegabytes', getPeakRSSMegabytes()),
+        ('httpRequests', getHTTPRequestCount(metrics.registry.getSummary())),
+        ('arcGIS', arcGISService.getStats()),
+        ('phases', main.phaseTimer.phaseTimes if main.phaseTimer is not None else {}),
+        ('error', error),
+    ])
+
+
+def runInProcess(scenario, workDirectory, fakeCanvas, args):
+    """
+    Run main.main() in a new process of this script.
+
+    :return: Results of the run
+    :rtype: dict
+    """
+    resultPath = os.path.join(workDirectory, 'result.json')
+    specPath = os.path.join(workDirectory, 'spec.json')
+    mainArguments = [argument for (argument, enabled) in (('--async', args.useAsync), ('--mail', args.mail))
+                     if enabled]
+    spec = {
+        'scenario': OrderedDict([('name', scenario.name), ('courseCount', scenario.courseCount),
+                                 ('assignmentCount', scenario.assignmentCount), ('rosterSize', scenario.rosterSize)]),
+        'workDirectory': workDirectory,
+        'apiBaseURL': fakeCanvas.apiBaseURL,
+        'arcGISLatency': args.arcGISLatency,
+        'useGraphQL': args.useGraphQL,
+        'mainArguments': mainArguments,
+        'resultPath': resultPath,
+    }
+    with open(specPath, 'w') as specFile:
+        json.dump(spec, specFile)
+
+    canvasStatsBefore = fakeCanvas.getStats()
+    subprocess.check_call([sys.executable, os.path.abspath(__file__), '--run-spec', specPath],
+                          stdout=subprocess.DEVNULL, cwd=os.path.dirname(BENCHMARKS_DIRECTORY))
+    canvasStatsAfter = fakeCanvas.getStats()
+
+    with open(resultPath) as resultFile:
+        result = json.load(resultFile, object_pairs_hook=OrderedDict)
+
+    endpointRequests = dict((endpoint, count - canvasStatsBefore['endpoints'].get(endpoint, 0))
+                            for (endpoint, count) in canvasStatsAfter['endpoints'].items())
+    result['canvas'] = OrderedDict([
+        ('requests', canvasStatsAfter['requests'] - canvasStatsBefore['requests']),
+        ('endpoints', dict((endpoint, count) for (endpoint, count) in endpointRequests.items() if count)),
+        ('throttled', canvasStatsAfter['statuses'].get('403', 0) - canvasStatsBefore['statuses'].get('403', 0)),
+        ('notModified', canvasStatsAfter['statuses'].get('304', 0) - canvasStatsBefore['statuses'].get('304', 0)),
+    ])
+    return result
+
+
+def runScenario(scenario, args):
+    """
+    :return: Results of each of the scenario's runs
+    :rtype: list of dict
+    """
+    workDirectory = tempfile.mkdtemp(prefix='kartograafr-benchmark-{}-'.format(scenario.name))
+    results = []
+    try:
+        with FakeCanvas(scenario, latency=args.canvasLatency, requestCost=args.canvasRequestCost,
+                        bucketSize=DEFAULT_BUCKET_SIZE, leakRate=args.canvasLeakRate) as fakeCanvas:
+            for runNumber in range(1, args.runs + 1):
+                result = runInProcess(scenario, workDirectory, fakeCanvas, args)
+                result['scenario'] = scenario.getSummary()
+                result['run'] = runNumber
+                results.append(result)
+                printResult(result)
+    finally:
+        if args.keep:
+            print('Logs and state of scenario "{}" kept in {}'.format(scenario.name, workDirectory))
+        else:
+            shutil.rmtree(workDirectory, ignore_errors=True)
+    return results
+
+
+def printHeader():
+    print('{:<10} {:>7} {:>6} {:>6} {:>4} {:>10} {:>8} {:>6} {:>6} {:>8} {:>10}'.format(
+        'Scenario', 'Courses', 'Assign', 'Roster', 'Run', 'Wall (s)', 'Canvas', '304s', '403s', 'ArcGIS',
+        'Peak RSS'))
+
+
+def printResult(result):
+    scenario = result['scenario']
+    print('{:<10} {:>7} {:>6} {:>6} {:>4} {:>10.2f} {:>8} {:>6} {:>6} {:>8} {:>7.1f} MB{}'.format(
+        scenario['name'], scenario['courses'], scenario['assignmentsPerCourse'], scenario['rosterSize'],
+        result['run'], result['wallSeconds'], result['canvas']['requests'], result['canvas']['notModified'],
+        result['canvas']['throttled'], result['arcGIS']['calls'], result['peakRSSMegabytes'],
+        '  ERROR: ' + result['error'] if result['error'] else ''))
+
+
+def main():
+    argumentParser = argparse.ArgumentParser(
+        description='Benchmark kartograafr runs against fake Canvas and ArcGIS services')
+    argumentParser.add_argument('--scenario', dest='scenarios', action='append', choices=list(SCENARIOS),
+                                help='Scenario to run, may be repeated.  By default, "small" and "medium".')
+    argumentParser.add_argument('--courses', type=int, help='Run a custom scenario with this many courses')
+    argumentParser.add_argument('--assignments', type=int, default=3, help='Assignments per course of a custom scenario')
+    argumentParser.add_argument('--roster', type=int, default=40, help='Users per course of a custom scenario')
+    argumentParser.add_argument('--runs', type=int, default=2,
+                                help='Runs of each scenario, sharing caches and sync state')
+    argumentParser.add_argument('--canvas-latency', dest='canvasLatency', type=float, default=0.0,
+                                help='Seconds before each Canvas response')
+    argumentParser.add_argument('--canvas-request-cost', dest='canvasRequestCost', type=float,
+                                default=DEFAULT_REQUEST_COST, help='Canvas rate limit quota taken by each request')
+    argumentParser.add_argument('--canvas-leak-rate', dest='canvasLeakRate', type=float, default=0.0,
+                                help='Canvas rate limit quota regained per second, 0 for no limit')
+    argumentParser.add_argument('--arcgis-latency', dest='arcGISLatency', type=float, default=0.0,
+                                help='Seconds taken by each ArcGIS call')
+    argumentParser.add_argument('--async', dest='useAsync', action='store_true',
+                                help='Run main.py with --async')
+    argumentParser.add_argument('--graphql', dest='useGraphQL', action='store_true',
+                                help='Get course data with the Canvas GraphQL API')
+    argumentParser.add_argument('--mail', action='store_true', help='Run main.py with --mail')
+    argumentParser.add_argument('--json', help='Also write the results, with phase times, to this JSON file')
+    argumentParser.add_argument('--keep', action='store_true', help='Keep the logs and state of each scenario')
+    argumentParser.add_argument('--run-spec', dest='runSpec', help=argparse.SUPPRESS)
+    args = argumentParser.parse_args()
+
+    if args.runSpec is not None:
+        with open(args.runSpec) as specFile:
+            spec = json.load(specFile)
+        result = runMain(spec)
+        with open(spec['resultPath'], 'w') as resultFile:
+            json.dump(result, resultFile)
+        return
+
+    if args.courses is not None:
+        scenarios = [Scenario('custom', args.courses, args.assignments, args.roster)]
+    else:
+        scenarios = [SCENARIOS[name] for name in args.scenarios or ['small', 'medium']]
+
+    printHeader()
+    results = []
+    for scenario in scenarios:
+        results.extend(runScenario(scenario, args))
+
+    if args.json:
+        with open(args.json, 'w') as jsonFile:
+            json.dump(results, jsonFile, indent=2)
+            jsonFile.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+# In-process stand-in for the parts of arcgis.gis.GIS used by arcgisUM:
+# searching for and creating groups, and getting, adding and removing their
+# members.  Every call can be made to take a while, like one to ArcGIS Online.
+#
+# installModule() puts it in sys.modules as "arcgis.gis", so it must be called
+# before arcgisUM is imported.  It's meant only for benchmark processes.
+
+import functools
+import itertools
+import json
+import sys
+import threading
+import time
+import types
+from collections import Counter
+
+DEFAULT_MAX_GROUPS = 1000  # Like arcgis' GroupManager.search()
+ADMIN_USERNAME = 'kartograafr_admin'
+
+
+class FakeArcGISService(object):
+    """
+    The :class:`FakeArcGISService<fakeArcGIS.FakeArcGISService>` object holds
+    the groups of a fake ArcGIS organization, shared by all the connections
+    made to it, and counts the calls of each operation.
+    """
+
+    def __init__(self, latency=0, hasAccount=None):
+        """
+        :param latency: Seconds each call takes
+        :type latency: float
+        :param hasAccount: (optional) Whether a username has an ArcGIS account.  Users without
+            one are not added to groups.  By default, everyone has an account.
+        :type hasAccount: callable
+        """
+        self.latency = latency
+        self.hasAccount = hasAccount or (lambda username: True)
+        self.groups = {}  # Keyed by ID
+        self.callCounts = Counter()
+        self._groupIDs = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def call(self, operation):
+        """
+        Count a call of the operation and take the time of one.
+
+        :param operation: Name of the operation, like those recorded by arcgisUM.callArcGIS()
+        :type operation: str
+        """
+        with self._lock:
+            self.callCounts[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def getStats(self):
+        """
+        :return: Number of calls, calls of each operation, and number of groups
+        :rtype: dict
+        """
+        with self._lock:
+            return {'calls': sum(self.callCounts.values()), 'operations': dict(self.callCounts),
+                    'groups': len(self.groups)}
+
+    def saveGroups(self, path):
+        """
+        Write the groups and their members, so a later process can load them.
+
+        :param path: Path of the JSON file
+        :type path: str
+        """
+        with self._lock:
+            groups = [{'id': group.id, 'title': group.title, 'tags': group.tags, 'modified': group.modified,
+                       'members': group._members} for group in self.groups.values()]
+        with open(path, 'w') as groupsFile:
+            json.dump(groups, groupsFile)
+
+    def loadGroups(self, path):
+        """
+        :param path: Path of a JSON file written by saveGroups()
+        :type path: str
+        """
+        with open(path) as groupsFile:
+            groups = json.load(groupsFile)
+        with self._lock:
+            for groupJSON in groups:
+                group = FakeGroup(self, groupJSON['id'], groupJSON['title'], groupJSON['tags'])
+                group.modified = groupJSON['modified']
+                group._members = groupJSON['members']
+                self.groups[group.id] = group
+            self._groupIDs = itertools.count(len(self.groups) + 1)
+
+    def createGroup(self, title, tags):
+        with self._lock:
+            group = FakeGroup(self, '{:032x}'.format(next(self._groupIDs)), title, tags)
+            self.groups[group.id] = group
+        return group
+
+    def searchGroups(self, query, maxGroups):
+        (field, _, value) = query.partition(':')
+        value = value.replace('\\?', '?').replace('\\*', '*')
+        with self._lock:
+            groups = list(self.groups.values())
+
+        if field == 'tags':
+            groups = [group for group in groups if value in group.tags]
+        elif field == 'title':
+            groups = [group for group in groups if group.title == value]
+        else:
+            raise RuntimeError('Unsupported group search: {}'.format(query))
+        return groups[:maxGroups]
+
+
+class FakeGroup(object):
+    def __init__(self, service, groupID, title, tags):
+        self._service = service
+        self._lock = threading.Lock()
+        self._members = []
+        self.id = groupID
+        self.title = title
+        self.tags = [tag.strip() for tag in tags.split(',')] if isinstance(tags, str) else list(tags)
+        self.owner = ADMIN_USERNAME
+        self.modified = int(time.time() * 1000)
+
+    def __repr__(self):
+        return '<Group title:"{}" owner:{}>'.format(self.title, self.owner)
+
+    def _touch(self):
+        # Like ArcGIS, the time is in milliseconds, so changes in the same millisecond leave it unchanged.
+        self.modified = max(self.modified, int(time.time() * 1000))
+
+    def get_members(self):
+        self._service.call('group.get_members')
+        with self._lock:
+            return {'owner': self.owner, 'admins': [self.owner], 'users': list(self._members)}
+
+    def add_users(self, usernames):
+        self._service.call('group.add_users')
+        notAdded = []
+        with self._lock:
+            for username in usernames:
+                if not self._service.hasAccount(username):
+                    notAdded.append(username)
+                elif username not in self._members:
+                    self._members.append(username)
+            self._touch()
+        return {'notAdded': notAdded}
+
+    def removeUsersFromGroup(self, usernames):
+        self._service.call('group.removeUsersFromGroup')
+        notRemoved = []
+        with self._lock:
+            for username in usernames.split(','):
+                if username in self._members:
+                    self._members.remove(username)
+                else:
+                    notRemoved.append(username)
+            self._touch()
+        return {'notRemoved': notRemoved}
+
+
+class _FakeGroupManager(object):
+    def __init__(self, service):
+        self._service = service
+
+    def search(self, query='', max_groups=DEFAULT_MAX_GROUPS):
+        self._service.call('groups.search')
+        return self._service.searchGroups(query, max_groups)
+
+    def create(self, title, tags, *args, **kwargs):  # @UnusedVariable
+        self._service.call('groups.create')
+        return self._service.createGroup(title, tags)
+
+
+class FakeGIS(object):
+    """
+    A connection to the fake organization, made like arcgis.gis.GIS(url, username, password).
+    """
+
+    def __init__(self, service, url=None, username=None, password=None):
+        service.call('connect')
+        self.url = url
+        self.username = username
+        self.groups = _FakeGroupManager(service)
+
+
+def installModule(service):
+    """
+    Make "from arcgis.gis import GIS" give connections to the service.
+
+    :param service: The fake organization
+    :type service: FakeArcGISService
+    """
+    arcgisModule = types.ModuleType('arcgis')
+    gisModule = types.ModuleType('arcgis.gis')
+    gisModule.GIS = functools.partial(FakeGIS, service)
+    arcgisModule.gis = gisModule
+    sys.modules['arcgis'] = arcgisModule
+    sys.modules['arcgis.gis'] = gisModule
@@ -0,0 +1,366 @@
+# Local HTTP server imitating the Canvas API endpoints kartograafr uses
+# (CanvasAPI._QueryURIs), serving the data of a benchmark scenario.  Like
+# Canvas, it paginates with "Link" headers, reports the rate limit quota in
+# "X-Rate-Limit-Remaining" and refuses requests when the quota is used up,
+# and answers "If-None-Match" with "304 Not Modified".
+#
+# Usage:
+#   python benchmarks/fakeCanvas.py [--scenario small] [--port 8080] [--latency SECONDS]
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scenarios import SCENARIOS, CONFIG_COURSE_ID, CONFIG_COURSE_PAGE_NAME
+
+API_PATH = '/api/v1'
+GRAPHQL_PATH = '/api/graphql'
+DEFAULT_PER_PAGE = 10  # Like Canvas, when "per_page" isn't given
+MAX_PER_PAGE = 100
+
+# Canvas' leaky bucket: requests add their cost, the bucket leaks at a steady rate.
+DEFAULT_BUCKET_SIZE = 700.0
+DEFAULT_LEAK_RATE = 10.0  # Quota regained per second
+DEFAULT_REQUEST_COST = 1.0
+
+# (endpoint name, path pattern, whether the response is paginated).  The names are those of CanvasAPI._QueryURIs.
+ROUTES = (
+    ('OUTCOMES', re.compile(r'^/outcomes/(?P<outcomeID>\d+)$'), False),
+    ('COURSES', re.compile(r'^/courses/(?P<courseID>\d+)$'), False),
+    ('COURSES_OUTCOME_GROUP_LINKS', re.compile(r'^/courses/(?P<courseID>\d+)/outcome_group_links$'), True),
+    ('COURSES_ASSIGNMENTS', re.compile(r'^/courses/(?P<courseID>\d+)/assignments$'), True),
+    ('COURSES_USERS', re.compile(r'^/courses/(?P<courseID>\d+)/users$'), True),
+    ('COURSES_PAGES_BY_NAME', re.compile(r'^/courses/(?P<courseID>\d+)/pages/(?P<pageName>[^/]+)$'), False),
+)
+
+ENROLLMENT_TYPES = {'teacher': 'TeacherEnrollment', 'student': 'StudentEnrollment', 'ta': 'TaEnrollment',
+                    'observer': 'ObserverEnrollment', 'designer': 'DesignerEnrollment'}
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RateLimitBucket(object):
+    """
+    Canvas' rate limit: each request adds its cost to a bucket which leaks at
+    'leakRate' per second, and requests are refused while it's full.  With no
+    leak rate, requests are never refused, but the quota is still reported.
+    """
+
+    def __init__(self, size=DEFAULT_BUCKET_SIZE, leakRate=DEFAULT_LEAK_RATE):
+        self.size = size
+        self.leakRate = leakRate
+        self._level = 0.0
+        self._lastLeak = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _leak(self):
+        now = time.monotonic()
+        if self.leakRate:
+            self._level = max(0.0, self._level - (now - self._lastLeak) * self.leakRate)
+        else:
+            self._level = 0.0
+        self._lastLeak = now
+
+    def take(self, cost):
+        """
+        :param cost: Cost of the request
+        :type cost: float
+        :return: Whether the request is allowed, and the quota remaining after it
+        :rtype: (bool, float)
+        """
+        with self._lock:
+            self._leak()
+            if self._level + cost > self.size:
+                return (False, self.size - self._level)
+            self._level += cost
+            return (True, self.size - self._level)
+
+
+def _graphQLCourseNode(scenario, courseID, variables):
+    """
+    :return: The "course" of kartograafr's GraphQL query, with the pages of its
+        connections given by the variables.  Cursors are item offsets.
+    :rtype: dict
+    """
+    pageSize = min(int(variables.get('pageSize') or DEFAULT_PER_PAGE), MAX_PER_PAGE)
+
+    def getConnection(items, cursor):
+        start = int(cursor) if cursor else 0
+        end = start + pageSize
+        return {'nodes': items[start:end],
+                'pageInfo': {'hasNextPage': end < len(items), 'endCursor': str(min(end, len(items)))}}
+
+    course = scenario.getCourse(courseID)
+    courseNode = {'_id': str(courseID)}
+    if variables.get('withCourse'):
+        courseNode.update({'name': course['name'], 'courseCode': course['course_code']})
+
+    if variables.get('withAssignments'):
+        assignmentNodes = [{
+            '_id': str(assignment['id']),
+            'name': assignment['name'],
+            'dueAt': assignment['due_at'],
+            'lockAt': assignment['lock_at'],
+            'rubric': {'criteria': [{'_id': criterion['id'],
+                                     'outcome': {'_id': str(criterion['outcome_id'])}
+                                     if criterion.get('outcome_id') else None}
+                                    for criterion in assignment['rubric']]},
+        } for assignment in scenario.getAssignments(courseID)]
+        courseNode['assignmentsConnection'] = getConnection(assignmentNodes, variables.get('assignmentsCursor'))
+
+    if variables.get('withEnrollments'):
+        enrollmentNodes = [{
+            'type': enrollment['type'],
+            'state': enrollment['enrollment_state'],
+            'user': {'_id': str(user['id']), 'name': user['name'], 'sortableName': user['sortable_name'],
+                     'loginId': user['login_id'], 'email': user['email']},
+        } for user in scenario.getUsers(courseID) for enrollment in user['enrollments']]
+        courseNode['enrollmentsConnection'] = getConnection(enrollmentNodes, variables.get('enrollmentsCursor'))
+
+    return courseNode
+
+
+class _CanvasRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections open, like Canvas
+
+    def log_message(self, format, *args):  # @ReservedAssignment
+        pass
+
+    def _sendJSON(self, status, content, headers=()):
+        body = json.dumps(content).encode('utf-8')
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        notModified = status == 200 and self.headers.get('If-None-Match') == etag
+
+        self.send_response(304 if notModified else status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('ETag', etag)
+        for (name, value) in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0' if notModified else str(len(body)))
+        self.end_headers()
+        if not notModified:
+            self.wfile.write(body)
+
+        return 304 if notModified else status
+
+    def _getLinkHeader(self, urlParts, params, page, lastPage):
+        def pageURL(pageNumber):
+            pageParams = [(name, value) for (name, value) in params if name != 'page'] + [('page', str(pageNumber))]
+            return 'http://{}{}?{}'.format(self.headers.get('Host'), urlParts.path, urlencode(pageParams))
+
+        links = [(pageURL(page), 'current')]
+        if page < lastPage:
+            links.append((pageURL(page + 1), 'next'))
+        if page > 1:
+            links.append((pageURL(page - 1), 'prev'))
+        links.extend([(pageURL(1), 'first'), (pageURL(lastPage), 'last')])
+        return ','.join('<{}>; rel="{}"'.format(url, relation) for (url, relation) in links)
+
+    def _getRESTContent(self, endpoint, fields, params):
+        scenario = self.server.fakeCanvas.scenario
+        courseID = int(fields['courseID']) if 'courseID' in fields else None
+        if courseID is not None and not scenario.hasCourse(courseID) and courseID != CONFIG_COURSE_ID:
+            return None
+
+        if endpoint == 'OUTCOMES':
+            return scenario.getOutcome(int(fields['outcomeID']))
+        elif endpoint == 'COURSES':
+            return scenario.getCourse(courseID)
+        elif endpoint == 'COURSES_PAGES_BY_NAME':
+            if courseID != CONFIG_COURSE_ID or fields['pageName'] != CONFIG_COURSE_PAGE_NAME:
+                return None
+            return scenario.getConfigCoursePage()
+        elif endpoint == 'COURSES_OUTCOME_GROUP_LINKS':
+            return scenario.getOutcomeGroupLinks(courseID)
+        elif endpoint == 'COURSES_ASSIGNMENTS':
+            return scenario.getAssignments(courseID)
+        elif endpoint == 'COURSES_USERS':
+            users = scenario.getUsers(courseID)
+            enrollmentTypes = set(ENROLLMENT_TYPES.get(value, value) for (name, value) in params
+                                  if name in ('enrollment_type', 'enrollment_type[]'))
+            if enrollmentTypes:
+                users = [user for user in users
+                         if any(enrollment['type'] in enrollmentTypes for enrollment in user['enrollments'])]
+            if ('include[]', 'enrollments') not in params:
+                users = [dict((name, value) for (name, value) in user.items() if name != 'enrollments')
+                         for user in users]
+            return users
+
+    def _handle(self, method):
+        fakeCanvas = self.server.fakeCanvas
+        urlParts = urlsplit(self.path)
+        params = parse_qsl(urlParts.query, keep_blank_values=True)
+
+        requestBody = None
+        if self.headers.get('Content-Length'):
+            requestBody = self.rfile.read(int(self.headers['Content-Length']))
+
+        endpoint = None
+        fields = None
+        paginated = False
+        if method == 'POST' and urlParts.path == GRAPHQL_PATH:
+            endpoint = 'GRAPHQL'
+        elif method == 'GET' and urlParts.path.startswith(API_PATH + '/'):
+            for (routeEndpoint, pattern, routePaginated) in ROUTES:
+                match = pattern.match(urlParts.path[len(API_PATH):])
+                if match is not None:
+                    (endpoint, fields, paginated) = (routeEndpoint, match.groupdict(), routePaginated)
+                    break
+
+        if fakeCanvas.latency:
+            time.sleep(fakeCanvas.latency)
+
+        (allowed, remaining) = fakeCanvas.rateLimitBucket.take(fakeCanvas.requestCost)
+        headers = [('X-Request-Cost', '{:.3f}'.format(fakeCanvas.requestCost)),
+                   ('X-Rate-Limit-Remaining', '{:.3f}'.format(remaining))]
+
+        if not allowed:
+            status = self._sendJSON(403, {'errors': [{'message': '403 Forbidden (Rate Limit Exceeded)'}]}, headers)
+        elif endpoint is None:
+            status = self._sendJSON(404, {'errors': [{'message': 'The specified resource does not exist.'}]},
+                                    headers)
+        elif endpoint == 'GRAPHQL':
+            query = json.loads(requestBody.decode('utf-8')) if requestBody else {}
+            variables = query.get('variables') or {}
+            courseID = int(variables.get('courseID') or 0)
+            courseNode = None
+            if fakeCanvas.scenario.hasCourse(courseID):
+                courseNode = _graphQLCourseNode(fakeCanvas.scenario, courseID, variables)
+            status = self._sendJSON(200, {'data': {'course': courseNode}}, headers)
+        else:
+            content = self._getRESTContent(endpoint, fields, params)
+            if content is None:
+                status = self._sendJSON(404, {'errors': [{'message': 'The specified resource does not exist.'}]},
+                                        headers)
+            elif paginated:
+                paramsDict = dict(params)
+                perPage = min(int(paramsDict.get('per_page') or DEFAULT_PER_PAGE), MAX_PER_PAGE)
+                page = max(int(paramsDict.get('page') or 1), 1)
+                lastPage = max((len(content) + perPage - 1) // perPage, 1)
+                headers.append(('Link', self._getLinkHeader(urlParts, params, page, lastPage)))
+                status = self._sendJSON(200, content[(page - 1) * perPage:page * perPage], headers)
+            else:
+                status = self._sendJSON(200, content, headers)
+
+        fakeCanvas.countRequest(endpoint or 'unknown', status)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+class FakeCanvas(object):
+    """
+    The :class:`FakeCanvas<fakeCanvas.FakeCanvas>` object serves a scenario's
+    data from a local HTTP server in its own thread, counting the requests
+    for each endpoint.  Use it as a context manager, or call start() and
+    stop().
+    """
+
+    def __init__(self, scenario, port=0, latency=0, requestCost=DEFAULT_REQUEST_COST,
+                 bucketSize=DEFAULT_BUCKET_SIZE, leakRate=DEFAULT_LEAK_RATE):
+        """
+        :param scenario: Data served
+        :type scenario: scenarios.Scenario
+        :param port: Port of the server.  By default, any free port.
+        :type port: int
+        :param latency: Seconds each request waits before it's answered
+        :type latency: float
+        :param requestCost: Rate limit quota taken by each request
+        :type requestCost: float
+        :param bucketSize: Rate limit quota when no requests have been made
+        :type bucketSize: float
+        :param leakRate: Quota regained per second.  If 0 or None, requests are never refused.
+        :type leakRate: float
+        """
+        self.scenario = scenario
+        self.port = port
+        self.latency = latency
+        self.requestCost = requestCost
+        self.rateLimitBucket = RateLimitBucket(bucketSize, leakRate)
+        self.requestCounts = Counter()  # Requests for each endpoint
+        self.statusCounts = Counter()  # Responses with each status
+        self._countLock = threading.Lock()
+        self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.stop()
+
+    @property
+    def apiBaseURL(self):
+        """
+        :return: Base URL of the API, for config.Canvas.API_BASE_URL
+        :rtype: str
+        """
+        return 'http://127.0.0.1:{}{}/'.format(self._server.server_address[1], API_PATH)
+
+    def countRequest(self, endpoint, status):
+        with self._countLock:
+            self.requestCounts[endpoint] += 1
+            self.statusCounts[status] += 1
+
+    def getStats(self):
+        """
+        :return: Number of requests, requests for each endpoint, and responses with each status
+        :rtype: dict
+        """
+        with self._countLock:
+            return {'requests': sum(self.requestCounts.values()),
+                    'endpoints': dict(self.requestCounts),
+                    'statuses': dict((str(status), count) for (status, count) in self.statusCounts.items())}
+
+    def start(self):
+        self._server = _ThreadingHTTPServer(('127.0.0.1', self.port), _CanvasRequestHandler)
+        self._server.fakeCanvas = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    argumentParser = argparse.ArgumentParser(description='Serve a benchmark scenario like the Canvas API')
+    argumentParser.add_argument('--scenario', choices=list(SCENARIOS), default='small', help='Data served')
+    argumentParser.add_argument('--port', type=int, default=8080, help='Port of the server')
+    argumentParser.add_argument('--latency', type=float, default=0, help='Seconds before each response')
+    argumentParser.add_argument('--leak-rate', type=float, default=DEFAULT_LEAK_RATE,
+                                help='Rate limit quota regained per second, 0 for no limit')
+    args = argumentParser.parse_args()
+
+    fakeCanvas = FakeCanvas(SCENARIOS[args.scenario], port=args.port, latency=args.latency,
+                            leakRate=args.leak_rate)
+    fakeCanvas.start()
+    print('Serving scenario "{}" at {}'.format(args.scenario, fakeCanvas.apiBaseURL))
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fakeCanvas.stop()
+        print(json.dumps(fakeCanvas.getStats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# Micro-benchmark of decoding a course roster from Canvas response pages.
+#
+# Compares the old way (each page decoded by Response.json() with an
+# object_hook making one object per dictionary) with decoding each page once
+# using every JSON library installed and making the objects afterwards.
+#
+# Usage:
+#   python benchmarks/jsonDecodingBenchmark.py [--roster FILE] [--record FILE] [--users N]
+#
+# --roster reads a recorded roster, a JSON list of users as returned by
+# Canvas' "/courses/:id/users?include[]=enrollments".  Otherwise a roster of
+# the same shape is generated.  --record saves the roster used, to be read
+# again by a later run.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from CanvasAPI.models import CanvasObject, User
+from RequestsPlus import ResponseCollection, JSON_DECODERS, setJSONDecoder, getJSONDecoderName
+
+PAGE_SIZE = 100
+USER_FIELDS = ('id', 'name', 'login_id', 'sis_login_id', 'enrollments')  # Same as main.USER_FIELDS
+
+
+def makeRoster(userCount):
+    """
+    :return: Users like the ones in a Canvas course roster, with their enrollments
+    :rtype: list of dict
+    """
+    roster = []
+    for userNumber in range(userCount):
+        loginID = 'user{:05d}'.format(userNumber)
+        roster.append({
+            'id': 100000 + userNumber,
+            'name': 'Student Number {}'.format(userNumber),
+            'created_at': '2026-08-20T14:03:11-04:00',
+            'sortable_name': 'Number {}, Student'.format(userNumber),
+            'short_name': 'Student {}'.format(userNumber),
+            'sis_user_id': '{:08d}'.format(userNumber),
+            'integration_id': None,
+            'sis_import_id': 4242,
+            'login_id': loginID,
+            'email': '{}@umich.edu'.format(loginID),
+            'enrollments': [{
+                'id': 900000 + userNumber,
+                'user_id': 100000 + userNumber,
+                'course_id': 12345,
+                'type': 'TeacherEnrollment' if userNumber % 200 == 0 else 'StudentEnrollment',
+                'created_at': '2026-08-20T14:03:11Z',
+                'updated_at': '2026-08-20T14:03:11Z',
+                'associated_user_id': None,
+                'start_at': None,
+                'end_at': None,
+                'course_section_id': 23456,
+                'root_account_id': 1,
+                'limit_privileges_to_course_section': False,
+                'enrollment_state': 'active',
+                'role': 'StudentEnrollment',
+                'role_id': 3,
+                'last_activity_at': '2026-10-01T09:15:00Z',
+                'total_activity_time': 8642,
+                'sis_account_id': 'UM_ANN-ARBOR',
+                'sis_course_id': '2026FALL-GEO101',
+                'html_url': 'https://umich.instructure.com/courses/12345/users/{}'.format(100000 + userNumber),
+            }],
+        })
+    return roster
+
+
+def makeResponses(roster):
+    """
+    :return: Responses containing the roster, PAGE_SIZE users per page
+    :rtype: list of requests.Response
+    """
+    responses = []
+    for start in range(0, len(roster), PAGE_SIZE):
+        response = requests.Response()
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response._content = json.dumps(roster[start:start + PAGE_SIZE]).encode('utf-8')
+        responses.append(response)
+    return responses
+
+
+def makeCollection(responses):
+    collection = ResponseCollection(responses[0])
+    for response in responses[1:]:
+        collection.addResponse(response)
+    return collection
+
+
+def timeBest(function, repeat):
+    """
+    :return: Shortest time in seconds of the calls to function
+    :rtype: float
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    argumentParser = argparse.ArgumentParser(description='Benchmark decoding of Canvas roster pages')
+    argumentParser.add_argument('--roster', help='JSON file of a recorded roster')
+    argumentParser.add_argument('--record', help='Save the roster to this JSON file')
+    argumentParser.add_argument('--users', type=int, default=10000, help='Number of users to generate')
+    argumentParser.add_argument('--repeat', type=int, default=5, help='Number of times each way is timed')
+    args = argumentParser.parse_args()
+
+    if args.roster:
+        with open(args.roster) as rosterFile:
+            roster = json.load(rosterFile)
+    else:
+        roster = makeRoster(args.users)
+
+    if args.record:
+        with open(args.record, 'w') as recordFile:
+            json.dump(roster, recordFile)
+
+    responses = makeResponses(roster)
+    print('{} users in {} pages, {:.1f} MB of JSON'.format(
+        len(roster), len(responses), sum(len(response.content) for response in responses) / 1e6))
+
+    def perDictionaryHook():
+        # A new collection each time, so every page is decoded like before.
+        return makeCollection(responses).jsonObjects(object_hook=lambda jsonObject: CanvasObject(**jsonObject))
+
+    results = [('Response.json() + object_hook, CanvasObject', timeBest(perDictionaryHook, args.repeat))]
+
+    originalDecoderName = getJSONDecoderName()
+    for (decoderName, _) in JSON_DECODERS:
+        setJSONDecoder(decoderName)
+        results.append(('{} decode once + batch, CanvasObject'.format(decoderName),
+                        timeBest(lambda: makeCollection(responses).jsonObjects(), args.repeat)))
+        results.append(('{} decode once + batch, User record'.format(decoderName),
+                        timeBest(lambda: User.fromJSONList(makeCollection(responses).json(), USER_FIELDS),
+                                 args.repeat)))
+    setJSONDecoder(originalDecoderName)
+
+    # The roster is used more than once in a run, e.g. for users and for instructors.
+    collection = makeCollection(responses)
+    collection.json()
+    results.append(('{} cached pages, again'.format(originalDecoderName),
+                    timeBest(collection.json, args.repeat)))
+
+    baseline = results[0][1]
+    for (name, seconds) in results:
+        print('{:<48} {:8.1f} ms  {:5.2f}x'.format(name, seconds * 1000, baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
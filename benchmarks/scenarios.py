@@ -0,0 +1,159 @@
+# Synthetic Canvas data for benchmarks: courses, each with assignments and a
+# roster, made on demand from the course ID so even the largest scenario
+# needs no memory until the fake Canvas server is asked for it.
+
+from collections import OrderedDict
+
+TARGET_OUTCOME_ID = 2501
+OTHER_OUTCOME_ID = 2502
+CONFIG_COURSE_ID = 138596
+CONFIG_COURSE_PAGE_NAME = 'course-ids'
+FIRST_COURSE_ID = 200000
+STUDENT_USER_ID_BASE = 1000000
+TEACHER_USER_ID_BASE = 9000000
+CANVAS_COURSE_URL = 'https://umich.instructure.com/courses/{}'  # Matched by main.getCourseIDsFromConfigCoursePage()
+
+
+class Scenario(object):
+    """
+    Courses listed on the configuration course page, of which every
+    'matchingCourseInterval'th has assignments with the target outcome.
+    Each course has 'assignmentCount' assignments, of which
+    'expiredAssignmentInterval'th are expired and the rest use the outcome,
+    and 'rosterSize' users, one of them the teacher.  Every
+    'noAccountInterval'th user has no ArcGIS account.  Users of neighbouring
+    courses overlap, like students taking several courses.
+    """
+
+    def __init__(self, name, courseCount, assignmentCount, rosterSize, matchingCourseInterval=1,
+                 expiredAssignmentInterval=5, noAccountInterval=50):
+        """
+        :param name: Name of the scenario, shown in reports
+        :type name: str
+        :param courseCount: Number of courses on the configuration course page
+        :type courseCount: int
+        :param assignmentCount: Number of assignments in each course
+        :type assignmentCount: int
+        :param rosterSize: Number of users in each course
+        :type rosterSize: int
+        """
+        self.name = name
+        self.courseCount = courseCount
+        self.assignmentCount = assignmentCount
+        self.rosterSize = rosterSize
+        self.matchingCourseInterval = matchingCourseInterval
+        self.expiredAssignmentInterval = expiredAssignmentInterval
+        self.noAccountInterval = noAccountInterval
+
+    def getSummary(self):
+        """
+        :rtype: dict
+        """
+        return OrderedDict([('name', self.name), ('courses', self.courseCount),
+                            ('assignmentsPerCourse', self.assignmentCount), ('rosterSize', self.rosterSize)])
+
+    @property
+    def courseIDs(self):
+        return list(range(FIRST_COURSE_ID, FIRST_COURSE_ID + self.courseCount))
+
+    def hasCourse(self, courseID):
+        return FIRST_COURSE_ID <= courseID < FIRST_COURSE_ID + self.courseCount
+
+    def courseMatches(self, courseID):
+        return (courseID - FIRST_COURSE_ID) % self.matchingCourseInterval == 0
+
+    def getOutcome(self, outcomeID):
+        return {'id': outcomeID, 'title': 'ArcGIS Mapping Skills', 'context_type': 'Account', 'context_id': 306,
+                'points_possible': 4.0, 'mastery_points': 3.0}
+
+    def getConfigCoursePage(self):
+        links = ''.join('<li><a href="{0}">{0}</a></li>'.format(CANVAS_COURSE_URL.format(courseID))
+                        for courseID in self.courseIDs)
+        return {'url': CONFIG_COURSE_PAGE_NAME, 'title': 'Course IDs', 'published': True,
+                'body': '<p>Courses using ArcGIS groups:</p><ul>{}</ul>'.format(links)}
+
+    def getCourse(self, courseID):
+        return {'id': courseID, 'name': 'Geography {}'.format(courseID), 'course_code': 'GEO-{}'.format(courseID),
+                'account_id': 306, 'workflow_state': 'available', 'enrollment_term_id': 120}
+
+    def getOutcomeGroupLinks(self, courseID):
+        outcomeIDs = [OTHER_OUTCOME_ID] + ([TARGET_OUTCOME_ID] if self.courseMatches(courseID) else [])
+        return [{'url': '/api/v1/courses/{}/outcome_groups/1/outcomes/{}'.format(courseID, outcomeID),
+                 'context_id': courseID, 'context_type': 'Course',
+                 'outcome_group': {'id': 1, 'title': 'Geography {}'.format(courseID)},
+                 'outcome': {'id': outcomeID, 'title': 'Outcome {}'.format(outcomeID), 'context_type': 'Account'}}
+                for outcomeID in outcomeIDs]
+
+    def getAssignments(self, courseID):
+        assignments = []
+        for number in range(self.assignmentCount):
+            expired = self.expiredAssignmentInterval and number % self.expiredAssignmentInterval == \
+                self.expiredAssignmentInterval - 1
+            outcomeID = TARGET_OUTCOME_ID if self.courseMatches(courseID) else OTHER_OUTCOME_ID
+            assignments.append({
+                'id': courseID * 100 + number,
+                'name': 'Map Lab {}'.format(number + 1),
+                'course_id': courseID,
+                'description': '<p>Make a map of the campus.</p>' * 5,
+                'due_at': '2001-01-01T00:00:00Z' if expired else None,
+                'lock_at': None,
+                'points_possible': 10.0,
+                'submission_types': ['online_url'],
+                'rubric': [{'id': '_1', 'points': 4.0, 'description': 'Map quality', 'outcome_id': outcomeID},
+                           {'id': '_2', 'points': 6.0, 'description': 'Written analysis'}],
+            })
+        return assignments
+
+    def getLoginID(self, courseID, number):
+        # Half of each roster also takes the next course, so users overlap between courses.
+        userNumber = (courseID - FIRST_COURSE_ID) * (self.rosterSize // 2) + number
+        return 'user{:07d}'.format(userNumber)
+
+    def hasArcGISAccount(self, loginID):
+        """
+        :param loginID: Canvas login ID of a user
+        :type loginID: str
+        :return: False for every 'noAccountInterval'th student, True for everyone else
+        :rtype: bool
+        """
+        if not (self.noAccountInterval and loginID.startswith('user')):
+            return True
+        return int(loginID[4:]) % self.noAccountInterval != 0
+
+    def getUsers(self, courseID):
+        users = []
+        for number in range(self.rosterSize):
+            if number:
+                loginID = self.getLoginID(courseID, number)
+                userID = STUDENT_USER_ID_BASE + int(loginID[4:])
+            else:
+                loginID = 'teacher{}'.format(courseID)
+                userID = TEACHER_USER_ID_BASE + courseID
+            users.append({
+                'id': userID,
+                'name': 'User {}'.format(loginID),
+                'sortable_name': '{}, User'.format(loginID),
+                'short_name': loginID,
+                'login_id': loginID,
+                'sis_login_id': loginID,
+                'sis_user_id': str(userID),
+                'email': '{}@umich.edu'.format(loginID),
+                'enrollments': [{
+                    'id': courseID * 1000 + number,
+                    'user_id': userID,
+                    'course_id': courseID,
+                    'type': 'TeacherEnrollment' if number == 0 else 'StudentEnrollment',
+                    'enrollment_state': 'active',
+                    'role': 'TeacherEnrollment' if number == 0 else 'StudentEnrollment',
+                    'course_section_id': courseID + 1,
+                }],
+            })
+        return users
+
+
+# Scenarios of different sizes: courses x assignments per course x roster size.
+SCENARIOS = OrderedDict((scenario.name, scenario) for scenario in (
+    Scenario('small', 50, 3, 40),
+    Scenario('medium', 500, 3, 60),
+    Scenario('large', 5000, 2, 80),
+))
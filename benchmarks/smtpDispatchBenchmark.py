@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Benchmark of sending course log email through a local debugging SMTP server.
+#
+# Compares the old way (a new SMTP connection for each message) with sending
+# all of them through MailDispatcher sessions, using different numbers of
+# connections.
+#
+# Usage:
+#   ./runDebugEmail.sh &
+#   python benchmarks/smtpDispatchBenchmark.py [--server localhost:1025] [--messages N] [--connections N ...]
+
+import argparse
+import os
+import smtplib
+import sys
+import time
+from email.header import Header
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mailDispatcher import MailDispatcher
+
+SENDER_ADDRESS = 'kartograafr-benchmark@umich.edu'
+
+
+def makeMessages(messageCount, logLineCount):
+    """
+    :return: (sender, recipients, message) of messages like those of course logs
+    :rtype: list of tuple
+    """
+    logContent = ''.join('Running at: 09:15:00 AM on October 01, 2026\n\n'
+                         'Added user{:05d} to group for assignment "Map Lab"\n'.format(lineNumber)
+                         for lineNumber in range(logLineCount))
+    messages = []
+    for courseNumber in range(messageCount):
+        message = MIMEText(logContent, 'plain', 'utf-8')
+        message['From'] = Header(SENDER_ADDRESS, 'utf-8')
+        message['To'] = Header('teacher{}@umich.edu'.format(courseNumber), 'utf-8')
+        message['Subject'] = Header('ArcGIS-Canvas logs for course ID {}'.format(courseNumber), 'utf-8')
+        messages.append((SENDER_ADDRESS, ['teacher{}@umich.edu'.format(courseNumber)], message.as_string()))
+    return messages
+
+
+def sendEachConnected(server, messages):
+    for (sender, recipients, message) in messages:
+        session = smtplib.SMTP(server)
+        session.sendmail(sender, recipients, message)
+        session.quit()
+
+
+def main():
+    argumentParser = argparse.ArgumentParser(description='Benchmark sending email through an SMTP server')
+    argumentParser.add_argument('--server', default='localhost:1025', help='SMTP server, e.g. from runDebugEmail.sh')
+    argumentParser.add_argument('--messages', type=int, default=300, help='Number of messages sent')
+    argumentParser.add_argument('--lines', type=int, default=50, help='Log lines in each message')
+    argumentParser.add_argument('--connections', type=int, nargs='+', default=[1, 2, 4],
+                                help='Numbers of dispatcher connections to try')
+    args = argumentParser.parse_args()
+
+    messages = makeMessages(args.messages, args.lines)
+
+    start = time.perf_counter()
+    sendEachConnected(args.server, messages)
+    baseline = time.perf_counter() - start
+    print('{:<36} {:8.3f} s  {:7.1f} msg/s  {:5.2f}x'.format('new connection per message', baseline,
+                                                             len(messages) / baseline, 1.0))
+
+    for connectionCount in args.connections:
+        start = time.perf_counter()
+        with MailDispatcher(args.server, connectionCount=connectionCount) as mailDispatcher:
+            results = mailDispatcher.sendAll(messages)
+        seconds = time.perf_counter() - start
+
+        failures = sum(1 for (_, _, exception) in results if exception is not None)
+        print('{:<36} {:8.3f} s  {:7.1f} msg/s  {:5.2f}x  ({} connects, {} failed)'.format(
+            'dispatcher, {} connections'.format(connectionCount), seconds, len(messages) / seconds,
+            baseline / seconds, mailDispatcher.connectCount, failures))
+
+
+if __name__ == '__main__':
+    main()
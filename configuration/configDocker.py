@@ -9,6 +9,10 @@ class Application(object):
         SENDER_ADDRESS = '"ArcGIS-Canvas Service Dev" <kartograafr-service-dev@umich.edu>'
         RECIPIENT_AT_DOMAIN = '@umich.edu'
         SUBJECT = 'ArcGIS-Canvas logs for course ID {courseID} (Dev)'
+        SMTP_CONNECTION_COUNT = 2  # Sessions with the mail server kept open, and messages sent, at the same time
+        SMTP_KEEPALIVE_SECONDS = 30  # Idle sessions are checked with NOOP before they're used again
+        OUTBOX_MAX_ATTEMPTS = 8  # Times a message in the outbox is tried before it's moved to its "failed" folder
+        OUTBOX_RETRY_SECONDS = 300  # Wait before a message is tried again, doubled after each attempt
 
     # directory path for logging may depend on the platform. This setup is for Docker.
     class Logging(object):
@@ -16,8 +20,37 @@ class Application(object):
         DIRECTORY = '/var/log/kartograafr'
         COURSE_DIRECTORY = os.path.join(DIRECTORY, 'courses')
         MAIN_LOG_BASENAME = 'main'
+        DRAIN_LOG_BASENAME = 'drain-outbox'  # Log of --drain-outbox runs, which is never renamed
         LOG_FILENAME_EXTENSION = '.log'
 
+    # Limits on how much work is done at the same time.  A value of 1 does the work serially.
+    class Concurrency(object):
+        CANVAS_WORKER_COUNT = 8  # Number of Canvas courses queried at the same time
+        CANVAS_ASYNC_CONNECTION_LIMIT = 50  # Connections to Canvas open at the same time when using --async
+        CANVAS_PAGE_WORKER_COUNT = 4  # Pages of one Canvas response requested at the same time
+        CANVAS_MAX_IN_FLIGHT_REQUESTS = 16  # Most Canvas requests at the same time.  Lowered when quota runs low.
+        ARCGIS_GROUP_WORKER_COUNT = 4  # ArcGIS groups updated at the same time, each with its own requests
+        ARCGIS_MEMBERSHIP_WORKER_COUNT = 4  # Requests adding or removing chunks of one group's members at the same time
+        ARCGIS_MAX_IN_FLIGHT_CALLS = 4  # Most ArcGIS calls at the same time, by all group and membership workers
+        EMAIL_MESSAGE_WORKER_COUNT = 4  # Course log email messages made at the same time
+
+    # Files kept between runs.  The log directory is used because it's on persistent storage.
+    STATE_DIRECTORY = os.path.join(Logging.DIRECTORY, 'state')
+
+    # What was last done for each assignment's ArcGIS group, and a history of runs.  Groups unchanged
+    # since their last update are skipped, except that users ArcGIS wouldn't add are sent again on every
+    # run.  Use "main.py --full-resync" to update every group.
+    # None updates every group on every run and keeps no history.
+    SYNC_STATE_PATH = os.path.join(STATE_DIRECTORY, 'sync-state.sqlite')
+
+    # Email waiting to be sent by "main.py --drain-outbox", kept in a maildir.
+    OUTBOX_DIRECTORY = os.path.join(STATE_DIRECTORY, 'outbox')
+
+    # Metrics of each run: a Prometheus textfile for node exporter's textfile collector, and a JSON summary.
+    # Each is replaced at the end of every run.  None disables it.
+    METRICS_TEXTFILE_PATH = os.path.join(STATE_DIRECTORY, 'metrics', 'kartograafr.prom')
+    METRICS_JSON_PATH = os.path.join(STATE_DIRECTORY, 'metrics', 'kartograafr.json')
+
 class Canvas(object):
     API_BASE_URL = 'https://umich.instructure.com/api/v1/'
 
@@ -33,6 +66,43 @@ class Canvas(object):
         135885,  # Another ArcGIS Course (ARCGIS-2)
     ))
 
+    PER_PAGE = 100  # Items requested per page of paginated responses.  Canvas allows at most 100.
+
+    # Unchanged responses are revalidated with ETag / Last-Modified and read from disk.  None disables the cache.
+    # Responses are kept as received, including users' names and email addresses, readable only by their owner.
+    # The least recently used are removed when they take up more than HTTP_CACHE_MAX_BYTES.
+    HTTP_CACHE_DIRECTORY = os.path.join(Application.STATE_DIRECTORY, 'http-cache')
+    HTTP_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+    # Slowly changing Canvas objects are reused between runs for this many seconds, by kind
+    # (see CanvasAPI._QueryURIs).  Kinds not listed aren't cached.  None disables the cache.
+    # Use "main.py --refresh-cache" to get fresh copies of everything.
+    OBJECT_CACHE_PATH = os.path.join(Application.STATE_DIRECTORY, 'canvas-objects.sqlite')
+    OBJECT_CACHE_TIMES_TO_LIVE = {
+        'OUTCOMES': 24 * 60 * 60,
+        'COURSES': 12 * 60 * 60,
+        'COURSES_OUTCOME_GROUP_LINKS': 4 * 60 * 60,
+        'COURSES_PAGES_BY_NAME': 50 * 60,  # The configuration course page
+    }
+
+    # Failed GET requests (connection errors, 429, 5xx) are sent again, up to this many attempts
+    # per request, and at most RETRY_BUDGET retries in a whole run.
+    RETRY_MAX_ATTEMPTS = 4
+    RETRY_BUDGET = 50
+    # Requests refused by the rate limit are sent again up to this many attempts, outside the budget.
+    RETRY_MAX_THROTTLED_ATTEMPTS = 8
+
+    # All Canvas requests share one pool of connections.  Its size should be at least the number of requests
+    # sent at the same time (Application.Concurrency.CANVAS_MAX_IN_FLIGHT_REQUESTS), or connections are wasted.
+    CONNECTION_POOL_MAX_SIZE = 16
+    CONNECTION_POOL_HOST_COUNT = 10  # Number of hosts whose connections are kept in the pool
+    KEEP_ALIVE = True  # If False, every connection is closed after one request
+
+    # Get each course's assignments, course object and users with the GraphQL API, usually in one request
+    # per course, instead of several paginated REST requests.  Not used with "main.py --async".
+    # GraphQL has no SIS login ID, so instructors are emailed at their login ID instead.
+    USE_GRAPHQL = False
+
 class ArcGIS(object):
     ORG_NAME = 'devumich' # For server URL (see below) and appended to ArcGIS usernames (i.e., "user_org")
     SECURITYINFO = {
@@ -41,3 +111,10 @@ class ArcGIS(object):
         'username': '',
         'password': '',
     }
+
+    # Maximum number of groups found by the single search that loads the ArcGIS group index.
+    GROUP_INDEX_MAX_GROUPS = 10000
+
+    # Users are added to and removed from ArcGIS groups in requests of at most this many users, so a
+    # large course doesn't make one request that times out or is too large.
+    MEMBERSHIP_CHUNK_SIZE = 100
@@ -0,0 +1,84 @@
+# Keeps course log records in memory and writes each course's block at once,
+# so no file handles are held open for the courses.
+
+import logging
+import threading
+from collections import OrderedDict
+
+
+class CourseLogBuffer(logging.Handler):
+    """
+    The :class:`CourseLogBuffer<courseLogBuffer.CourseLogBuffer>` handler is
+    shared by the loggers of all courses, which are named by course ID.  Their
+    records are kept until flushCourse() is called when the course is done.
+    Then they are formatted and written together to the course's log file,
+    which is opened only for that write, and to the main log through its
+    handler, so the main log file is opened only once.
+    """
+
+    def __init__(self, getCourseLogFilePath, mainLogHandler=None):
+        """
+        :param getCourseLogFilePath: Function returning the path of a course's log file from its ID
+        :type getCourseLogFilePath: callable
+        :param mainLogHandler: (optional) Handler of the main log, whose file the records are also written to
+        :type mainLogHandler: logging.FileHandler
+        """
+        super(CourseLogBuffer, self).__init__()
+        self.getCourseLogFilePath = getCourseLogFilePath
+        self.mainLogHandler = mainLogHandler
+        self._records = OrderedDict()  # Records of each course, keyed by course ID
+        self._writeLock = threading.Lock()
+
+    def emit(self, record):
+        # Handler.handle() already holds the handler's lock.
+        self._records.setdefault(record.name, []).append(record)
+
+    def flushCourse(self, courseID):
+        """
+        Write the course's records, if it has any, and forget them.
+
+        :param courseID: ID of the course, the name of its logger
+        :type courseID: str
+        """
+        self.acquire()
+        try:
+            records = self._records.pop(courseID, None)
+        finally:
+            self.release()
+
+        if not records:
+            return
+
+        block = ''.join(self.format(record) + '\n' for record in records)
+
+        # Blocks of different courses are written whole, one after another.
+        with self._writeLock:
+            with open(self.getCourseLogFilePath(courseID), 'a') as courseLogFile:
+                courseLogFile.write(block)
+
+            if self.mainLogHandler is not None:
+                self.mainLogHandler.acquire()
+                try:
+                    if self.mainLogHandler.stream is None:
+                        self.mainLogHandler.stream = self.mainLogHandler._open()
+                    self.mainLogHandler.stream.write(block)
+                    self.mainLogHandler.flush()
+                finally:
+                    self.mainLogHandler.release()
+
+    def flush(self):
+        """
+        Write the records of every course.
+        """
+        self.acquire()
+        try:
+            courseIDs = list(self._records)
+        finally:
+            self.release()
+
+        for courseID in courseIDs:
+            self.flushCourse(courseID)
+
+    def close(self):
+        self.flush()
+        super(CourseLogBuffer, self).close()
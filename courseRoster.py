@@ -0,0 +1,98 @@
+# The members of a Canvas course, prepared once and shared by the ArcGIS
+# groups of all of the course's assignments.
+
+import re
+import threading
+
+# ArcGIS usernames are Canvas login IDs (U-M uniqnames) with "_" and the organization name appended.
+ARCGIS_USERNAME_SUFFIX_PATTERN = re.compile(r'_\S+$')
+
+
+class CourseRoster(object):
+    """
+    The :class:`CourseRoster<courseRoster.CourseRoster>` object holds the set
+    of a course's Canvas login IDs, which every one of the course's groups is
+    compared with.  It also remembers the users ArcGIS wouldn't add to one of
+    the course's groups, usually because they don't have ArcGIS accounts, so
+    they aren't sent again for the other groups.  It may be shared by threads
+    updating different groups.
+    """
+
+    def __init__(self, courseID, loginIDs):
+        """
+        :param courseID: Canvas course ID
+        :type courseID: int
+        :param loginIDs: Canvas login IDs of the course's users
+        :type loginIDs: iterable of str
+        """
+        self.courseID = courseID
+        self.loginIDs = frozenset(loginIDs)
+        self.groupCount = 0
+        self.usersNotResent = 0  # Users not sent to ArcGIS again because it wouldn't add them to another group
+        self._usersNotAdded = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fromUsers(cls, courseID, users):
+        """
+        :param courseID: Canvas course ID
+        :type courseID: int
+        :param users: The course's Canvas users.  Those without login IDs are left out.
+        :type users: list of User
+        :rtype: CourseRoster
+        """
+        return cls(courseID, (user.login_id for user in users if user.login_id is not None))
+
+    @staticmethod
+    def getLoginIDs(arcGISUsernames):
+        """
+        :param arcGISUsernames: ArcGIS usernames of a group's members
+        :type arcGISUsernames: iterable of str
+        :return: The members' Canvas login IDs
+        :rtype: set of str
+        """
+        return set(ARCGIS_USERNAME_SUFFIX_PATTERN.sub('', username) for username in arcGISUsernames)
+
+    def planChanges(self, groupLoginIDs):
+        """
+        Compare a group's members with the course's users.
+
+        :param groupLoginIDs: Canvas login IDs of the group's members
+        :type groupLoginIDs: set of str
+        :return: Login IDs to be removed from the group, login IDs to be added to it,
+            and login IDs of members who stay in it
+        :rtype: (list of str, list of str, list of str)
+        """
+        with self._lock:
+            self.groupCount += 1
+
+        return (sorted(groupLoginIDs - self.loginIDs), sorted(self.loginIDs - groupLoginIDs),
+                sorted(groupLoginIDs & self.loginIDs))
+
+    def getUsersNotAdded(self):
+        """
+        :return: ArcGIS usernames that ArcGIS wouldn't add to one of the course's groups
+        :rtype: frozenset of str
+        """
+        with self._lock:
+            return frozenset(self._usersNotAdded)
+
+    def addUsersNotAdded(self, arcGISUsernames, notResentCount=0):
+        """
+        :param arcGISUsernames: ArcGIS usernames that ArcGIS wouldn't add to one of the course's groups
+        :type arcGISUsernames: iterable of str
+        :param notResentCount: Number of them that weren't sent, because they were already known
+        :type notResentCount: int
+        """
+        with self._lock:
+            self._usersNotAdded.update(arcGISUsernames or ())
+            self.usersNotResent += notResentCount
+
+    def getStats(self):
+        """
+        :return: Number of the course's users and groups compared with them, and the number of
+            users not sent to ArcGIS again
+        :rtype: dict
+        """
+        with self._lock:
+            return {'users': len(self.loginIDs), 'groups': self.groupCount, 'usersNotResent': self.usersNotResent}
@@ -0,0 +1,169 @@
+# Sends many email messages through a few SMTP sessions kept open for all of
+# them, instead of connecting to the server again for every message.
+
+import logging
+import smtplib
+import threading
+import time
+from collections import deque
+
+import util
+
+logger = logging.getLogger(__name__)
+
+# Errors after which a session is given up and the message is sent again with a new one.
+# SMTPException is an OSError too, so errors about the message itself aren't included.
+RECONNECT_EXCEPTIONS = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+
+class MailDispatcher(object):
+    """
+    The :class:`MailDispatcher<mailDispatcher.MailDispatcher>` object keeps up
+    to 'connectionCount' SMTP sessions open and sends messages through them,
+    each session used by one thread at a time.  A session that has been idle
+    longer than 'keepAliveSeconds' is checked with NOOP before it's used
+    again, and a session the server has closed is replaced by a new one.
+    Sessions are only opened when a message is sent.  Use it as a context
+    manager, or call close() to end the sessions.
+    """
+
+    def __init__(self, smtpServer, connectionCount=1, keepAliveSeconds=30, debugLevel=0,
+                 smtpFactory=smtplib.SMTP):
+        """
+        :param smtpServer: Host of the SMTP server, optionally followed by ":" and the port
+        :type smtpServer: str
+        :param connectionCount: Most sessions open, and messages sent, at the same time
+        :type connectionCount: int
+        :param keepAliveSeconds: Idle time after which a session is checked with NOOP before it's used
+        :type keepAliveSeconds: int or float
+        :param debugLevel: Debug level set for each session
+        :type debugLevel: int or bool
+        :param smtpFactory: (optional) Makes a session connected to the server given as its argument
+        :type smtpFactory: callable
+        """
+        self.smtpServer = smtpServer
+        self.connectionCount = max(connectionCount or 1, 1)
+        self.keepAliveSeconds = keepAliveSeconds
+        self.debugLevel = debugLevel
+        self.smtpFactory = smtpFactory
+
+        self.connectCount = 0
+        self.sentCount = 0
+
+        self._idleSessions = deque()  # (session, time it was last used)
+        self._available = threading.BoundedSemaphore(self.connectionCount)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.close()
+
+    def _connect(self):
+        session = self.smtpFactory(self.smtpServer)
+        session.set_debuglevel(self.debugLevel)
+
+        with self._lock:
+            self.connectCount += 1
+        logger.debug('Connected to mail server {}'.format(self.smtpServer))
+
+        return session
+
+    @staticmethod
+    def _isAlive(session):
+        try:
+            return session.noop()[0] == 250
+        except OSError:
+            return False
+
+    @staticmethod
+    def _quit(session):
+        try:
+            session.quit()
+        except OSError:
+            session.close()
+
+    def _getSession(self):
+        """
+        :return: An idle session, checked if it was idle too long, or a new one
+        :rtype: smtplib.SMTP
+        """
+        with self._lock:
+            (session, lastUsed) = self._idleSessions.pop() if self._idleSessions else (None, None)
+
+        if session is not None and time.monotonic() - lastUsed > self.keepAliveSeconds and \
+                not self._isAlive(session):
+            logger.debug('Idle session with mail server {} was closed, reconnecting'.format(self.smtpServer))
+            session.close()
+            session = None
+
+        return session if session is not None else self._connect()
+
+    def _putSession(self, session):
+        with self._lock:
+            self._idleSessions.append((session, time.monotonic()))
+
+    def send(self, sender, recipients, message):
+        """
+        Send a message through one of the sessions.  If the server closed the
+        session, the message is sent again once with a new one.
+
+        :param sender: Address of the sender
+        :type sender: str
+        :param recipients: Addresses of the recipients
+        :type recipients: list of str
+        :param message: The message
+        :type message: str
+        :return: Recipients refused by the server, like smtplib.SMTP.sendmail()
+        :rtype: dict
+        """
+        with self._available:
+            session = self._getSession()
+            try:
+                try:
+                    refused = session.sendmail(sender, recipients, message)
+                except RECONNECT_EXCEPTIONS:
+                    session.close()
+                    logger.debug('Lost session with mail server {}, reconnecting'.format(self.smtpServer))
+                    session = self._connect()
+                    refused = session.sendmail(sender, recipients, message)
+            except smtplib.SMTPServerDisconnected:
+                session.close()
+                raise
+            except smtplib.SMTPException:
+                # The server refused this message, but the session may still be used.
+                self._putSession(session)
+                raise
+            except Exception:
+                session.close()
+                raise
+
+            self._putSession(session)
+
+        with self._lock:
+            self.sentCount += 1
+
+        return refused
+
+    def sendAll(self, messages):
+        """
+        Send messages with up to 'connectionCount' of them at the same time.
+
+        :param messages: (sender, recipients, message) of each message
+        :type messages: iterable of tuple
+        :return: (item, result, exception) for each message, in order, like util.mapConcurrently()
+        :rtype: list of tuple
+        """
+        return util.mapConcurrently(lambda item: self.send(*item), messages, self.connectionCount)
+
+    def close(self):
+        """
+        End all idle sessions.
+        """
+        with self._lock:
+            sessions = [session for (session, _) in self._idleSessions]
+            self._idleSessions.clear()
+
+        for session in sessions:
+            self._quit(session)
@@ -0,0 +1,169 @@
+# Email waiting to be sent, kept in a maildir so it survives the process that
+# made it.  Messages are delivered by a separate "main.py --drain-outbox" run.
+
+import copy
+import fcntl
+import logging
+import mailbox
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Headers kept with a message in the outbox, removed before it's sent.
+ENVELOPE_SENDER_HEADER = 'X-Kartograafr-Envelope-From'
+ENVELOPE_RECIPIENTS_HEADER = 'X-Kartograafr-Envelope-To'
+ATTEMPTS_HEADER = 'X-Kartograafr-Attempts'
+NEXT_ATTEMPT_HEADER = 'X-Kartograafr-Next-Attempt'
+OUTBOX_HEADERS = (ENVELOPE_SENDER_HEADER, ENVELOPE_RECIPIENTS_HEADER, ATTEMPTS_HEADER, NEXT_ATTEMPT_HEADER)
+
+FAILED_FOLDER_NAME = 'failed'  # Messages that couldn't be sent after the most attempts
+LOCK_FILE_NAME = '.deliver.lock'
+
+
+class MailOutbox(object):
+    """
+    The :class:`MailOutbox<mailOutbox.MailOutbox>` object puts messages in a
+    maildir.  Each one is written to "tmp" and moved to "new", so a message is
+    either complete or not there at all.  deliver() sends the messages that
+    are due and removes them only after the server accepted them, so none is
+    lost if a process stops while sending.  A message that couldn't be sent
+    is tried again later, waiting twice as long after each attempt, and is
+    moved to the "failed" folder after 'maxAttempts'.
+    """
+
+    def __init__(self, directory, maxAttempts=8, retrySeconds=300):
+        """
+        :param directory: Path of the maildir.  It's made if it doesn't exist.
+        :type directory: str
+        :param maxAttempts: Most times a message is tried before it's moved to the "failed" folder
+        :type maxAttempts: int
+        :param retrySeconds: Time before a message is tried the second time, doubled for each later attempt
+        :type retrySeconds: int or float
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(directory)), exist_ok=True)
+
+        self.directory = directory
+        self.maxAttempts = maxAttempts
+        self.retrySeconds = retrySeconds
+        self.maildir = mailbox.Maildir(directory, factory=None, create=True)
+
+    def __len__(self):
+        return len(self.maildir)
+
+    def put(self, sender, recipients, message):
+        """
+        :param sender: Address of the sender
+        :type sender: str
+        :param recipients: Addresses of the recipients
+        :type recipients: list of str
+        :param message: The message.  It isn't changed.
+        :type message: email.message.Message
+        :return: Key of the message in the outbox
+        :rtype: str
+        """
+        outboxMessage = copy.deepcopy(message)
+        outboxMessage[ENVELOPE_SENDER_HEADER] = sender
+        outboxMessage[ENVELOPE_RECIPIENTS_HEADER] = ', '.join(recipients)
+        outboxMessage[ATTEMPTS_HEADER] = '0'
+        outboxMessage[NEXT_ATTEMPT_HEADER] = '0'
+
+        return self.maildir.add(outboxMessage)
+
+    def _getDueMessages(self, now):
+        """
+        :return: (key, message) of messages to be tried now, oldest first
+        :rtype: list of tuple
+        """
+        dueMessages = []
+        for key in sorted(self.maildir.keys()):
+            try:
+                message = self.maildir.get_message(key)
+            except KeyError:
+                continue  # Removed since keys() was read
+            if float(message.get(NEXT_ATTEMPT_HEADER, 0)) <= now:
+                dueMessages.append((key, message))
+        return dueMessages
+
+    @staticmethod
+    def _getEnvelope(message):
+        """
+        :return: Sender, recipients and the message as it's sent, without the outbox headers
+        :rtype: (str, list of str, str)
+        """
+        sender = message[ENVELOPE_SENDER_HEADER]
+        recipients = [recipient.strip() for recipient in message[ENVELOPE_RECIPIENTS_HEADER].split(',')
+                      if recipient.strip()]
+
+        sentMessage = copy.deepcopy(message)
+        for header in OUTBOX_HEADERS:
+            del sentMessage[header]
+
+        return (sender, recipients, sentMessage.as_string())
+
+    def _retryLater(self, key, message, exception, now):
+        """
+        :return: True if the message will be tried again, False if it was moved to the "failed" folder
+        :rtype: bool
+        """
+        attempts = int(message.get(ATTEMPTS_HEADER, 0)) + 1
+        del message[ATTEMPTS_HEADER]
+        message[ATTEMPTS_HEADER] = str(attempts)
+
+        if attempts >= self.maxAttempts:
+            logger.error('Moving email {} for {} to the failed folder after {} attempts.  Exception: {}'
+                         .format(key, message[ENVELOPE_RECIPIENTS_HEADER], attempts, exception))
+            self.maildir.add_folder(FAILED_FOLDER_NAME).add(message)
+            self.maildir.remove(key)
+            return False
+
+        nextAttempt = now + self.retrySeconds * 2 ** (attempts - 1)
+        del message[NEXT_ATTEMPT_HEADER]
+        message[NEXT_ATTEMPT_HEADER] = '{:.0f}'.format(nextAttempt)
+        logger.warning('Failed to send email {} for {} (attempt {}), trying again after {}.  Exception: {}'
+                       .format(key, message[ENVELOPE_RECIPIENTS_HEADER], attempts, time.ctime(nextAttempt),
+                               exception))
+        self.maildir[key] = message
+        return True
+
+    def deliver(self, mailDispatcher):
+        """
+        Send the messages that are due.  Only one process delivers from the
+        outbox at a time, others return without sending.
+
+        :param mailDispatcher: Sends the messages
+        :type mailDispatcher: mailDispatcher.MailDispatcher
+        :return: Numbers of messages sent, to be tried again, moved to the "failed" folder,
+            and still waiting in the outbox
+        :rtype: dict
+        """
+        stats = {'sent': 0, 'retrying': 0, 'failed': 0, 'waiting': 0}
+
+        with open(os.path.join(self.directory, LOCK_FILE_NAME), 'w') as lockFile:
+            try:
+                fcntl.flock(lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                logger.info('Outbox {} is being delivered by another process'.format(self.directory))
+                stats['waiting'] = len(self)
+                return stats
+
+            now = time.time()
+            dueMessages = self._getDueMessages(now)
+
+            # The messages are read and removed here, only sending is done at the same time.
+            results = mailDispatcher.sendAll([self._getEnvelope(message) for (_, message) in dueMessages])
+
+            for ((key, message), (_, refused, exception)) in zip(dueMessages, results):
+                if exception is None:
+                    if refused:
+                        logger.warning('Email {} was refused for {}'.format(key, list(refused)))
+                    self.maildir.remove(key)
+                    stats['sent'] += 1
+                elif self._retryLater(key, message, exception, now):
+                    stats['retrying'] += 1
+                else:
+                    stats['failed'] += 1
+
+            stats['waiting'] = len(self)
+
+        return stats
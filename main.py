@@ -2,6 +2,8 @@
 ### set log level by property / env variable
 
 import argparse
+import asyncio
+from collections import Counter
 from datetime import datetime
 import logging
 
@@ -11,6 +13,7 @@ loggingLevel = None
 import sys
 import os
 import re
+import threading
 
 import arcgisUM
 
@@ -22,12 +25,20 @@ from bs4.builder._htmlparser import HTMLParserTreeBuilder
 
 import config
 
-from CanvasAPI import CanvasAPI
+from CanvasAPI import CanvasAPI, CanvasObjectCache
+from RequestsPlus import HTTPCache, RateLimitGovernor, RetryPolicy
+from syncState import SyncState
+from courseRoster import CourseRoster
+from courseLogBuffer import CourseLogBuffer
+from mailDispatcher import MailDispatcher
+from mailOutbox import MailOutbox
+from phaseTimer import PhaseTimer
 
 # The secrets module really is used during import (to change sensitive
 # properties). 
 import secrets #@UnusedImport
 
+import metrics
 import util
 
 ##### Improved code tracebacks for exceptions
@@ -45,6 +56,12 @@ RUN_START_TIME_FORMATTED = RUN_START_TIME.strftime('%Y%m%d%H%M%S')
 # Hold parsed options
 options = None
 
+# Attributes of Canvas objects used by kartograafr.  No others are kept.
+COURSE_FIELDS = ('id', 'name')
+ASSIGNMENT_FIELDS = ('id', 'name', 'course_id', 'due_at', 'lock_at', 'rubric')
+USER_FIELDS = ('id', 'name', 'login_id', 'sis_login_id', 'enrollments')
+OUTCOME_LINK_FIELDS = ('outcome',)
+
 # Adjustable level to use for all logging
 logger.error("loggingLevel: {}".format(loggingLevel))
              
@@ -55,56 +72,115 @@ logger = None  # type: logging.Logger
 logFormatter = None  # type: logging.Formatter
 courseLogHandlers = dict()
 courseLoggers = dict()
+courseLoggersLock = threading.Lock()  # Course loggers may be needed by several group sync workers at once
+mainLogHandler = None  # type: logging.FileHandler
+courseLogBuffer = None  # type: CourseLogBuffer
+phaseTimer = None  # type: PhaseTimer
+
+def getCanvasInstance(refreshCache=False):
+    httpCache = None
+    if config.Canvas.HTTP_CACHE_DIRECTORY is not None:
+        httpCache = HTTPCache(config.Canvas.HTTP_CACHE_DIRECTORY,
+                              maxBytes=config.Canvas.HTTP_CACHE_MAX_BYTES)
+
+    objectCache = None
+    if config.Canvas.OBJECT_CACHE_PATH is not None:
+        objectCache = CanvasObjectCache(config.Canvas.OBJECT_CACHE_PATH,
+                                        config.Canvas.OBJECT_CACHE_TIMES_TO_LIVE,
+                                        refresh=refreshCache)
 
-def getCanvasInstance():
     return CanvasAPI(config.Canvas.API_BASE_URL,
-                     authZToken=config.Canvas.API_AUTHZ_TOKEN)
+                     authZToken=config.Canvas.API_AUTHZ_TOKEN,
+                     perPage=config.Canvas.PER_PAGE,
+                     pageWorkerCount=config.Application.Concurrency.CANVAS_PAGE_WORKER_COUNT,
+                     httpCache=httpCache,
+                     objectCache=objectCache,
+                     rateLimitGovernor=RateLimitGovernor(
+                         maxInFlight=config.Application.Concurrency.CANVAS_MAX_IN_FLIGHT_REQUESTS),
+                     retryPolicy=RetryPolicy(maxAttempts=config.Canvas.RETRY_MAX_ATTEMPTS,
+                                             retryBudget=config.Canvas.RETRY_BUDGET,
+                                             maxThrottledAttempts=config.Canvas.RETRY_MAX_THROTTLED_ATTEMPTS),
+                     poolHostCount=config.Canvas.CONNECTION_POOL_HOST_COUNT,
+                     poolMaxSize=config.Canvas.CONNECTION_POOL_MAX_SIZE,
+                     keepAlive=config.Canvas.KEEP_ALIVE,
+                     metricsRegistry=metrics.registry)
+
+
+
+def mapCourses(function, courseIDs):
+    """Call function for each course ID, using the configured number of Canvas workers.
+
+    A course whose call raises an exception is logged and left out of the results, so
+    one bad course doesn't prevent the other courses from being processed.
+
+    :param function: Function taking a single course ID as its argument
+    :type function: callable
+    :param courseIDs: Canvas course ID numbers
+    :type courseIDs: set or list
+    :return: (courseID, result) pairs, in the same order as courseIDs
+    :rtype: list of tuple
+    """
+    courseResults = []
+    for (courseID, result, exception) in util.mapConcurrently(function, courseIDs,
+                                                              config.Application.Concurrency.CANVAS_WORKER_COUNT):
+        if exception is not None:
+            logger.error('Skipping Course {}, error while getting information from Canvas: {}'
+                         .format(courseID, exception))
+            continue
+        courseResults.append((courseID, result))
 
+    return courseResults
 
 
 def getCourseIDsWithOutcome(canvas, courseIDs, outcome):
     """Get Canvas courses that have assignments marked with outcome indicating there should be a corresponding ArgGIS group."""
-    matchingCourseIDs = set()
-    for courseID in courseIDs:
+
+    def courseHasOutcome(courseID):
         courseOutcomeGroupLinks = \
-            canvas.getCoursesOutcomeGroupLinksObjects(courseID)
+            canvas.getCoursesOutcomeGroupLinksObjects(courseID, fields=OUTCOME_LINK_FIELDS)
 
-        # Is it possible to short-circuit this using itertools?
-        matchingCourseIDs.update(
-            set(courseID for outcomeLink in courseOutcomeGroupLinks
-                if outcomeLink.outcome.id == outcome.id)
-        )
+        return any(outcomeLink.outcome.id == outcome.id for outcomeLink in courseOutcomeGroupLinks)
 
-    return matchingCourseIDs
+    return set(courseID for (courseID, hasOutcome) in mapCourses(courseHasOutcome, courseIDs)
+               if hasOutcome)
 
 
 def getCourseAssignmentsWithOutcome(canvas, courseIDs, outcome):
     """Get specific assignments from Canvas courses.  Remove assignments that are expired or aren't marked to match up with ArgGIS group."""
+
+    def getAssignmentsWithOutcome(courseID):
+        courseAssignments = canvas.iterCoursesAssignments(courseID, fields=ASSIGNMENT_FIELDS)
+
+        return [assignment for assignment in courseAssignments
+                if assignmentHasOutcome(assignment, courseID, outcome)]
+
     matchingCourseAssignments = []
-    for courseID in courseIDs:
-        courseAssignments = canvas.getCoursesAssignmentsObjects(courseID)
-
-        for assignment in courseAssignments:
-            expirationTimestamp = assignment.lock_at or assignment.due_at
-            expirationTime = dateutil.parser.parse(expirationTimestamp) if expirationTimestamp else RUN_START_TIME
-            if (expirationTime < RUN_START_TIME):
-                logger.info('Skipping Assignment {} for Course {}, expired on: {}'
-                            .format(assignment,
-                                    courseID,
-                                    assignment.lock_at if assignment.lock_at else assignment.due_at))
-                continue
-            if not assignment.rubric:
-                logger.info('Skipping Assignment {} for Course {}, no rubrics'
-                            .format(assignment,
-                                    courseID))
-                continue
-            for rubric in assignment.rubric:
-                if rubric.outcome_id == outcome.id:
-                    matchingCourseAssignments.append(assignment)
-                    break
+    for (courseID, courseAssignments) in mapCourses(getAssignmentsWithOutcome, courseIDs):
+        matchingCourseAssignments.extend(courseAssignments)
     return matchingCourseAssignments
 
 
+def assignmentHasOutcome(assignment, courseID, outcome):
+    """Check whether an assignment is still open and has a rubric using the outcome."""
+    expirationTimestamp = assignment.lock_at or assignment.due_at
+    expirationTime = dateutil.parser.parse(expirationTimestamp) if expirationTimestamp else RUN_START_TIME
+    if (expirationTime < RUN_START_TIME):
+        logger.info('Skipping Assignment {} for Course {}, expired on: {}'
+                    .format(assignment,
+                            courseID,
+                            assignment.lock_at if assignment.lock_at else assignment.due_at))
+        return False
+    if not assignment.rubric:
+        logger.info('Skipping Assignment {} for Course {}, no rubrics'
+                    .format(assignment,
+                            courseID))
+        return False
+    for rubric in assignment.rubric:
+        if rubric.outcome_id == outcome.id:
+            return True
+    return False
+
+
 # Take two lists and separate out entries only in first list, those only in second list, and those in both.
 # Uses sets to do this so duplicate entries will become singular and order in the list will be arbitrary.
 def computeListDifferences(leftList, rightList):
@@ -119,34 +195,28 @@ def computeListDifferences(leftList, rightList):
 # Look at lists of users already in group and those currently in the course and return new lists
 # of only the users that need to be added and need to be removed, so unchanged people remain untouched.
 
-def minimizeUserChanges(groupUsers, courseUsers):
-    """Compute minimal changes to ArgGIS group membership so that members who don't need to be changed aren't changed."""
-    logger.debug('groupUsers input: {}'.format(groupUsers))
-    logger.debug('courseUsers input: {}'.format(courseUsers))
-    
-    # Based on current Canvas and ArcGIS memberships find obsolete users in ArcGIS group, new users in course,
-    # and members in both (hence unchanged).
-    minGroupUsers, minCourseUsers, unchangedUsers = computeListDifferences(groupUsers,courseUsers)
-    
-    logger.info('changedArcGISGroupUsers: {} changedCanvasUsers: {} unchanged Users {}'.format(minGroupUsers,minCourseUsers,unchangedUsers))
-  
-    return minGroupUsers, minCourseUsers
-
-def updateGroupUsers(courseUserDictionary, course, instructorLog, groupTitle, group):
-    """Add remove / users from group to match Canvas course"""
+def updateGroupUsers(courseUserDictionary, course, instructorLog, groupTitle, group, groupUsers=None,
+                     courseRoster=None):
+    """Add remove / users from group to match Canvas course.  Return the log, the Canvas login IDs of the group's
+    members afterwards, or None if they aren't known because users couldn't be removed, and the login IDs of the
+    course's users ArcGIS wouldn't add.  If the group's members (Canvas login IDs) are already known, they aren't requested from ArcGIS.
+    The course roster is shared by all of the course's groups.  Without one, it's made from the course's users."""
     
     # get the arcgis group members and the canvas course members.
     groupNameAndID = util.formatNameAndID(group)
-    groupUsers = arcgisUM.getCurrentArcGISMembers(group, groupNameAndID)
-    logger.debug('group users: {}'.format(groupUsers))
-    groupUsersTrimmed = [re.sub('_\S+$', '', gu) for gu in groupUsers]
+    if courseRoster is None:
+        courseRoster = CourseRoster.fromUsers(course.id, courseUserDictionary[course.id])
+    if groupUsers is None:
+        groupUsers = arcgisUM.getCurrentArcGISMembers(group, groupNameAndID)
+        logger.debug('group users: {}'.format(groupUsers))
+        groupUsersTrimmed = CourseRoster.getLoginIDs(groupUsers)
+    else:
+        groupUsersTrimmed = set(groupUsers)
     logger.debug('All ArcGIS users currently in Group {}: ArcGIS Users: {}'.format(groupNameAndID, groupUsers))
-    canvasCourseUsers = [user.login_id for user in courseUserDictionary[course.id] if user.login_id is not None]
-    logger.debug('All Canvas users in course for Group {}: Canvas Users: {}'.format(groupNameAndID, canvasCourseUsers))
     
     # compute the exact sets of users to change.
-    changedArcGISGroupUsers, changedCourseUsers = minimizeUserChanges(groupUsersTrimmed, canvasCourseUsers)
-    # added to avoid undefined variable warning
+    changedArcGISGroupUsers, changedCourseUsers, unchangedUsers = courseRoster.planChanges(groupUsersTrimmed)
+    logger.info('changedArcGISGroupUsers: {} changedCanvasUsers: {} unchanged Users {}'.format(changedArcGISGroupUsers,changedCourseUsers,unchangedUsers))
     
     # fix up the user name format for ArcGIS users names
     changedArcGISGroupUsers = arcgisUM.formatUsersNamesForArcGIS(changedArcGISGroupUsers)
@@ -154,56 +224,194 @@ def updateGroupUsers(courseUserDictionary, course, instructorLog, groupTitle, gr
     logger.info('Users to add from Canvas course for ArcGIS: Group {}: Canvas Users: {}'.format(groupNameAndID, changedCourseUsers))
     
     # Now update only the users in the group that have changed.
-    instructorLog, results = arcgisUM.removeSomeExistingGroupMembers(groupTitle, group, instructorLog, changedArcGISGroupUsers)  # @UnusedVariable
-    instructorLog = arcgisUM.addCanvasUsersToGroup(instructorLog, group, changedCourseUsers)
-    
-    return instructorLog
+    instructorLog, removeResults = arcgisUM.removeSomeExistingGroupMembers(groupTitle, group, instructorLog, changedArcGISGroupUsers)
+    instructorLog, usersNotAdded = addGroupUsers(instructorLog, group, changedCourseUsers, courseRoster)
 
-def updateArcGISGroupForAssignment(arcGIS, courseUserDictionary, groupTags, assignment, course,instructorLog):
-    """" Make sure there is a corresponding ArcGIS group for this Canvas course and assignment.  Sync up the ArcGIS members with the Canvas course members."""
+    # The group's members are known only if every user to be removed was.  Users ArcGIS wouldn't add, usually
+    # because they don't have ArcGIS accounts, are left out of them.
+    if removeResults is None or (removeResults or {}).get('notRemoved'):
+        groupMembers = None
+    else:
+        groupMembers = (groupUsersTrimmed & courseRoster.loginIDs) | (set(changedCourseUsers) - usersNotAdded)
+
+    return instructorLog, groupMembers, usersNotAdded
+
+
+def addGroupUsers(instructorLog, group, loginIDs, courseRoster):
+    """Add the course's users to the group.  Users ArcGIS wouldn't add to another of the course's groups aren't
+    sent again.  Return the log and the login IDs of the users ArcGIS wouldn't add."""
+    usersNotAddable = courseRoster.getUsersNotAdded()
+    instructorLog, addResults = arcgisUM.addCanvasUsersToGroup(instructorLog, group, loginIDs, usersNotAddable)
+    courseRoster.addUsersNotAdded(addResults.get('notAdded'), len(usersNotAddable.intersection(
+        arcgisUM.formatUsersNamesForArcGIS(loginIDs))))
+
+    return instructorLog, CourseRoster.getLoginIDs(addResults.get('notAdded') or ())
+
+
+def updateArcGISGroupForAssignment(arcGIS, courseUserDictionary, groupTags, assignment, course,instructorLog,
+                                   groupIndex=None, syncState=None, fullResync=False, courseRoster=None):
+    """" Make sure there is a corresponding ArcGIS group for this Canvas course and assignment.  Sync up the ArcGIS members with the Canvas course members.
+
+    With a sync state, the group's members are taken from the state when the group hasn't been modified since its
+    last update.  If the course's members haven't changed either, the group is skipped, except that users ArcGIS
+    wouldn't add last time are sent again, because their ArcGIS accounts may have been created since.  fullResync
+    ignores the state.  The course roster is shared by all of the course's groups.  Return "skipped", "synced",
+    "notAddable" if some users couldn't be added, or "failed".
+    """
      
     groupTitle = '%s_%s_%s_%s' % (course.name, course.id, assignment.name, assignment.id)
     
-    group = arcgisUM.lookForExistingArcGISGroup(arcGIS, groupTitle)
+    group = arcgisUM.lookForExistingArcGISGroup(arcGIS, groupTitle, groupIndex)
      
     if group is None:
+        if groupIndex is not None:
+            existingGroup = groupIndex.getGroupForAssignment(course.id, assignment.id)
+            if existingGroup is not None:
+                logger.warning('ArcGIS group "{}" exists for this assignment, but the course or assignment name '
+                               'has changed.  Creating ArcGIS group "{}".'.format(existingGroup.title, groupTitle))
         group, instructorLog = arcgisUM.createNewArcGISGroup(arcGIS, groupTags, groupTitle,instructorLog)
+        if group is not None and groupIndex is not None:
+            groupIndex.add(group)
     
     # if creation didn't work then log that.
     if group is None:
         logger.info('Problem creating or updating ArcGIS group "{}": Missing group object.'.format(groupTitle))
         instructorLog += 'Problem creating or updating ArcGIS group "{}"\n'.format(groupTitle)
-    else: 
-        # have a group.  Might be new or existing.
-        instructorLog = updateGroupUsers(courseUserDictionary, course, instructorLog, groupTitle, group)
-        
+        status = 'failed'
+    else:
+        groupModified = getattr(group, 'modified', None)
+        if courseRoster is None:
+            courseRoster = CourseRoster.fromUsers(course.id, courseUserDictionary[course.id])
+        courseLoginIDs = courseRoster.loginIDs
+
+        # Stored members can be trusted only if nothing was changed in ArcGIS since they were stored.
+        knownGroupUsers = None
+        knownUsersNotAdded = frozenset()
+        if syncState is not None and not fullResync:
+            assignmentState = syncState.getAssignmentState(course.id, assignment.id)
+            if assignmentState is not None and assignmentState.describesGroup(group.id, groupModified):
+                knownGroupUsers = assignmentState.members
+                knownUsersNotAdded = assignmentState.usersNotAdded
+
+        if knownGroupUsers is not None and knownGroupUsers | knownUsersNotAdded == courseLoginIDs:
+            if knownUsersNotAdded:
+                logger.info('Adding users not added before to unchanged ArcGIS group {}'
+                            .format(util.formatNameAndID(group)))
+                instructorLog, usersNotAdded = addGroupUsers(instructorLog, group, sorted(knownUsersNotAdded),
+                                                             courseRoster)
+                groupMembers = knownGroupUsers | (knownUsersNotAdded - usersNotAdded)
+                status = 'notAddable' if usersNotAdded else 'synced'
+            else:
+                logger.info('Skipping unchanged ArcGIS group {}'.format(util.formatNameAndID(group)))
+                instructorLog += 'ArcGIS group "{}" is up to date\n'.format(groupTitle)
+                (groupMembers, usersNotAdded) = (knownGroupUsers, knownUsersNotAdded)
+                status = 'skipped'
+        else:
+            # have a group.  Might be new or existing.
+            instructorLog, groupMembers, usersNotAdded = updateGroupUsers(
+                courseUserDictionary, course, instructorLog, groupTitle, group, knownGroupUsers, courseRoster)
+            if groupMembers is None:
+                status = 'failed'
+            else:
+                status = 'notAddable' if usersNotAdded else 'synced'
+
+        if syncState is not None:
+            syncState.putAssignmentState(course.id, assignment.id, group.id, group.title, groupModified,
+                                         groupMembers, status, usersNotAdded)
+
     courseLogger = getCourseLogger(course.id, course.name)
     logger.debug("update group instructor log: {}".format(instructorLog))
     courseLogger.info(instructorLog)
 
+    return status
 
-# For all the assignments and their courses update the ArcGIS group.
-def updateArcGISGroupsForAssignments(arcGIS, assignments, courseDictionary,courseUserDictionary):
-    """For each assignment listed ensure there is an ArcGIS group corresponding to the Canvas course / assignment."""
 
-    groupTags = ','.join(('kartograafr', 'umich'))
+# For all the assignments and their courses update the ArcGIS group.
+def updateArcGISGroupsForAssignments(arcGIS, assignments, courseDictionary,courseUserDictionary, syncState=None,
+                                     fullResync=False):
+    """For each assignment listed ensure there is an ArcGIS group corresponding to the Canvas course / assignment.
+    Unless fullResync is True, groups that haven't changed since their last update are skipped.  Up to
+    Concurrency.ARCGIS_GROUP_WORKER_COUNT groups are updated at the same time.  An assignment whose update raises
+    an exception is counted as failed.  Return the number of assignments with each outcome."""
+
+    groupTags = ','.join((arcgisUM.KARTOGRAAFR_GROUP_TAG, 'umich'))
     logger.debug("groupTags: {}".format(groupTags))
+
+    # Find all of the existing groups at once, instead of searching for each assignment's group.
+    groupIndex = arcgisUM.ArcGISGroupIndex(arcGIS)
+
+    availableAssignments = []
     for assignment in assignments:
-        course = courseDictionary[assignment.course_id]
+        if courseDictionary.get(assignment.course_id) is None or assignment.course_id not in courseUserDictionary:
+            logger.warning('Skipping Assignment {} for Course {}, course information not available from Canvas'
+                           .format(assignment, assignment.course_id))
+            continue
+        availableAssignments.append(assignment)
+
+    # Each course's users are prepared once for all of its groups.
+    courseRosters = dict((courseID, CourseRoster.fromUsers(courseID, courseUserDictionary[courseID]))
+                         for courseID in set(assignment.course_id for assignment in availableAssignments))
+
+    # Each course's log is written once all of its groups are done.
+    remainingGroupCounts = Counter(assignment.course_id for assignment in availableAssignments)
+    remainingGroupCountsLock = threading.Lock()
+
+    def updateGroup(assignment):
         instructorLog = ''
-        updateArcGISGroupForAssignment(arcGIS, courseUserDictionary, groupTags, assignment, course,instructorLog)
+        try:
+            return updateArcGISGroupForAssignment(arcGIS, courseUserDictionary, groupTags, assignment,
+                                                  courseDictionary[assignment.course_id], instructorLog, groupIndex,
+                                                  syncState, fullResync, courseRosters[assignment.course_id])
+        finally:
+            with remainingGroupCountsLock:
+                remainingGroupCounts[assignment.course_id] -= 1
+                courseDone = remainingGroupCounts[assignment.course_id] == 0
+            if courseDone:
+                flushCourseLog(assignment.course_id)
+
+    # Each assignment has its own group, so groups can be updated at the same time.  The group index, sync
+    # state and course loggers are shared safely.
+    groupStatusCounts = Counter()
+    for (assignment, groupStatus, exception) in util.mapConcurrently(
+            updateGroup, availableAssignments, config.Application.Concurrency.ARCGIS_GROUP_WORKER_COUNT):
+        if exception is not None:
+            logger.error('Error while updating ArcGIS group for Assignment {} of Course {}: {}'
+                         .format(assignment, assignment.course_id, exception))
+            groupStatus = 'failed'
+        groupStatusCounts[groupStatus] += 1
+
+    if syncState is not None:
+        # Forget assignments that no longer use the outcome or have expired, but only in courses that were checked.
+        removedCount = syncState.removeOtherAssignments(
+            [courseID for courseID in courseDictionary if courseID in courseUserDictionary],
+            [assignment.id for assignment in assignments])
+        logger.info('Removed sync state of {} obsolete assignments'.format(removedCount))
+
+    logger.info('ArcGIS group index statistics: {}'.format(groupIndex.getStats()))
+    rosterStats = Counter()
+    for courseRoster in courseRosters.values():
+        rosterStats.update(courseRoster.getStats())
+    logger.info('Course rosters: {} shared by {} groups, {} users not sent to ArcGIS again'
+                .format(len(courseRosters), rosterStats['groups'], rosterStats['usersNotResent']))
+    logger.info('ArcGIS groups synced: {}, synced without users ArcGIS would not add: {}, skipped as unchanged: {}, '
+                'failed: {}{}'.format(groupStatusCounts['synced'], groupStatusCounts['notAddable'],
+                                      groupStatusCounts['skipped'], groupStatusCounts['failed'],
+                                      ' (full resync)' if fullResync else ''))
+
+    return groupStatusCounts
 
 
 def getCoursesByID(canvas, courseIDs):
     """Get Canvas course objects for the listed courses."""
-    courses = {}
-    for courseID in courseIDs:
+
+    def getCourse(courseID):
         logger.info("getCoursesById: courseId: {}".format(courseID))
-        courses[courseID] = canvas.getCourseObject(courseID)
-    return courses
+        return canvas.getCourseObject(courseID, fields=COURSE_FIELDS)
+
+    return dict(mapCourses(getCourse, courseIDs))
 
 
-def getCoursesUsersByID(canvas, courseIDs, enrollmentType=None):
+def getCoursesUsersByID(canvas, courseIDs, enrollmentType=None, splitInstructors=False):
     """Get Canvas course members for specific course.  Can filter by members's Canvas role.
 
     :param canvas:
@@ -212,13 +420,262 @@ def getCoursesUsersByID(canvas, courseIDs, enrollmentType=None):
     :type courseIDs: set or list
     :param enrollmentType: (optional) Canvas user enrollment type: 'student', 'teacher', etc.
     :type enrollmentType: str
-    :return:
+    :param splitInstructors: (optional) If True, get each course's members once and return them
+        along with a separate dictionary of each course's instructors.  enrollmentType is ignored.
+    :type splitInstructors: bool
+    :return: Dictionary of course members, keyed by course ID.  With splitInstructors, a tuple of
+        that dictionary and a dictionary of course instructors.
+    :rtype: dict or (dict, dict)
+    """
+    if splitInstructors:
+        coursesUsers = {}
+        coursesInstructors = {}
+        for (courseID, (users, instructors)) in mapCourses(
+                lambda courseID: canvas.getCoursesUsersAndInstructorsObjects(courseID, fields=USER_FIELDS,
+                                                                             **{'include[]': 'email'}),
+                courseIDs):
+            coursesUsers[courseID] = users
+            coursesInstructors[courseID] = instructors
+        return coursesUsers, coursesInstructors
+
+    def getCourseUsers(courseID):
+        return canvas.getCoursesUsersObjects(courseID, enrollmentType=enrollmentType, fields=USER_FIELDS,
+                                             **{'include[]': 'email'})
+
+    return dict(mapCourses(getCourseUsers, courseIDs))
+
+
+def logMatchingCourseIDs(matchingCourseIDs, outcome):
+    """Log the courses found for the outcome.  It's an error if there aren't any."""
+    if len(matchingCourseIDs) == 0:
+        raise RuntimeError('No Courses linked to Outcome {} were found'.format(outcome))
+
+    logger.info('Config -> Found Course IDs for Outcome {}: {}'.format(outcome,
+                                                                       list(matchingCourseIDs)))
+
+
+def logMatchingCourseAssignments(matchingCourseAssignments, outcome):
+    """Log the assignments found for the outcome.  Return False if there aren't any."""
+    if not matchingCourseAssignments:
+        logger.info('No valid Assignments linked to Outcome {} were found'.format(outcome))
+        return False
+
+    logger.info('Found Assignments linked to Outcome {}: {}'.format(outcome,
+                                                                    ', '.join(map(str, matchingCourseAssignments))))
+    return True
+
+
+def startPhase(phase):
+    """Time the following work under the named phase of the run."""
+    if phaseTimer is not None:
+        phaseTimer.startPhase(phase)
+
+
+def setCanvasPhase(canvas, phase):
+    """Count the cost and time of the following Canvas requests under the named phase of the run."""
+    startPhase(phase)
+    if canvas.rateLimitGovernor is not None:
+        canvas.rateLimitGovernor.setPhase(phase)
+
+
+def getCanvasCourseData(canvas, courseIDs, outcome):
+    """Get the assignments linked to the outcome and the courses and users they belong to.
+
+    :param canvas:
+    :type canvas: CanvasAPI
+    :param courseIDs: Canvas course ID numbers to be checked for the outcome
+    :type courseIDs: set or list
+    :param outcome: Canvas outcome marking assignments which need ArcGIS groups
+    :type outcome: CanvasObject
+    :return: Matching assignments, then dictionaries of courses, course users and course instructors,
+        keyed by course ID.  None if there are no matching assignments.
+    :rtype: tuple or None
+    """
+    setCanvasPhase(canvas, 'outcome links')
+    matchingCourseIDs = getCourseIDsWithOutcome(canvas, courseIDs, outcome)
+    logMatchingCourseIDs(matchingCourseIDs, outcome)
+
+    logger.info('Searching specified Courses for Assignments linked to Outcome {}'.format(outcome))
+    setCanvasPhase(canvas, 'assignments')
+    matchingCourseAssignments = getCourseAssignmentsWithOutcome(canvas, matchingCourseIDs, outcome)
+
+    if not logMatchingCourseAssignments(matchingCourseAssignments, outcome):
+        return None
+
+    setCanvasPhase(canvas, 'courses and users')
+    courseDictionary = getCoursesByID(canvas, matchingCourseIDs)
+    (courseUserDictionary, courseInstructorDictionary) = getCoursesUsersByID(canvas, matchingCourseIDs,
+                                                                             splitInstructors=True)
+
+    return matchingCourseAssignments, courseDictionary, courseUserDictionary, courseInstructorDictionary
+
+
+def getCanvasCourseDataGraphQL(canvas, courseIDs, outcome):
+    """GraphQL version of getCanvasCourseData().  Each course's assignments, course object and users
+    are requested together, usually in a single request, instead of separately from the REST API.
+
+    Courses are matched by the outcome in their assignments' rubrics, rather than by their outcome
+    group links, which would take another request per course.
     """
+    setCanvasPhase(canvas, 'graphql course data')
+
+    def getCourseData(courseID):
+        return canvas.getCourseDataObjects(courseID, courseFields=COURSE_FIELDS,
+                                           assignmentFields=ASSIGNMENT_FIELDS, userFields=USER_FIELDS)
+
+    coursesData = dict((courseID, courseData) for (courseID, courseData) in mapCourses(getCourseData, courseIDs)
+                       if courseData is not None)
+
+    matchingCourseIDs = set(courseID for (courseID, (course, assignments, users)) in coursesData.items()
+                            if any(rubric.outcome_id == outcome.id
+                                   for assignment in assignments for rubric in assignment.rubric or []))
+    logMatchingCourseIDs(matchingCourseIDs, outcome)
+
+    logger.info('Searching specified Courses for Assignments linked to Outcome {}'.format(outcome))
+    matchingCourseAssignments = []
+    for courseID in matchingCourseIDs:
+        matchingCourseAssignments.extend(assignment for assignment in coursesData[courseID][1]
+                                         if assignmentHasOutcome(assignment, courseID, outcome))
+
+    if not logMatchingCourseAssignments(matchingCourseAssignments, outcome):
+        return None
+
+    courseDictionary = {}
+    courseUserDictionary = {}
+    courseInstructorDictionary = {}
+    for courseID in matchingCourseIDs:
+        (course, assignments, users) = coursesData[courseID]
+        courseDictionary[courseID] = course
+        courseUserDictionary[courseID] = users
+        courseInstructorDictionary[courseID] = CanvasAPI.getInstructors(users)
+
+    return matchingCourseAssignments, courseDictionary, courseUserDictionary, courseInstructorDictionary
+
+
+##### asyncio versions of the Canvas course functions.  Requests for all the
+##### courses are awaited at the same time on a single event loop.
+
+def getAsyncCanvasInstance(canvas):
+    """Make an AsyncCanvasAPI sharing the caches, rate limit, retry budget and metrics of a CanvasAPI."""
+    from CanvasAPI.AsyncCanvasAPI import AsyncCanvasAPI
+
+    return AsyncCanvasAPI(canvas.apiBaseURL,
+                          authZToken=canvas.authZToken,
+                          connectionLimit=config.Application.Concurrency.CANVAS_ASYNC_CONNECTION_LIMIT,
+                          perPage=canvas.perPage,
+                          httpCache=canvas.httpCache,
+                          objectCache=canvas.objectCache,
+                          rateLimitGovernor=canvas.rateLimitGovernor,
+                          retryPolicy=canvas.retryPolicy,
+                          metricsRegistry=canvas.metricsRegistry)
+
+
+async def gatherCourses(coroutineFunction, courseIDs):
+    """asyncio version of mapCourses().  Await coroutineFunction for all course IDs at the same time.
+
+    :param coroutineFunction: Coroutine function taking a single course ID as its argument
+    :type coroutineFunction: callable
+    :param courseIDs: Canvas course ID numbers
+    :type courseIDs: set or list
+    :return: (courseID, result) pairs, in the same order as courseIDs
+    :rtype: list of tuple
+    """
+    courseIDs = list(courseIDs)
+    results = await asyncio.gather(*[coroutineFunction(courseID) for courseID in courseIDs],
+                                   return_exceptions=True)
+
+    courseResults = []
+    for (courseID, result) in zip(courseIDs, results):
+        if isinstance(result, Exception):
+            logger.error('Skipping Course {}, error while getting information from Canvas: {}'
+                         .format(courseID, result))
+            continue
+        courseResults.append((courseID, result))
+
+    return courseResults
+
+
+async def getCourseIDsWithOutcomeAsync(canvas, courseIDs, outcome):
+    """asyncio version of getCourseIDsWithOutcome()."""
+
+    async def courseHasOutcome(courseID):
+        courseOutcomeGroupLinks = await canvas.getCoursesOutcomeGroupLinksObjects(courseID,
+                                                                                  fields=OUTCOME_LINK_FIELDS)
+
+        return any(outcomeLink.outcome.id == outcome.id for outcomeLink in courseOutcomeGroupLinks)
+
+    return set(courseID for (courseID, hasOutcome) in await gatherCourses(courseHasOutcome, courseIDs)
+               if hasOutcome)
+
+
+async def getCourseAssignmentsWithOutcomeAsync(canvas, courseIDs, outcome):
+    """asyncio version of getCourseAssignmentsWithOutcome()."""
+
+    async def getAssignmentsWithOutcome(courseID):
+        courseAssignments = await canvas.getCoursesAssignmentsObjects(courseID, fields=ASSIGNMENT_FIELDS)
+
+        return [assignment for assignment in courseAssignments
+                if assignmentHasOutcome(assignment, courseID, outcome)]
+
+    matchingCourseAssignments = []
+    for (courseID, courseAssignments) in await gatherCourses(getAssignmentsWithOutcome, courseIDs):
+        matchingCourseAssignments.extend(courseAssignments)
+    return matchingCourseAssignments
+
+
+async def getCoursesByIDAsync(canvas, courseIDs):
+    """asyncio version of getCoursesByID()."""
+
+    async def getCourse(courseID):
+        return await canvas.getCourseObject(courseID, fields=COURSE_FIELDS)
+
+    return dict(await gatherCourses(getCourse, courseIDs))
+
+
+async def getCoursesUsersAndInstructorsByIDAsync(canvas, courseIDs):
+    """asyncio version of getCoursesUsersByID(splitInstructors=True)."""
+
+    async def getCourseUsersAndInstructors(courseID):
+        return await canvas.getCoursesUsersAndInstructorsObjects(courseID, fields=USER_FIELDS,
+                                                                 **{'include[]': 'email'})
+
     coursesUsers = {}
-    for courseID in courseIDs:
-        coursesUsers[courseID] = canvas.getCoursesUsersObjects(courseID, enrollmentType=enrollmentType,
-                                                               params={'include[]': 'email'})
-    return coursesUsers
+    coursesInstructors = {}
+    for (courseID, (users, instructors)) in await gatherCourses(getCourseUsersAndInstructors, courseIDs):
+        coursesUsers[courseID] = users
+        coursesInstructors[courseID] = instructors
+    return coursesUsers, coursesInstructors
+
+
+async def getCanvasCourseDataAsync(canvas, courseIDs, outcome):
+    """asyncio version of getCanvasCourseData()."""
+    matchingCourseIDs = await getCourseIDsWithOutcomeAsync(canvas, courseIDs, outcome)
+    logMatchingCourseIDs(matchingCourseIDs, outcome)
+
+    logger.info('Searching specified Courses for Assignments linked to Outcome {}'.format(outcome))
+    matchingCourseAssignments = await getCourseAssignmentsWithOutcomeAsync(canvas, matchingCourseIDs, outcome)
+
+    if not logMatchingCourseAssignments(matchingCourseAssignments, outcome):
+        return None
+
+    (courseDictionary, (courseUserDictionary, courseInstructorDictionary)) = await asyncio.gather(
+        getCoursesByIDAsync(canvas, matchingCourseIDs),
+        getCoursesUsersAndInstructorsByIDAsync(canvas, matchingCourseIDs))
+
+    return matchingCourseAssignments, courseDictionary, courseUserDictionary, courseInstructorDictionary
+
+
+def runAsyncCanvasDriver(canvas, courseIDs, outcome):
+    """Run getCanvasCourseDataAsync() to completion on a new event loop, with an
+    AsyncCanvasAPI sharing the components of canvas."""
+    loop = asyncio.new_event_loop()
+    canvas = getAsyncCanvasInstance(canvas)
+
+    try:
+        return loop.run_until_complete(getCanvasCourseDataAsync(canvas, courseIDs, outcome))
+    finally:
+        loop.run_until_complete(canvas.close())
+        loop.close()
 
 
 def getCourseLogFilePath(courseID):
@@ -229,9 +686,9 @@ def getCourseLogFilePath(courseID):
     )))
 
 
-def getMainLogFilePath(nameSuffix=None):
-    """Return the path/filename of the main log file."""
-    mainLogName = config.Application.Logging.MAIN_LOG_BASENAME
+def getMainLogFilePath(nameSuffix=None, baseName=None):
+    """Return the path/filename of the main log file, or of another log in its directory with the given base name."""
+    mainLogName = baseName or config.Application.Logging.MAIN_LOG_BASENAME
 
     if nameSuffix is not None:
         mainLogName += '-' + str(nameSuffix)
@@ -256,38 +713,46 @@ def logToStdOut():
     root.addHandler(ch)
 
 def getCourseLogger(courseID, courseName):
-    """Set up course specific logger.
+    """Set up course specific logger.  Its records are kept in memory until flushCourseLog() writes them
+    to the course's log file and the main log.
     
     :param courseID: ID number of the course
     :type courseID: str or int
     :param courseName: Name of the course
     :type courseName: str
-    :return: A logging handler for a specific course's log file
-    :rtype: logging.FileHandler
+    :return: A logger for a specific course's log file
+    :rtype: logging.Logger
     """
     global courseLoggers  # type: dict
+    global courseLogBuffer  # type: CourseLogBuffer
  
     courseID = str(courseID)
 
-    if courseID in courseLoggers:
-        return courseLoggers[courseID]
+    # Only one logger, with one set of handlers, may be made for each course.
+    with courseLoggersLock:
+        if courseID in courseLoggers:
+            return courseLoggers[courseID]
+
+        # One buffer is shared by all courses, so no file is kept open for any of them.
+        if courseLogBuffer is None:
+            logFormatterFriendly = logging.Formatter('Running at: %(asctime)s\n\n%(message)s', '%I:%M:%S %p on %B %d, %Y')
 
-    logFormatterFriendly = logging.Formatter('Running at: %(asctime)s\n\n%(message)s', '%I:%M:%S %p on %B %d, %Y')
+            courseLogBuffer = CourseLogBuffer(lambda courseID: getCourseLogFilePath(courseID), mainLogHandler)
+            courseLogBuffer.setFormatter(logFormatterFriendly)
 
-    logHandlerMain = logging.FileHandler(getMainLogFilePath())
-    logHandlerMain.setFormatter(logFormatterFriendly)
+        courseLogger = logging.getLogger(courseID)  # type: logging.Logger
+        courseLogger.setLevel(loggingLevel)
+        courseLogger.addHandler(courseLogBuffer)
 
-    logHandlerCourse = logging.FileHandler(getCourseLogFilePath(courseID))
-    logHandlerCourse.setFormatter(logFormatterFriendly)
+        courseLoggers[courseID] = courseLogger
 
-    courseLogger = logging.getLogger(courseID)  # type: logging.Logger
-    courseLogger.setLevel(loggingLevel)
-    courseLogger.addHandler(logHandlerMain)
-    courseLogger.addHandler(logHandlerCourse)
+        return courseLogger
 
-    courseLoggers[courseID] = courseLogger
 
-    return courseLogger
+def flushCourseLog(courseID):
+    """Write the course's log records to its log file and the main log, once the course is done."""
+    if courseLogBuffer is not None:
+        courseLogBuffer.flushCourse(str(courseID))
 
 
 def getCourseLogHandler(courseID, courseName):
@@ -369,10 +834,24 @@ def renameLogForCourseID(courseID=-1):
     return (oldLogName, newLogName)
 
 
-def emailLogForCourseID(courseID, recipients):
-    """Email course information to a list of multiple recipients."""
+def getMailDispatcher():
+    """
+    :return: A dispatcher sending email through sessions with the configured mail server
+    :rtype: MailDispatcher
+    """
+    return MailDispatcher(config.Application.Email.SMTP_SERVER,
+                          connectionCount=config.Application.Email.SMTP_CONNECTION_COUNT,
+                          keepAliveSeconds=config.Application.Email.SMTP_KEEPALIVE_SECONDS,
+                          debugLevel=config.Application.Email.DEBUG_LEVEL)
+
+
+def getCourseLogMessage(courseID, recipients):
+    """Make the email message of course information for a list of multiple recipients.
+
+    :return: The message, or None if the course has no log to send
+    :rtype: email.mime.text.MIMEText
+    """
 
-    import smtplib
     from email.mime.text import MIMEText
     from email.header import Header
 
@@ -402,20 +881,38 @@ def emailLogForCourseID(courseID, recipients):
     message['From'] = Header(config.Application.Email.SENDER_ADDRESS,'utf-8')
     message['To'] = Header(', '.join(recipients),'utf-8')
     message['Subject'] = Header(config.Application.Email.SUBJECT.format(**locals()),'utf-8')
-      
+
+    return message
+
+
+def getMailOutbox():
+    """
+    :return: The outbox of email waiting to be sent
+    :rtype: MailOutbox
+    """
+    return MailOutbox(config.Application.OUTBOX_DIRECTORY,
+                      maxAttempts=config.Application.Email.OUTBOX_MAX_ATTEMPTS,
+                      retrySeconds=config.Application.Email.OUTBOX_RETRY_SECONDS)
+
+
+def putCourseLogMessage(courseID, recipients, message, mailOutbox):
+    """Put the course's email message in the outbox, then rename its log."""
+
+    if not isinstance(recipients, list):
+        recipients = [recipients]
+
+    courseID = str(courseID)
+
     if options.printEmail is True:
         logger.info("email message: {}".format(message))
     else:
         try:
-            server = smtplib.SMTP(config.Application.Email.SMTP_SERVER)
-            logger.debug("mail server: " + config.Application.Email.SMTP_SERVER)
-            server.set_debuglevel(config.Application.Email.DEBUG_LEVEL)
-            server.sendmail(config.Application.Email.SENDER_ADDRESS, recipients, message.as_string())
-            server.quit()
-            logger.info('Email sent to {recipients} for course {courseID}'.format(**locals()))
+            mailOutbox.put(config.Application.Email.SENDER_ADDRESS, recipients, message)
+            logger.info('Email to {recipients} for course {courseID} put in outbox'.format(**locals()))
         except Exception as exception:
-            logger.exception('Failed to send email to {recipients} for course {courseID}.  Exception: {exception}'
-                         .format(**locals()))
+            logger.exception('Failed to put email to {recipients} for course {courseID} in outbox.  '
+                             'Exception: {exception}'.format(**locals()))
+            return
 
     try:
         (oldLogName, newLogName) = renameLogForCourseID(courseID)
@@ -425,19 +922,121 @@ def emailLogForCourseID(courseID, recipients):
                          .format(**locals()))
 
 
+def emailLogForCourseID(courseID, recipients, mailOutbox=None):
+    """Email course information to a list of multiple recipients.  The message is put in the outbox, to be
+    sent by "--drain-outbox".
+
+    :param mailOutbox: (optional) Outbox the message is put in.  Otherwise the configured outbox is used.
+    :type mailOutbox: MailOutbox
+    """
+
+    message = getCourseLogMessage(courseID, recipients)
+    if message is None:
+        return
+
+    putCourseLogMessage(courseID, recipients, message, mailOutbox or getMailOutbox())
+
+
 def emailCourseLogs(courseInstructors):
     """ Loop through instructors to email course information to them.
+
+    Messages are made at the same time, then put in the outbox.  They are
+    sent by a separate "--drain-outbox" run, so this run doesn't wait for
+    the mail server.
     
     :param courseInstructors: Dictionary of courses to list of their instructors
     :type courseInstructors: dict
     """
     
+    startPhase('email')
     logger.info('Preparing to send email to instructors...')
 
-    for courseID, instructors in list(courseInstructors.items()):
-        recipients = [instructor.sis_login_id +
-                                            config.Application.Email.RECIPIENT_AT_DOMAIN for instructor in instructors]
-        emailLogForCourseID(courseID, recipients)
+    courseRecipients = [(courseID, [instructor.sis_login_id + config.Application.Email.RECIPIENT_AT_DOMAIN
+                                    for instructor in instructors])
+                        for (courseID, instructors) in list(courseInstructors.items())]
+
+    courseMessages = util.mapConcurrently(lambda courseRecipient: getCourseLogMessage(*courseRecipient),
+                                          courseRecipients, config.Application.Concurrency.EMAIL_MESSAGE_WORKER_COUNT)
+
+    mailOutbox = getMailOutbox()
+
+    for ((courseID, recipients), message, exception) in courseMessages:
+        if exception is not None:
+            logger.error('Failed to make email for course {courseID}.  Exception: {exception}'.format(**locals()))
+        elif message is not None:
+            putCourseLogMessage(courseID, recipients, message, mailOutbox)
+
+    logger.info('{} email waiting in outbox {}'.format(len(mailOutbox), mailOutbox.directory))
+
+
+def drainOutbox():
+    """Send the email in the outbox that is due, through a few mail server sessions kept open for all of it.
+    Nothing is logged when the outbox is empty, as it is for most drains."""
+
+    startPhase('drain outbox')
+    mailOutbox = getMailOutbox()
+
+    if not len(mailOutbox):
+        logger.debug('Outbox {} is empty'.format(mailOutbox.directory))
+        return None
+
+    logger.info('Sending email from outbox {}...'.format(mailOutbox.directory))
+
+    with getMailDispatcher() as mailDispatcher:
+        stats = mailOutbox.deliver(mailDispatcher)
+
+    logger.info('Outbox statistics: {}, {} mail server connections'.format(stats, mailDispatcher.connectCount))
+    return stats
+
+
+def exportMetrics():
+    """Write the run's metrics to the configured Prometheus textfile and JSON summary."""
+    for (path, writeMetrics) in ((config.Application.METRICS_TEXTFILE_PATH, metrics.registry.writePrometheusTextfile),
+                                 (config.Application.METRICS_JSON_PATH, metrics.registry.writeJSONSummary)):
+        if path is None:
+            continue
+        try:
+            writeMetrics(path)
+            logger.info('Metrics written to {}'.format(path))
+        except Exception as exception:
+            logger.exception('Failed to write metrics to {}.  Exception: {}'.format(path, exception))
+
+
+def reportPhaseTimes():
+    """Log the time taken by each phase of the run and write it to the run's timing report."""
+    if phaseTimer is None:
+        return
+
+    phaseTimer.stop()
+    for line in phaseTimer.getReport():
+        logger.info('Phase times: {}'.format(line))
+
+    reportPath = os.path.join(config.Application.Logging.DIRECTORY, 'timing',
+                              'timing-{}.json'.format(RUN_START_TIME_FORMATTED))
+    try:
+        phaseTimer.writeReport(reportPath)
+        logger.info('Timing report written to {}'.format(reportPath))
+    except Exception as exception:
+        logger.exception('Failed to write timing report to {}.  Exception: {}'.format(reportPath, exception))
+
+
+def reportUnknownOptions(argumentParser, unknownOptions):
+    """Log and print the command line arguments that weren't recognized, if any."""
+    if unknownOptions:
+        unknownOptionMessage = 'unrecognized arguments: %s' % ' '.join(unknownOptions)
+        usageMessage = argumentParser.format_usage()
+
+        logger.warning(unknownOptionMessage)
+        logger.warning(usageMessage)
+
+        # Also print usage error messages so they will appear in email to sysadmins, sent from crond
+        print(unknownOptionMessage)
+        print(usageMessage)
+
+
+def isDrainRun():
+    """Whether this run only sends the email in the outbox."""
+    return options is not None and options.drainOutbox
 
 
 def main():
@@ -453,11 +1052,46 @@ def main():
     global logger
     global logFormatter
     global options
+    global mainLogHandler
+    global phaseTimer
+
+    argumentParser = argparse.ArgumentParser()
+    argumentParser.add_argument('--mail', '--email', dest='sendEmail',
+                                action=argparse._StoreTrueAction,
+                                help='email all available course logs to instructors, then rename all logs.')
+    argumentParser.add_argument('--printMail', '--printEmail', dest='printEmail',
+                                action=argparse._StoreTrueAction,
+                                help='print emails to log instead of sending them.')
+    argumentParser.add_argument('--async', dest='useAsyncCanvas',
+                                action=argparse._StoreTrueAction,
+                                help='get course information from Canvas using asyncio instead of threads.')
+    argumentParser.add_argument('--refresh-cache', dest='refreshCache',
+                                action=argparse._StoreTrueAction,
+                                help='get fresh copies of cached Canvas objects instead of using the cache.')
+    argumentParser.add_argument('--full-resync', dest='fullResync',
+                                action=argparse._StoreTrueAction,
+                                help='compare the members of every ArcGIS group with ArcGIS, ignoring the state kept from earlier runs.')
+    argumentParser.add_argument('--profile', dest='profile',
+                                action=argparse._StoreTrueAction,
+                                help='profile each phase of the run with cProfile and tracemalloc, '
+                                     'writing the results to the log directory.')
+    argumentParser.add_argument('--drain-outbox', dest='drainOutbox',
+                                action=argparse._StoreTrueAction,
+                                help='send the email waiting in the outbox, then exit without processing courses.')
+    options, unknownOptions = argumentParser.parse_known_args()
 
     logFormatter = util.Iso8601UTCTimeFormatter('%(asctime)s|%(levelname)s|%(name)s|%(message)s')
 
-    logHandler = logging.FileHandler(getMainLogFilePath())
+    if options.drainOutbox:
+        # Drains run every few minutes, also during sync runs, so they have a log of their own and leave the
+        # main log alone.  It's only made once there is something to log.
+        logHandler = logging.FileHandler(
+            getMainLogFilePath(baseName=config.Application.Logging.DRAIN_LOG_BASENAME), delay=True)
+    else:
+        logHandler = logging.FileHandler(getMainLogFilePath())
     logHandler.setFormatter(logFormatter)
+    # Course logs are also written to the main log through this handler.
+    mainLogHandler = logHandler
 
     logger = logging.getLogger(config.Application.Logging.MAIN_LOGGER_NAME)  # type: logging.Logger
     logger.setLevel(loggingLevel)
@@ -466,39 +1100,40 @@ def main():
     # Add logging to stdout for OpenShift.
     logToStdOut()
 
-    logger.info("Starting kartograafr")
+    if options.drainOutbox:
+        reportUnknownOptions(argumentParser, unknownOptions)
+        drainOutbox()
+        return
 
-    argumentParser = argparse.ArgumentParser()
-    argumentParser.add_argument('--mail', '--email', dest='sendEmail',
-                                action=argparse._StoreTrueAction,
-                                help='email all available course logs to instructors, then rename all logs.')
-    argumentParser.add_argument('--printMail', '--printEmail', dest='printEmail',
-                                action=argparse._StoreTrueAction,
-                                help='print emails to log instead of sending them.')
-    options, unknownOptions = argumentParser.parse_known_args()
+    logger.info("Starting kartograafr")
 
-    logger.info('kart sys args: {} '.format(sys.argv[1:]))
 
-    if unknownOptions:
-        unknownOptionMessage = 'unrecognized arguments: %s' % ' '.join(unknownOptions)
-        usageMessage = argumentParser.format_usage()
+    profileDirectory = None
+    if options.profile:
+        profileDirectory = os.path.join(config.Application.Logging.DIRECTORY, 'profile-' + RUN_START_TIME_FORMATTED)
+        logger.info('Profiling phases of the run to {}'.format(profileDirectory))
+    phaseTimer = PhaseTimer(profileDirectory=profileDirectory)
 
-        logger.warning(unknownOptionMessage)
-        logger.warning(usageMessage)
+    logger.info('kart sys args: {} '.format(sys.argv[1:]))
 
-        # Also print usage error messages so they will appear in email to sysadmins, sent from crond
-        print(unknownOptionMessage)
-        print(usageMessage)
+    reportUnknownOptions(argumentParser, unknownOptions)
 
     logger.info('{} email to instructors with logs after courses are processed'
                 .format('Sending' if options.sendEmail else 'Not sending'))
 
-    canvas = getCanvasInstance()
+    startPhase('setup')
+    syncState = None
+    if config.Application.SYNC_STATE_PATH is not None:
+        syncState = SyncState(config.Application.SYNC_STATE_PATH)
+        runID = syncState.startRun(fullResync=options.fullResync)
+
+    canvas = getCanvasInstance(refreshCache=options.refreshCache)
     arcGIS = arcgisUM.getArcGISConnection(config.ArcGIS.SECURITYINFO)
 
     outcomeID = config.Canvas.TARGET_OUTCOME_ID
     logger.info('Config -> Outcome ID to find: {}'.format(outcomeID))
 
+    setCanvasPhase(canvas, 'outcome lookup')
     validOutcome = canvas.getOutcomeObject(outcomeID)
 
     if validOutcome is None:
@@ -513,6 +1148,7 @@ def main():
                 '"{configCoursePageName}" of course {configCourseID}...'
                 .format(**locals()))
 
+    setCanvasPhase(canvas, 'configuration page')
     courseIDs = getCourseIDsFromConfigCoursePage(canvas, configCourseID)
 
     if courseIDs is None:
@@ -529,31 +1165,36 @@ def main():
     logger.info('Config -> Course IDs to check for Outcome {}: {}'.format(validOutcome,
                                                                           list(courseIDs)))
 
-    matchingCourseIDs = getCourseIDsWithOutcome(canvas, courseIDs,
-                                                validOutcome)
-
-    if len(matchingCourseIDs) == 0:
-        raise RuntimeError('No Courses linked to Outcome {} were found'.format(validOutcome))
-
-    logger.info('Config -> Found Course IDs for Outcome {}: {}'.format(validOutcome,
-                                                                       list(matchingCourseIDs)))
-
-    logger.info('Searching specified Courses for Assignments linked to Outcome {}'.format(validOutcome))
-    matchingCourseAssignments = getCourseAssignmentsWithOutcome(
-        canvas, matchingCourseIDs, validOutcome)
-
-    if not matchingCourseAssignments:
-        logger.info('No valid Assignments linked to Outcome {} were found'.format(validOutcome))
+    if options.useAsyncCanvas:
+        startPhase('async course data')
+        canvasCourseData = runAsyncCanvasDriver(canvas, courseIDs, validOutcome)
+    elif config.Canvas.USE_GRAPHQL:
+        canvasCourseData = getCanvasCourseDataGraphQL(canvas, courseIDs, validOutcome)
+    else:
+        canvasCourseData = getCanvasCourseData(canvas, courseIDs, validOutcome)
+
+    if canvas.httpCache is not None:
+        logger.info('Canvas HTTP cache statistics: {}'.format(canvas.httpCache.getStats()))
+    if canvas.objectCache is not None:
+        logger.info('Canvas object cache statistics: {}'.format(canvas.objectCache.getStats()))
+    if canvas.rateLimitGovernor is not None:
+        logger.info('Canvas rate limit statistics: {}'.format(canvas.rateLimitGovernor.getStats()))
+    if canvas.retryPolicy is not None:
+        logger.info('Canvas retry statistics: {}'.format(canvas.retryPolicy.getStats()))
+    logger.info('Canvas connection statistics: {}'.format(canvas.getConnectionStats()))
+
+    if canvasCourseData is None:
+        if syncState is not None:
+            syncState.finishRun(runID)
         return
 
-    logger.info('Found Assignments linked to Outcome {}: {}'.format(validOutcome,
-                                                                    ', '.join(map(str, matchingCourseAssignments))))
-
-    courseDictionary = getCoursesByID(canvas, matchingCourseIDs)
-    courseUserDictionary = getCoursesUsersByID(canvas, matchingCourseIDs)
-    courseInstructorDictionary = getCoursesUsersByID(canvas, matchingCourseIDs, 'teacher')
+    (matchingCourseAssignments, courseDictionary, courseUserDictionary, courseInstructorDictionary) = canvasCourseData
 
-    updateArcGISGroupsForAssignments(arcGIS, matchingCourseAssignments, courseDictionary, courseUserDictionary)
+    startPhase('group sync')
+    groupStatusCounts = updateArcGISGroupsForAssignments(arcGIS, matchingCourseAssignments, courseDictionary,
+                                                         courseUserDictionary, syncState, options.fullResync)
+    if syncState is not None:
+        syncState.finishRun(runID, groupStatusCounts)
 
     closeAllCourseLoggerHandlers()
 
@@ -573,4 +1214,8 @@ if __name__ == '__main__':
         logger.error("abnormal ending: {}".format(exp))
         traceback.print_exc(exp)
     finally:
-        logger.info("Stopping kartograafr.  Duration: {} seconds".format(datetime.now()-kartStartTime))
\ No newline at end of file
+        # Drains run beside sync runs, so they keep away from the sync runs' timing reports and metrics.
+        if not isDrainRun():
+            reportPhaseTimes()
+            exportMetrics()
+            logger.info("Stopping kartograafr.  Duration: {} seconds".format(datetime.now()-kartStartTime))
\ No newline at end of file
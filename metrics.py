@@ -0,0 +1,248 @@
+# Counters and histograms of a run: HTTP requests by API endpoint, pages of
+# response collections, and ArcGIS operations.  At the end of a run they're
+# written as a Prometheus textfile, for node exporter's textfile collector,
+# and as a JSON summary.
+
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+METRIC_NAME_PREFIX = 'kartograafr_'
+
+# Bucket upper bounds.  Every histogram also has a "+Inf" bucket.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Seconds
+PAGE_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+TYPE_COUNTER = 'counter'
+TYPE_HISTOGRAM = 'histogram'
+
+# name: (type, help, bucket upper bounds of histograms)
+METRICS = OrderedDict([
+    ('http_requests_total',
+     (TYPE_COUNTER, 'HTTP requests sent, including retries, by endpoint, method and status or error', None)),
+    ('http_request_duration_seconds',
+     (TYPE_HISTOGRAM, 'Time from sending an HTTP request to receiving its response', LATENCY_BUCKETS)),
+    ('http_response_bytes_total', (TYPE_COUNTER, 'Bytes of HTTP response bodies received', None)),
+    ('http_request_errors_total', (TYPE_COUNTER, 'HTTP requests that failed without a response', None)),
+    ('http_request_retries_total', (TYPE_COUNTER, 'HTTP requests sent again after failing', None)),
+    ('response_collection_pages', (TYPE_HISTOGRAM, 'Pages in each collected response', PAGE_COUNT_BUCKETS)),
+    ('arcgis_operations_total', (TYPE_COUNTER, 'ArcGIS operations, by operation and result', None)),
+    ('arcgis_operation_duration_seconds',
+     (TYPE_HISTOGRAM, 'Time taken by each ArcGIS operation', LATENCY_BUCKETS)),
+    ('arcgis_operation_errors_total', (TYPE_COUNTER, 'ArcGIS operations that raised an exception', None)),
+])
+
+
+class _Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucketCounts = [0] * (len(buckets) + 1)  # Last one is "+Inf"
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for (index, upperBound) in enumerate(self.buckets):
+            if value <= upperBound:
+                break
+        else:
+            index = len(self.buckets)
+        self.bucketCounts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def getCumulativeCounts(self):
+        """
+        :return: Number of values at most each upper bound, last "+Inf"
+        :rtype: list of (str, int)
+        """
+        cumulativeCounts = []
+        total = 0
+        for (upperBound, bucketCount) in zip(list(self.buckets) + [math.inf], self.bucketCounts):
+            total += bucketCount
+            cumulativeCounts.append((_formatValue(upperBound), total))
+        return cumulativeCounts
+
+
+def _formatValue(value):
+    return '+Inf' if value == math.inf else repr(value)
+
+
+def _escapeLabelValue(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _formatLabels(labels, extraLabels=()):
+    labels = tuple(labels) + tuple(extraLabels)
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, _escapeLabelValue(value)) for (name, value) in labels) + '}'
+
+
+class MetricsRegistry(object):
+    """
+    The :class:`MetricsRegistry<metrics.MetricsRegistry>` object keeps the
+    counters and histograms listed in METRICS, separately for each set of
+    label values.  It may be used by several threads at the same time.
+    """
+
+    def __init__(self, metrics=METRICS, namePrefix=METRIC_NAME_PREFIX):
+        """
+        :param metrics: Type, help and buckets of each metric, keyed by name
+        :type metrics: dict
+        :param namePrefix: Prefix of the metrics' names when exported
+        :type namePrefix: str
+        """
+        self.metrics = metrics
+        self.namePrefix = namePrefix
+        self._values = dict((name, {}) for name in metrics)  # Value of each metric, keyed by its labels
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _labelsKey(labels):
+        return tuple(sorted(labels.items()))
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Add to a counter.
+
+        :param name: Name of the counter, without the prefix
+        :type name: str
+        :param amount: Amount added
+        :type amount: int or float
+        """
+        key = self._labelsKey(labels)
+        with self._lock:
+            counters = self._values[name]
+            counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """
+        Add a value to a histogram.
+
+        :param name: Name of the histogram, without the prefix
+        :type name: str
+        :param value: Value observed
+        :type value: int or float
+        """
+        key = self._labelsKey(labels)
+        with self._lock:
+            histograms = self._values[name]
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = _Histogram(self.metrics[name][2])
+            histogram.observe(value)
+
+    @contextmanager
+    def timeOperation(self, operation):
+        """
+        Count an ArcGIS operation and record how long it took.  An exception
+        raised by it is counted as an error, then raised again.
+
+        :param operation: Name of the operation, e.g. "group.add_users"
+        :type operation: str
+        """
+        start = time.perf_counter()
+        result = 'ok'
+        try:
+            yield
+        except Exception:
+            result = 'error'
+            self.increment('arcgis_operation_errors_total', operation=operation)
+            raise
+        finally:
+            self.observe('arcgis_operation_duration_seconds', time.perf_counter() - start, operation=operation)
+            self.increment('arcgis_operations_total', operation=operation, result=result)
+
+    def getSummary(self):
+        """
+        :return: Each metric that has values, keyed by its name.  Counters are
+            lists of their labels and value, histograms of their labels, count, sum
+            and cumulative bucket counts.
+        :rtype: dict
+        """
+        summary = OrderedDict()
+        with self._lock:
+            for (name, (metricType, _, _)) in self.metrics.items():
+                values = self._values[name]
+                if not values:
+                    continue
+
+                series = []
+                for (key, value) in sorted(values.items()):
+                    if metricType == TYPE_HISTOGRAM:
+                        series.append(OrderedDict([('labels', OrderedDict(key)), ('count', value.count),
+                                                   ('sum', value.sum),
+                                                   ('buckets', OrderedDict(value.getCumulativeCounts()))]))
+                    else:
+                        series.append(OrderedDict([('labels', OrderedDict(key)), ('value', value)]))
+                summary[self.namePrefix + name] = series
+        return summary
+
+    def getPrometheusText(self):
+        """
+        :return: The metrics in Prometheus' text exposition format
+        :rtype: str
+        """
+        lines = []
+        with self._lock:
+            for (name, (metricType, helpText, _)) in self.metrics.items():
+                values = self._values[name]
+                if not values:
+                    continue
+
+                fullName = self.namePrefix + name
+                lines.append('# HELP {} {}'.format(fullName, helpText))
+                lines.append('# TYPE {} {}'.format(fullName, metricType))
+                for (key, value) in sorted(values.items()):
+                    if metricType == TYPE_HISTOGRAM:
+                        for (upperBound, count) in value.getCumulativeCounts():
+                            lines.append('{}_bucket{} {}'.format(fullName, _formatLabels(key, [('le', upperBound)]),
+                                                                 count))
+                        lines.append('{}_sum{} {}'.format(fullName, _formatLabels(key), _formatValue(value.sum)))
+                        lines.append('{}_count{} {}'.format(fullName, _formatLabels(key), value.count))
+                    else:
+                        lines.append('{}{} {}'.format(fullName, _formatLabels(key), _formatValue(value)))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    @staticmethod
+    def _writeAtomically(path, content):
+        # node exporter may read the file at any time, so it's replaced whole.
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        (fileDescriptor, temporaryPath) = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fileDescriptor, 'w') as temporaryFile:
+                temporaryFile.write(content)
+            os.chmod(temporaryPath, 0o644)
+            os.replace(temporaryPath, path)
+        except Exception:
+            os.remove(temporaryPath)
+            raise
+
+    def writePrometheusTextfile(self, path):
+        """
+        :param path: Path of the textfile, which should end with ".prom"
+        :type path: str
+        """
+        self._writeAtomically(path, self.getPrometheusText())
+
+    def writeJSONSummary(self, path):
+        """
+        :param path: Path of the JSON file
+        :type path: str
+        """
+        self._writeAtomically(path, json.dumps(self.getSummary(), indent=2) + '\n')
+
+    def clear(self):
+        with self._lock:
+            for values in self._values.values():
+                values.clear()
+
+
+# Metrics of the current run, shared by everything that records them.
+registry = MetricsRegistry()
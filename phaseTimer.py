@@ -0,0 +1,192 @@
+# Wall and CPU time of each phase of a run, optionally with a cProfile profile
+# and the largest memory allocations of each phase.
+
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import util
+
+TOP_ALLOCATION_COUNT = 25  # Allocations listed for each phase when profiling
+
+
+class PhaseTimer(object):
+    """
+    The :class:`PhaseTimer<phaseTimer.PhaseTimer>` object times the phases of
+    a run.  startPhase() ends the current phase, if any, and starts the next,
+    so phases don't overlap.  A phase started more than once is timed in
+    total.
+
+    With a profile directory, each phase is also profiled with cProfile and
+    tracemalloc.  cProfile only sees the thread that enabled it, so while
+    profiling, util.mapConcurrently() workers are profiled separately and
+    their statistics added to the phase's.  Each phase's statistics are
+    written to a ".pstats" file, and its largest allocations to a text file.
+    """
+
+    def __init__(self, profileDirectory=None):
+        """
+        :param profileDirectory: (optional) Directory for profiles of the phases.  Without one,
+            phases are only timed.
+        :type profileDirectory: str
+        """
+        self.profileDirectory = profileDirectory
+        self.phaseTimes = OrderedDict()  # {'wallSeconds': float, 'cpuSeconds': float} of each phase
+        self.profileFiles = []
+        self.profiledPhaseCount = 0
+
+        self._phase = None
+        self._wallStart = None
+        self._cpuStart = None
+        self._profile = None
+        self._workerProfiles = []
+        self._workerProfilesLock = threading.Lock()
+        self._snapshot = None
+
+        if profileDirectory is not None:
+            os.makedirs(profileDirectory, exist_ok=True)
+            tracemalloc.start()
+
+    @property
+    def phase(self):
+        """
+        :return: Name of the current phase, or None
+        :rtype: str
+        """
+        return self._phase
+
+    def startPhase(self, phase):
+        """
+        :param phase: Name of the phase started
+        :type phase: str
+        """
+        self.stopPhase()
+
+        self._phase = phase
+        if self.profileDirectory is not None:
+            self._startProfiling()
+        self._wallStart = time.perf_counter()
+        self._cpuStart = time.process_time()
+
+    def stopPhase(self):
+        """
+        End the current phase, if any.
+        """
+        if self._phase is None:
+            return
+
+        wallSeconds = time.perf_counter() - self._wallStart
+        cpuSeconds = time.process_time() - self._cpuStart
+
+        phaseTimes = self.phaseTimes.setdefault(self._phase, OrderedDict([('wallSeconds', 0.0),
+                                                                          ('cpuSeconds', 0.0)]))
+        phaseTimes['wallSeconds'] += wallSeconds
+        phaseTimes['cpuSeconds'] += cpuSeconds
+
+        if self.profileDirectory is not None:
+            self._stopProfiling()
+
+        self._phase = None
+
+    def _profileWorkerCall(self, function, item):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return function(item)  # Another profiler is active in this thread
+
+        try:
+            return function(item)
+        finally:
+            profile.disable()
+            with self._workerProfilesLock:
+                self._workerProfiles.append(profile)
+
+    def _startProfiling(self):
+        self._workerProfiles = []
+        util.workerCallWrapper = self._profileWorkerCall
+        self._snapshot = tracemalloc.take_snapshot()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def _getProfilePath(self, suffix):
+        phaseFileName = re.sub(r'[^A-Za-z0-9]+', '-', self._phase).strip('-')
+        return os.path.join(self.profileDirectory,
+                            '{:02d}-{}{}'.format(self.profiledPhaseCount, phaseFileName, suffix))
+
+    def _stopProfiling(self):
+        self._profile.disable()
+        util.workerCallWrapper = None
+        snapshot = tracemalloc.take_snapshot()
+        self.profiledPhaseCount += 1
+
+        with self._workerProfilesLock:
+            workerProfiles = self._workerProfiles
+            self._workerProfiles = []
+
+        statsPath = self._getProfilePath('.pstats')
+        allocationsPath = self._getProfilePath('-allocations.txt')
+
+        try:
+            stats = pstats.Stats(self._profile)
+            for workerProfile in workerProfiles:
+                stats.add(workerProfile)
+        except TypeError:
+            stats = None  # Nothing was profiled
+        if stats is not None:
+            stats.dump_stats(statsPath)
+            self.profileFiles.append(statsPath)
+
+        filters = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib*'))
+        allocationDifferences = snapshot.filter_traces(filters).compare_to(self._snapshot.filter_traces(filters),
+                                                                            'lineno')
+        with open(allocationsPath, 'w') as allocationsFile:
+            allocationsFile.write('Largest memory allocation changes in phase "{}" (current: {}, peak: {} bytes)\n'
+                                  .format(self._phase, *tracemalloc.get_traced_memory()))
+            for allocationDifference in allocationDifferences[:TOP_ALLOCATION_COUNT]:
+                allocationsFile.write('{}\n'.format(allocationDifference))
+        self.profileFiles.append(allocationsPath)
+
+        self._profile = None
+        self._snapshot = None
+
+    def stop(self):
+        """
+        End the current phase, and stop tracing memory allocations if profiling.
+        """
+        self.stopPhase()
+        if self.profileDirectory is not None and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def getReport(self):
+        """
+        :return: Lines of a table of the phases' times
+        :rtype: list of str
+        """
+        lines = ['{:<24} {:>10} {:>10}'.format('Phase', 'Wall (s)', 'CPU (s)')]
+        for (phase, phaseTimes) in self.phaseTimes.items():
+            lines.append('{:<24} {:>10.3f} {:>10.3f}'.format(phase, phaseTimes['wallSeconds'],
+                                                            phaseTimes['cpuSeconds']))
+        lines.append('{:<24} {:>10.3f} {:>10.3f}'.format(
+            'total', sum(phaseTimes['wallSeconds'] for phaseTimes in self.phaseTimes.values()),
+            sum(phaseTimes['cpuSeconds'] for phaseTimes in self.phaseTimes.values())))
+        return lines
+
+    def writeReport(self, path):
+        """
+        Write the phases' times, and the profile files if any, as JSON.
+
+        :param path: Path of the report
+        :type path: str
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as reportFile:
+            json.dump(OrderedDict([('phases', self.phaseTimes), ('profileFiles', self.profileFiles)]),
+                      reportFile, indent=2)
+            reportFile.write('\n')
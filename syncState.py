@@ -0,0 +1,264 @@
+# State kept between runs: what was last done for each assignment's ArcGIS
+# group, and a history of the runs themselves.
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RUN_STATUS_RUNNING = 'running'
+RUN_STATUS_FINISHED = 'finished'
+RUN_STATUS_INTERRUPTED = 'interrupted'  # Was still running when a later run started
+
+# Each migration brings the schema up to the version after its index.  Never
+# change a migration that has been released, add another one instead.
+_SCHEMA_MIGRATIONS = [
+    '''
+    CREATE TABLE assignment_groups (
+        course_id INTEGER NOT NULL,
+        assignment_id INTEGER NOT NULL,
+        group_id TEXT NOT NULL,
+        group_title TEXT NOT NULL,
+        group_modified INTEGER,
+        members TEXT,
+        synced_at REAL NOT NULL,
+        outcome TEXT NOT NULL,
+        PRIMARY KEY (course_id, assignment_id)
+    );
+    CREATE TABLE runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        started_at REAL NOT NULL,
+        finished_at REAL,
+        status TEXT NOT NULL,
+        full_resync INTEGER NOT NULL,
+        outcome_counts TEXT
+    );
+    ''',
+    '''
+    ALTER TABLE assignment_groups ADD COLUMN users_not_added TEXT;
+    ''',
+]
+
+SCHEMA_VERSION = len(_SCHEMA_MIGRATIONS)
+
+
+class AssignmentGroupState(object):
+    """
+    What was last done for an assignment's ArcGIS group.  members is the set of
+    Canvas login IDs in the group after its last update, or None if they aren't
+    known because the update failed.  usersNotAdded is the set of the course's
+    login IDs that ArcGIS wouldn't add to the group, usually because they don't
+    have ArcGIS accounts.
+    """
+    __slots__ = ('courseID', 'assignmentID', 'groupID', 'groupTitle', 'groupModified', 'members', 'syncedAt',
+                 'outcome', 'usersNotAdded')
+
+    def __init__(self, courseID, assignmentID, groupID, groupTitle, groupModified, members, syncedAt, outcome,
+                 usersNotAdded=frozenset()):
+        self.courseID = courseID
+        self.assignmentID = assignmentID
+        self.groupID = groupID
+        self.groupTitle = groupTitle
+        self.groupModified = groupModified
+        self.members = members
+        self.syncedAt = syncedAt
+        self.outcome = outcome
+        self.usersNotAdded = usersNotAdded
+
+    def describesGroup(self, groupID, groupModified):
+        """
+        Whether the state still describes the group: it's the same group, and it
+        wasn't modified after the state was recorded.  The update that recorded
+        the state may itself have modified the group, so a group modified before
+        then is also described.
+
+        :param groupID: ArcGIS group ID
+        :type groupID: str
+        :param groupModified: The group's "modified" time, in milliseconds
+        :type groupModified: int or None
+        :rtype: bool
+        """
+        if self.groupID != str(groupID):
+            return False
+        if groupModified == self.groupModified:
+            return True
+        return groupModified is not None and groupModified <= self.syncedAt * 1000
+
+    def __repr__(self):
+        return '{}(courseID={!r}, assignmentID={!r}, groupID={!r}, outcome={!r})'.format(
+            self.__class__.__name__, self.courseID, self.assignmentID, self.groupID, self.outcome)
+
+
+class SyncState(object):
+    """
+    The :class:`SyncState<syncState.SyncState>` object keeps the state in a
+    SQLite database.  The schema version is kept in the database's
+    "user_version" and the schema is migrated when the database is opened.
+    Every change is made in a single transaction, so a run that stops part way
+    through leaves the state of each assignment either as it was or completely
+    updated.
+    """
+
+    def __init__(self, databasePath):
+        """
+        :param databasePath: Path of the SQLite database file.  Created if needed.
+        :type databasePath: str
+        """
+        databaseDirectory = os.path.dirname(databasePath)
+        if databaseDirectory:
+            os.makedirs(databaseDirectory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Transactions are started explicitly, see _transaction().
+        self._connection = sqlite3.connect(databasePath, timeout=30, check_same_thread=False,
+                                           isolation_level=None)
+        self._migrate()
+
+    def _transaction(self, statements):
+        """
+        Run statements in a single transaction, which is rolled back if any of them fail.
+
+        :param statements: Pairs of SQL statement and parameters
+        :type statements: list of (str, tuple)
+        :return: Cursor of the last statement
+        :rtype: sqlite3.Cursor
+        """
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = None
+                for (statement, parameters) in statements:
+                    cursor = self._connection.execute(statement, parameters)
+                self._connection.execute('COMMIT')
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+        return cursor
+
+    def _query(self, statement, parameters=()):
+        with self._lock:
+            return self._connection.execute(statement, parameters).fetchall()
+
+    def _migrate(self):
+        version = self._query('PRAGMA user_version')[0][0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError('Sync state database schema version {} is newer than this version of '
+                               'kartograafr supports ({})'.format(version, SCHEMA_VERSION))
+
+        for (version, migration) in enumerate(_SCHEMA_MIGRATIONS[version:], start=version + 1):
+            logger.info('Migrating sync state database to schema version {}'.format(version))
+            statements = [(statement, ()) for statement in migration.split(';') if statement.strip()]
+            # PRAGMA doesn't accept parameters.  The version is always an int.
+            statements.append(('PRAGMA user_version = {:d}'.format(version), ()))
+            self._transaction(statements)
+
+    def getAssignmentState(self, courseID, assignmentID):
+        """
+        :param courseID: Canvas course ID
+        :type courseID: int
+        :param assignmentID: Canvas assignment ID
+        :type assignmentID: int
+        :return: State of the assignment's group, or None if there isn't any
+        :rtype: AssignmentGroupState or None
+        """
+        rows = self._query('SELECT group_id, group_title, group_modified, members, synced_at, outcome, '
+                           'users_not_added FROM assignment_groups WHERE course_id = ? AND assignment_id = ?',
+                           (courseID, assignmentID))
+        if not rows:
+            return None
+
+        (groupID, groupTitle, groupModified, members, syncedAt, outcome, usersNotAdded) = rows[0]
+        members = set(json.loads(members)) if members is not None else None
+        usersNotAdded = set(json.loads(usersNotAdded or '[]'))
+        return AssignmentGroupState(courseID, assignmentID, groupID, groupTitle, groupModified, members, syncedAt,
+                                    outcome, usersNotAdded)
+
+    def putAssignmentState(self, courseID, assignmentID, groupID, groupTitle, groupModified, members, outcome,
+                           usersNotAdded=()):
+        """
+        Record what was done for an assignment's group.
+
+        :param members: Canvas login IDs in the group after the update, or None if they aren't known
+        :type members: iterable of str or None
+        :param outcome: What was done, e.g. "synced", "skipped", "notAddable", or "failed"
+        :type outcome: str
+        :param usersNotAdded: Canvas login IDs that ArcGIS wouldn't add to the group
+        :type usersNotAdded: iterable of str
+        """
+        members = json.dumps(sorted(members)) if members is not None else None
+        usersNotAdded = json.dumps(sorted(usersNotAdded)) if usersNotAdded else None
+        self._transaction([('INSERT OR REPLACE INTO assignment_groups (course_id, assignment_id, group_id, '
+                            'group_title, group_modified, members, synced_at, outcome, users_not_added) '
+                            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            (courseID, assignmentID, str(groupID), groupTitle, groupModified, members,
+                             time.time(), outcome, usersNotAdded))])
+
+    def removeOtherAssignments(self, courseIDs, assignmentIDs):
+        """
+        Remove the state of assignments in the courses, except the ones listed,
+        e.g. assignments that have expired or no longer use the outcome.
+
+        :param courseIDs: IDs of the courses whose assignments were all checked
+        :type courseIDs: iterable of int
+        :param assignmentIDs: IDs of the assignments to be kept
+        :type assignmentIDs: iterable of int
+        :return: Number of assignments removed
+        :rtype: int
+        """
+        courseIDs = list(courseIDs)
+        assignmentIDs = set(assignmentIDs)
+        if not courseIDs:
+            return 0
+
+        rows = self._query('SELECT course_id, assignment_id FROM assignment_groups WHERE course_id IN ({})'
+                           .format(', '.join('?' * len(courseIDs))), courseIDs)
+        obsoleteRows = [row for row in rows if row[1] not in assignmentIDs]
+        if obsoleteRows:
+            self._transaction([('DELETE FROM assignment_groups WHERE course_id = ? AND assignment_id = ?', row)
+                               for row in obsoleteRows])
+        return len(obsoleteRows)
+
+    def startRun(self, fullResync=False):
+        """
+        Record the start of a run.  Runs that never finished are marked as interrupted.
+
+        :return: ID of the new run
+        :rtype: int
+        """
+        cursor = self._transaction([
+            ('UPDATE runs SET status = ? WHERE status = ?', (RUN_STATUS_INTERRUPTED, RUN_STATUS_RUNNING)),
+            ('INSERT INTO runs (started_at, status, full_resync) VALUES (?, ?, ?)',
+             (time.time(), RUN_STATUS_RUNNING, int(fullResync))),
+        ])
+        return cursor.lastrowid
+
+    def finishRun(self, runID, outcomeCounts=None):
+        """
+        :param runID: ID returned by startRun()
+        :type runID: int
+        :param outcomeCounts: Number of assignments with each outcome
+        :type outcomeCounts: dict
+        """
+        self._transaction([('UPDATE runs SET finished_at = ?, status = ?, outcome_counts = ? WHERE run_id = ?',
+                            (time.time(), RUN_STATUS_FINISHED, json.dumps(dict(outcomeCounts or {})), runID))])
+
+    def getRecentRuns(self, limit=10):
+        """
+        :param limit: Maximum number of runs
+        :type limit: int
+        :return: The most recent runs, newest first
+        :rtype: list of dict
+        """
+        rows = self._query('SELECT run_id, started_at, finished_at, status, full_resync, outcome_counts '
+                           'FROM runs ORDER BY run_id DESC LIMIT ?', (limit,))
+        return [{'runID': runID, 'startedAt': startedAt, 'finishedAt': finishedAt, 'status': status,
+                 'fullResync': bool(fullResync), 'outcomeCounts': json.loads(outcomeCounts or '{}')}
+                for (runID, startedAt, finishedAt, status, fullResync, outcomeCounts) in rows]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
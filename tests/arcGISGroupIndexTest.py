@@ -0,0 +1,62 @@
+import unittest
+
+import arcgisUM
+
+
+class FakeGroup(object):
+    def __init__(self, title, tags=('kartograafr', 'umich')):
+        self.title = title
+        self.tags = list(tags)
+
+
+class FakeGroupManager(object):
+    def __init__(self, groups):
+        self.groups = groups
+        self.queries = []
+
+    def search(self, query, max_groups=1000):
+        self.queries.append(query)
+        if query.startswith('tags:'):
+            return [group for group in self.groups][:max_groups]
+        title = query[len('title:'):]
+        return [group for group in self.groups if group.title == title]
+
+
+class FakeGIS(object):
+    def __init__(self, groups):
+        self.groups = FakeGroupManager(groups)
+
+
+class ArcGISGroupIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.groups = [FakeGroup('Geo 101_1234_Map_Lab_55'),
+                       FakeGroup('Geo 202_2345_Atlas_66'),
+                       FakeGroup('Other_3456_Thing_77', tags=('kartograafr-old',))]
+        self.arcGIS = FakeGIS(self.groups)
+        self.groupIndex = arcgisUM.ArcGISGroupIndex(self.arcGIS, maxGroups=100)
+
+    def test_lookup_from_index(self):
+        group = self.groupIndex.getGroupByTitle('Geo 101_1234_Map_Lab_55')
+        self.assertIs(group, self.groups[0])
+        self.assertEqual(self.arcGIS.groups.queries, ['tags:kartograafr'])
+        self.assertEqual(self.groupIndex.getStats(), {'groups': 2, 'hits': 1, 'misses': 0})
+
+    def test_miss_falls_back_to_search(self):
+        group = self.groupIndex.getGroupByTitle('Other_3456_Thing_77')
+        self.assertIs(group, self.groups[2])
+        self.assertEqual(self.arcGIS.groups.queries[-1], 'title:Other_3456_Thing_77')
+
+        self.groupIndex.getGroupByTitle('Other_3456_Thing_77')
+        self.assertEqual(len(self.arcGIS.groups.queries), 2)
+
+    def test_lookup_by_assignment(self):
+        self.assertIs(self.groupIndex.getGroupForAssignment(2345, 66), self.groups[1])
+        self.assertIsNone(self.groupIndex.getGroupForAssignment(1234, 66))
+
+        newGroup = FakeGroup('Geo 101_1234_Map_88')
+        self.groupIndex.add(newGroup)
+        self.assertIs(self.groupIndex.getGroupForAssignment(1234, 88), newGroup)
+
+
+if __name__ == '__main__':
+    unittest.main()
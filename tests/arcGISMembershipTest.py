@@ -0,0 +1,87 @@
+import threading
+import unittest
+from unittest import mock
+
+import arcgisUM
+
+
+class FakeGroup(object):
+    def __init__(self, unknownUsers=(), failingUser=None):
+        self.id = 'abc123'
+        self.title = 'Geo 101_1234_Map_Lab_55'
+        self.unknownUsers = set(unknownUsers)
+        self.failingUser = failingUser
+        self.addRequests = []
+        self.removeRequests = []
+        self._lock = threading.Lock()
+
+    def add_users(self, usernames):
+        with self._lock:
+            self.addRequests.append(list(usernames))
+        return {'notAdded': [username for username in usernames if username in self.unknownUsers]}
+
+    def removeUsersFromGroup(self, usernames):
+        usernames = usernames.split(',')
+        with self._lock:
+            self.removeRequests.append(usernames)
+        if self.failingUser in usernames:
+            raise RuntimeError('Unable to remove users')
+        return {'notRemoved': [username for username in usernames if username in self.unknownUsers]}
+
+
+class ArcGISMembershipTestCase(unittest.TestCase):
+    def setUp(self):
+        self.users = ['user{}'.format(number) for number in range(7)]
+
+    def test_add_in_chunks_merges_not_added(self):
+        group = FakeGroup(unknownUsers=arcgisUM.formatUsersNamesForArcGIS(['user1', 'user6']))
+        results = arcgisUM.changeMembersInChunks(group.add_users, arcgisUM.formatUsersNamesForArcGIS(self.users),
+                                                 'notAdded', chunkSize=3, workerCount=3)
+
+        self.assertEqual(sorted(len(chunk) for chunk in group.addRequests), [1, 3, 3])
+        self.assertEqual(results, {'notAdded': arcgisUM.formatUsersNamesForArcGIS(['user1', 'user6'])})
+
+    def test_remove_failure_after_all_chunks(self):
+        group = FakeGroup(unknownUsers=['user5'], failingUser='user0')
+        with self.assertRaises(RuntimeError):
+            arcgisUM.changeMembersInChunks(lambda chunk: group.removeUsersFromGroup(','.join(chunk)), self.users,
+                                           'notRemoved', chunkSize=2, workerCount=1)
+        self.assertEqual(len(group.removeRequests), 4)
+
+    def test_calls_limited_across_workers(self):
+        inFlight = []
+        mostInFlight = []
+        lock = threading.Lock()
+
+        def addUsers(chunk):
+            with lock:
+                inFlight.append(chunk)
+                mostInFlight.append(len(inFlight))
+            threading.Event().wait(0.01)
+            with lock:
+                inFlight.remove(chunk)
+            return {'notAdded': []}
+
+        def addAllUsers(groupNumber):
+            return arcgisUM.changeMembersInChunks(lambda chunk: arcgisUM.callArcGIS('group.add_users', addUsers, chunk),
+                                                  self.users, 'notAdded', chunkSize=1, workerCount=4)
+
+        with mock.patch.object(arcgisUM, 'callSemaphore', threading.BoundedSemaphore(3)):
+            for (_, _, exception) in arcgisUM.util.mapConcurrently(addAllUsers, range(4), 4):
+                self.assertIsNone(exception)
+
+        self.assertEqual(len(mostInFlight), 4 * len(self.users))
+        self.assertEqual(max(mostInFlight), 3)
+
+    def test_instructor_log_lists_users_not_added(self):
+        group = FakeGroup(unknownUsers=arcgisUM.formatUsersNamesForArcGIS(['user2']))
+        with mock.patch.object(arcgisUM.config.ArcGIS, 'MEMBERSHIP_CHUNK_SIZE', 2):
+            (instructorLog, results) = arcgisUM.addCanvasUsersToGroup('', group, self.users)
+
+        self.assertEqual(len(group.addRequests), 4)
+        self.assertIn('Number of users added to group: [6]', instructorLog)
+        self.assertIn('* ' + arcgisUM.formatUsersNamesForArcGIS(['user2'])[0], instructorLog)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import mock
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import main
+from CanvasAPI import CanvasAPI, CanvasObjectCache
+from CanvasAPI.AsyncCanvasAPI import AsyncCanvasAPI
+from RequestsPlus import HTTPCache, RateLimitGovernor, RetryPolicy
+from metrics import MetricsRegistry
+
+COURSE_ID = 1234
+MISSING_COURSE_ID = 5678
+OUTCOME_ID = 2501
+ASSIGNMENT_PAGE_COUNT = 3
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+# Answer requests like Canvas, recording their paths and query parameters.  Assignments come in numbered pages,
+# outcome group links in pages with bookmarks, and the outcome is unavailable the first time it's requested.
+class CanvasHandler(BaseHTTPRequestHandler):
+    requests = []
+    outcomeRequestCount = 0
+
+    users = [
+        {'id': 21, 'name': 'Teacher', 'login_id': 'teach', 'sis_login_id': 'teach',
+         'enrollments': [{'type': 'TeacherEnrollment'}]},
+        {'id': 23, 'name': 'Student', 'login_id': 'stud', 'sis_login_id': 'stud',
+         'enrollments': [{'type': 'StudentEnrollment'}]},
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    def sendJSON(self, value, status=200, headers=()):
+        body = json.dumps(value).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for (name, headerValue) in headers:
+            self.send_header(name, headerValue)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def sendEmpty(self, status, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        for (name, headerValue) in headers:
+            self.send_header(name, headerValue)
+        self.end_headers()
+
+    def pageLink(self, path, relation, **params):
+        return '<http://{}{}?{}>; rel="{}"'.format(self.headers['Host'], path, urlencode(params), relation)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        self.requests.append((url.path, query))
+        coursePath = '/api/v1/courses/{}'.format(COURSE_ID)
+
+        if url.path == '/api/v1/outcomes/{}'.format(OUTCOME_ID):
+            CanvasHandler.outcomeRequestCount += 1
+            if CanvasHandler.outcomeRequestCount == 1:
+                self.sendEmpty(503, [('Retry-After', '0')])
+            else:
+                self.sendJSON({'id': OUTCOME_ID, 'title': 'ArcGIS Mapping Skills'})
+        elif url.path == coursePath:
+            etag = '"course-{}"'.format(COURSE_ID)
+            if self.headers['If-None-Match'] == etag:
+                self.sendEmpty(304, [('ETag', etag)])
+            else:
+                self.sendJSON({'id': COURSE_ID, 'name': 'Geography 101'}, headers=[('ETag', etag)])
+        elif url.path == coursePath + '/assignments':
+            page = int(query.get('page', ['1'])[0])
+            rubric = [{'outcome_id': OUTCOME_ID}] if page == ASSIGNMENT_PAGE_COUNT else None
+            links = [self.pageLink(url.path, 'last', page=ASSIGNMENT_PAGE_COUNT, per_page=1)]
+            if page < ASSIGNMENT_PAGE_COUNT:
+                links.append(self.pageLink(url.path, 'next', page=page + 1, per_page=1))
+            self.sendJSON([{'id': page, 'name': 'Map {}'.format(page), 'course_id': COURSE_ID,
+                            'due_at': None, 'lock_at': None, 'rubric': rubric}],
+                          headers=[('Link', ','.join(links))])
+        elif url.path == coursePath + '/outcome_group_links':
+            if 'page' not in query:
+                self.sendJSON([{'outcome': {'id': 1}}],
+                              headers=[('Link', self.pageLink(url.path, 'next', page='bookmark:WzJd'))])
+            else:
+                self.sendJSON([{'outcome': {'id': OUTCOME_ID}}])
+        elif url.path == coursePath + '/users':
+            self.sendJSON(self.users)
+        else:
+            self.sendEmpty(404)
+
+
+class AsyncCanvasTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), CanvasHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.baseURL = 'http://127.0.0.1:{}/api/v1/'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        CanvasHandler.requests = []
+        CanvasHandler.outcomeRequestCount = 0
+        self.directory = tempfile.mkdtemp()
+        self.metricsRegistry = MetricsRegistry()
+        self.canvas = CanvasAPI(self.baseURL,
+                                httpCache=HTTPCache(os.path.join(self.directory, 'http')),
+                                objectCache=CanvasObjectCache(os.path.join(self.directory, 'objects.sqlite'),
+                                                              {'COURSES': 0, 'OUTCOMES': 3600}),
+                                rateLimitGovernor=RateLimitGovernor(maxInFlight=2),
+                                retryPolicy=RetryPolicy(baseDelay=0),
+                                metricsRegistry=self.metricsRegistry)
+        self.loop = asyncio.new_event_loop()
+        patch = mock.patch.object(main, 'logger', logging.getLogger(__name__))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.directory)
+
+    def runAsync(self, coroutineFunction):
+        asyncCanvas = main.getAsyncCanvasInstance(self.canvas)
+        try:
+            return self.loop.run_until_complete(coroutineFunction(asyncCanvas))
+        finally:
+            self.loop.run_until_complete(asyncCanvas.close())
+
+    def test_components_shared(self):
+        asyncCanvas = main.getAsyncCanvasInstance(self.canvas)
+
+        self.assertIsInstance(asyncCanvas, AsyncCanvasAPI)
+        for name in ('httpCache', 'objectCache', 'rateLimitGovernor', 'retryPolicy', 'metricsRegistry'):
+            self.assertIs(getattr(asyncCanvas, name), getattr(self.canvas, name))
+
+    def test_numbered_pages_requested_together(self):
+        assignments = self.runAsync(lambda canvas: canvas.getCoursesAssignmentsObjects(COURSE_ID))
+
+        self.assertEqual([assignment.id for assignment in assignments], [1, 2, 3])
+        self.assertEqual(sorted(query.get('page', ['1'])[0] for (_, query) in CanvasHandler.requests),
+                         ['1', '2', '3'])
+
+    def test_bookmarked_pages_followed(self):
+        links = self.runAsync(lambda canvas: canvas.getCoursesOutcomeGroupLinksObjects(COURSE_ID))
+
+        self.assertEqual([link.outcome.id for link in links], [1, OUTCOME_ID])
+        self.assertEqual([query.get('page') for (_, query) in CanvasHandler.requests], [None, ['bookmark:WzJd']])
+
+    def test_unavailable_response_retried_and_recorded(self):
+        outcome = self.runAsync(lambda canvas: canvas.getOutcomeObject(OUTCOME_ID))
+
+        self.assertEqual(outcome.title, 'ArcGIS Mapping Skills')
+        self.assertEqual(CanvasHandler.outcomeRequestCount, 2)
+
+        lines = self.metricsRegistry.getPrometheusText().splitlines()
+        for status in ('503', '200'):
+            self.assertIn('kartograafr_http_requests_total{{endpoint="/outcomes/{{outcomeID}}",method="GET",'
+                          'status="{}"}} 1'.format(status), lines)
+        self.assertIn('kartograafr_http_request_retries_total{endpoint="/outcomes/{outcomeID}",method="GET"} 1',
+                      lines)
+        self.assertEqual([stats['requests'] for stats in self.canvas.rateLimitGovernor.getStats()['phases'].values()],
+                         [2])
+
+    def test_objects_cached(self):
+        self.runAsync(lambda canvas: canvas.getOutcomeObject(OUTCOME_ID))
+        outcome = self.runAsync(lambda canvas: canvas.getOutcomeObject(OUTCOME_ID))
+
+        self.assertEqual(outcome.title, 'ArcGIS Mapping Skills')
+        self.assertEqual(CanvasHandler.outcomeRequestCount, 2)
+        # Objects cached by either client are used by the other.
+        self.assertEqual(self.canvas.getOutcomeObject(OUTCOME_ID).title, 'ArcGIS Mapping Skills')
+        self.assertEqual(self.canvas.objectCache.getStats(), {'hits': 2, 'misses': 1})
+
+    def test_responses_revalidated_with_http_cache(self):
+        course = self.canvas.getCourseObject(COURSE_ID)
+        asyncCourse = self.runAsync(lambda canvas: canvas.getCourseObject(COURSE_ID))
+
+        self.assertEqual((asyncCourse.id, asyncCourse.name), (course.id, course.name))
+        self.assertEqual(self.canvas.httpCache.getStats()['hits'], 1)
+
+    def test_error_response_raised(self):
+        with self.assertRaises(RuntimeError):
+            self.runAsync(lambda canvas: canvas.getCourseObject(MISSING_COURSE_ID))
+
+    def test_driver_gets_course_data(self):
+        outcome = Namespace(id=OUTCOME_ID)
+        (assignments, courses, coursesUsers, coursesInstructors) = main.runAsyncCanvasDriver(
+            self.canvas, [COURSE_ID, MISSING_COURSE_ID], outcome)
+
+        self.assertEqual([(assignment.course_id, assignment.id) for assignment in assignments], [(COURSE_ID, 3)])
+        self.assertEqual(courses[COURSE_ID].name, 'Geography 101')
+        self.assertEqual([user.login_id for user in coursesUsers[COURSE_ID]], ['teach', 'stud'])
+        self.assertEqual([user.login_id for user in coursesInstructors[COURSE_ID]], ['teach'])
+        self.assertEqual(list(courses), [COURSE_ID])
+        self.assertGreater(self.metricsRegistry.getSummary()['kartograafr_http_requests_total'][0]['value'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from CanvasAPI import CanvasAPI
+
+COURSE_ID = 1234
+ASSIGNMENT_COUNT = 3
+ENROLLMENT_COUNT = 5
+PAGE_SIZE = 2
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def getPage(nodes, cursor, pageSize):
+    start = int(cursor) if cursor else 0
+    end = start + pageSize
+    return {'nodes': nodes[start:end],
+            'pageInfo': {'hasNextPage': end < len(nodes), 'endCursor': str(end)}}
+
+
+# Answer the course data query like Canvas' GraphQL API, honoring its @include variables.
+class GraphQLHandler(BaseHTTPRequestHandler):
+    requests = []
+    enrollmentsPageInfo = {}  # Replaces items of the enrollments' page info
+
+    assignments = [
+        {'_id': '11', 'name': 'Map Lab', 'dueAt': None, 'lockAt': None,
+         'rubric': {'criteria': [{'_id': '_1', 'outcome': None}, {'_id': '_2', 'outcome': {'_id': '2501'}}]}},
+        {'_id': '12', 'name': 'Essay', 'dueAt': '2020-01-01T00:00:00Z', 'lockAt': None, 'rubric': None},
+        {'_id': '13', 'name': 'Atlas', 'dueAt': None, 'lockAt': None, 'rubric': {'criteria': []}},
+    ]
+    enrollments = [
+        {'type': 'TeacherEnrollment', 'state': 'active',
+         'user': {'_id': '21', 'name': 'Teacher', 'sortableName': 'Teacher', 'loginId': 'teach',
+                  'email': 'teach@umich.edu'}},
+        {'type': 'StudentEnrollment', 'state': 'active',
+         'user': {'_id': '22', 'name': 'Student', 'sortableName': 'Student', 'loginId': 'stud',
+                  'email': 'stud@umich.edu'}},
+        {'type': 'StudentEnrollment', 'state': 'completed',
+         'user': {'_id': '23', 'name': 'Former', 'sortableName': 'Former', 'loginId': 'former',
+                  'email': None}},
+        {'type': 'TaEnrollment', 'state': 'invited',
+         'user': {'_id': '22', 'name': 'Student', 'sortableName': 'Student', 'loginId': 'stud',
+                  'email': 'stud@umich.edu'}},
+        {'type': 'StudentEnrollment', 'state': 'active',
+         'user': {'_id': '24', 'name': 'Another', 'sortableName': 'Another', 'loginId': 'another',
+                  'email': None}},
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        variables = body['variables']
+        self.requests.append((self.path, variables))
+
+        course = None
+        if variables['courseID'] == str(COURSE_ID):
+            course = {'_id': variables['courseID']}
+            if variables['withCourse']:
+                course.update({'name': 'Geo 101', 'courseCode': 'GEO-101'})
+            if variables['withAssignments']:
+                course['assignmentsConnection'] = getPage(self.assignments, variables['assignmentsCursor'],
+                                                          variables['pageSize'])
+            if variables['withEnrollments']:
+                course['enrollmentsConnection'] = getPage(self.enrollments, variables['enrollmentsCursor'],
+                                                          variables['pageSize'])
+                course['enrollmentsConnection']['pageInfo'].update(self.enrollmentsPageInfo)
+
+        result = json.dumps({'data': {'course': course}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(result)))
+        self.end_headers()
+        self.wfile.write(result)
+
+
+class CanvasGraphQLTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), GraphQLHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.baseURL = 'http://127.0.0.1:{}/api/v1/'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        GraphQLHandler.requests = []
+        GraphQLHandler.enrollmentsPageInfo = {}
+        self.canvas = CanvasAPI(self.baseURL, perPage=PAGE_SIZE)
+
+    def test_course_data_pages(self):
+        (course, assignments, users) = self.canvas.getCourseDataObjects(COURSE_ID, courseFields=('id', 'name'))
+
+        self.assertEqual((course.id, course.name), (COURSE_ID, 'Geo 101'))
+        self.assertEqual([assignment.id for assignment in assignments], [11, 12, 13])
+        self.assertEqual(assignments[0].course_id, COURSE_ID)
+        self.assertEqual([criterion.outcome_id for criterion in assignments[0].rubric], [None, 2501])
+        self.assertIsNone(assignments[1].rubric)
+        self.assertEqual([user.login_id for user in users], ['teach', 'stud', 'another'])
+        # GraphQL has no SIS login ID, so the login ID stands in for it.
+        self.assertEqual([user.sis_login_id for user in users], ['teach', 'stud', 'another'])
+        self.assertEqual([enrollment.type for enrollment in users[1].enrollments],
+                         ['StudentEnrollment', 'TaEnrollment'])
+        self.assertEqual([user.login_id for user in CanvasAPI.getInstructors(users)], ['teach'])
+
+        # 3 pages of enrollments, of which the later 2 include the last page of assignments, then none.
+        self.assertEqual([path for (path, _) in GraphQLHandler.requests], ['/api/graphql'] * 3)
+        self.assertEqual([(variables['withCourse'], variables['withAssignments'], variables['withEnrollments'])
+                          for (_, variables) in GraphQLHandler.requests],
+                         [(True, True, True), (False, True, True), (False, False, True)])
+
+    def test_missing_course(self):
+        self.assertIsNone(self.canvas.getCourseDataObjects(COURSE_ID + 1))
+        self.assertEqual(len(GraphQLHandler.requests), 1)
+
+    def test_next_page_without_new_cursor(self):
+        for endCursor in (None, '2'):
+            GraphQLHandler.requests = []
+            GraphQLHandler.enrollmentsPageInfo = {'endCursor': endCursor}
+            with self.assertRaises(RuntimeError):
+                self.canvas.getCourseDataObjects(COURSE_ID)
+            self.assertLessEqual(len(GraphQLHandler.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
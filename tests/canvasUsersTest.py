@@ -0,0 +1,125 @@
+import json
+import logging
+import threading
+import unittest
+from argparse import Namespace
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import main
+from CanvasAPI import CanvasAPI
+
+COURSE_ID = 1234
+MISSING_COURSE_ID = 5678
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+# Answer requests for a course's users like Canvas, recording their query parameters.
+class UsersHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    users = [
+        {'id': 21, 'name': 'Teacher', 'login_id': 'teach', 'sis_login_id': 'teach', 'email': 'teach@umich.edu',
+         'avatar_url': 'https://umich.edu/teach.png',
+         'enrollments': [{'type': 'StudentEnrollment'}, {'type': 'TeacherEnrollment'}]},
+        {'id': 22, 'name': 'Assistant', 'login_id': 'assist', 'sis_login_id': 'assist', 'email': None,
+         'enrollments': [{'type': 'TaEnrollment'}]},
+        {'id': 23, 'name': 'Student', 'login_id': 'stud', 'sis_login_id': 'stud', 'email': 'stud@umich.edu',
+         'enrollments': [{'type': 'StudentEnrollment'}]},
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.requests.append((url.path, parse_qs(url.query)))
+
+        if url.path != '/api/v1/courses/{}/users'.format(COURSE_ID):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = json.dumps(self.users).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CanvasUsersTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), UsersHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.baseURL = 'http://127.0.0.1:{}/api/v1/'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        UsersHandler.requests = []
+        self.canvas = CanvasAPI(self.baseURL)
+
+    def test_enrollments_added_to_include(self):
+        self.canvas.getCoursesUsersAndInstructorsObjects(COURSE_ID, **{'include[]': 'email'})
+        self.canvas.getCoursesUsersAndInstructorsObjects(COURSE_ID, **{'include[]': ['enrollments', 'avatar_url']})
+        self.canvas.getCoursesUsersAndInstructorsObjects(COURSE_ID)
+
+        self.assertEqual([query['include[]'] for (_, query) in UsersHandler.requests],
+                         [['email', 'enrollments'], ['enrollments', 'avatar_url'], ['enrollments']])
+
+    def test_enrollments_kept_with_fields(self):
+        (users, instructors) = self.canvas.getCoursesUsersAndInstructorsObjects(COURSE_ID,
+                                                                                fields=('id', 'login_id'))
+
+        self.assertEqual(users[0].FIELDS, ('id', 'login_id', 'enrollments'))
+        self.assertIsNone(users[0].email)
+        self.assertEqual([user.login_id for user in instructors], ['teach'])
+
+        (users, _) = self.canvas.getCoursesUsersAndInstructorsObjects(COURSE_ID, fields=['enrollments', 'id'])
+        self.assertEqual(users[0].FIELDS, ('enrollments', 'id'))
+
+    def test_instructors_have_teacher_enrollments(self):
+        (users, instructors) = self.canvas.getCoursesUsersAndInstructorsObjects(COURSE_ID)
+
+        self.assertEqual([user.login_id for user in users], ['teach', 'assist', 'stud'])
+        self.assertEqual([user.login_id for user in instructors], ['teach'])
+        self.assertEqual(len(UsersHandler.requests), 1)
+
+        usersWithoutEnrollments = [Namespace(login_id='noenrollments', enrollments=None),
+                                   Namespace(login_id='teach', enrollments=[Namespace(type='TeacherEnrollment')])]
+        self.assertEqual([user.login_id for user in CanvasAPI.getInstructors(usersWithoutEnrollments)], ['teach'])
+
+    def test_missing_course(self):
+        with self.assertRaises(RuntimeError):
+            self.canvas.getCoursesUsersAndInstructorsObjects(MISSING_COURSE_ID)
+
+    def test_courses_users_by_id_split_instructors(self):
+        with mock.patch.object(main, 'logger', logging.getLogger(__name__)):
+            (coursesUsers, coursesInstructors) = main.getCoursesUsersByID(
+                self.canvas, [COURSE_ID, MISSING_COURSE_ID], splitInstructors=True)
+
+        self.assertEqual([user.login_id for user in coursesUsers[COURSE_ID]], ['teach', 'assist', 'stud'])
+        self.assertEqual(coursesUsers[COURSE_ID][0].FIELDS, main.USER_FIELDS)
+        self.assertEqual([user.login_id for user in coursesInstructors[COURSE_ID]], ['teach'])
+        # Courses whose users couldn't be got are left out.
+        self.assertEqual((list(coursesUsers), list(coursesInstructors)), ([COURSE_ID], [COURSE_ID]))
+
+        # Each course's users are requested once, with their email addresses and enrollments.
+        self.assertEqual(sorted((path, query['include[]']) for (path, query) in UsersHandler.requests),
+                         [('/api/v1/courses/{}/users'.format(courseID), ['email', 'enrollments'])
+                          for courseID in (COURSE_ID, MISSING_COURSE_ID)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from courseLogBuffer import CourseLogBuffer
+
+
+class CourseLogBufferTestCase(unittest.TestCase):
+    def setUp(self):
+        self.logDirectory = tempfile.mkdtemp()
+        self.mainLogHandler = logging.FileHandler(os.path.join(self.logDirectory, 'main.log'), delay=True)
+        self.courseLogBuffer = CourseLogBuffer(lambda courseID: os.path.join(self.logDirectory, courseID + '.log'),
+                                               self.mainLogHandler)
+        self.courseLogBuffer.setFormatter(logging.Formatter('%(name)s: %(message)s'))
+
+        self.courseLoggers = [logging.getLogger(courseID) for courseID in ('901', '902')]
+        for courseLogger in self.courseLoggers:
+            courseLogger.setLevel(logging.INFO)
+            courseLogger.propagate = False
+            courseLogger.addHandler(self.courseLogBuffer)
+
+    def tearDown(self):
+        for courseLogger in self.courseLoggers:
+            courseLogger.removeHandler(self.courseLogBuffer)
+            courseLogger.propagate = True
+        self.courseLogBuffer.close()
+        self.mainLogHandler.close()
+        shutil.rmtree(self.logDirectory)
+
+    def readLog(self, name):
+        with open(os.path.join(self.logDirectory, name + '.log')) as logFile:
+            return logFile.read()
+
+    def test_course_block_written_at_flush(self):
+        (firstLogger, secondLogger) = self.courseLoggers
+        firstLogger.info('first')
+        secondLogger.info('other course')
+        firstLogger.info('second')
+
+        self.assertEqual(os.listdir(self.logDirectory), [])
+
+        self.courseLogBuffer.flushCourse('901')
+
+        self.assertEqual(self.readLog('901'), '901: first\n901: second\n')
+        self.assertEqual(self.readLog('main'), '901: first\n901: second\n')
+        self.assertFalse(os.path.exists(os.path.join(self.logDirectory, '902.log')))
+
+        self.courseLogBuffer.flush()
+
+        self.assertEqual(self.readLog('902'), '902: other course\n')
+        self.assertEqual(self.readLog('main'), '901: first\n901: second\n902: other course\n')
+
+    def test_course_log_appended(self):
+        self.courseLoggers[0].info('first run')
+        self.courseLogBuffer.flushCourse('901')
+        self.courseLogBuffer.flushCourse('901')
+        self.courseLoggers[0].info('second run')
+        self.courseLogBuffer.flushCourse('901')
+
+        self.assertEqual(self.readLog('901'), '901: first run\n901: second run\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
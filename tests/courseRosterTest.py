@@ -0,0 +1,61 @@
+import logging
+import unittest
+from argparse import Namespace
+from unittest import mock
+
+import main
+from courseRoster import CourseRoster
+
+
+class FakeGroup(object):
+    def __init__(self, title, members):
+        self.id = title.lower()
+        self.title = title
+        self.members = list(members)
+        self.addRequests = []
+
+    def get_members(self):
+        return {'users': list(self.members)}
+
+    def add_users(self, usernames):
+        self.addRequests.append(list(usernames))
+        return {'notAdded': [username for username in usernames if username.startswith('noaccount')]}
+
+    def removeUsersFromGroup(self, usernames):
+        return {'notRemoved': []}
+
+
+class CourseRosterTestCase(unittest.TestCase):
+    def setUp(self):
+        users = [Namespace(login_id=loginID) for loginID in ('alice', 'bob', 'noaccount1', None)]
+        self.roster = CourseRoster.fromUsers(1234, users)
+        self.course = Namespace(id=1234, name='Geo 101')
+        patch = mock.patch.object(main, 'logger', logging.getLogger(__name__))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_plan_changes(self):
+        self.assertEqual(self.roster.loginIDs, {'alice', 'bob', 'noaccount1'})
+        groupLoginIDs = CourseRoster.getLoginIDs(['alice_devumich', 'carol_devumich'])
+        self.assertEqual(groupLoginIDs, {'alice', 'carol'})
+        self.assertEqual(self.roster.planChanges(groupLoginIDs), (['carol'], ['bob', 'noaccount1'], ['alice']))
+
+    def test_users_not_added_are_not_sent_for_sibling_groups(self):
+        groups = [FakeGroup('Map_1', []), FakeGroup('Atlas_2', ['alice_devumich'])]
+        instructorLogs = []
+        for group in groups:
+            (instructorLog, groupMembers, usersNotAdded) = main.updateGroupUsers(
+                {}, self.course, '', group.title, group, courseRoster=self.roster)
+            instructorLogs.append(instructorLog)
+            self.assertEqual(groupMembers, {'alice', 'bob'})
+            self.assertEqual(usersNotAdded, {'noaccount1'})
+
+        usernames = main.arcgisUM.formatUsersNamesForArcGIS(['alice', 'bob', 'noaccount1'])
+        self.assertEqual([sorted(request) for request in groups[0].addRequests], [usernames])
+        self.assertEqual(groups[1].addRequests, [usernames[1:2]])
+        self.assertIn('* ' + usernames[2], instructorLogs[1])
+        self.assertEqual(self.roster.getStats(), {'users': 3, 'groups': 2, 'usersNotResent': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from argparse import Namespace
+from unittest import mock
+
+import main
+from syncState import SyncState
+
+
+class FakeGroupManager(object):
+    def __init__(self):
+        self.groups = []
+
+    def search(self, query, max_groups=1000):
+        return list(self.groups) if query.startswith('tags:') else []
+
+    def create(self, title, tags):
+        group = FakeGroup(title)
+        self.groups.append(group)
+        return group
+
+
+class FakeGroup(object):
+    def __init__(self, title):
+        self.id = title.lower()
+        self.title = title
+        self.modified = 1
+        self.members = []
+        self.calls = []
+        self.accountsCreated = set()  # Login IDs starting with "noaccount" whose ArcGIS accounts now exist
+
+    def get_members(self):
+        self.calls.append('get_members')
+        return {'users': list(self.members)}
+
+    def add_users(self, usernames):
+        self.calls.append('add_users')
+        notAdded = [username for username in usernames if username.startswith('noaccount')
+                    and username.split('_')[0] not in self.accountsCreated]
+        self.members.extend(username for username in usernames if username not in notAdded)
+        self.modified = int(time.time() * 1000)
+        return {'notAdded': notAdded}
+
+    def removeUsersFromGroup(self, usernames):
+        self.calls.append('removeUsersFromGroup')
+        return {'notRemoved': []}
+
+
+class GroupSyncTestCase(unittest.TestCase):
+    def setUp(self):
+        self.logDirectory = tempfile.mkdtemp()
+        patches = [
+            mock.patch.object(main, 'courseLoggers', {}),
+            mock.patch.object(main, 'courseLogBuffer', None),
+            mock.patch.object(main, 'getMainLogFilePath',
+                              lambda nameSuffix=None: os.path.join(self.logDirectory, 'main.log')),
+            mock.patch.object(main, 'getCourseLogFilePath',
+                              lambda courseID: os.path.join(self.logDirectory, courseID + '.log')),
+            mock.patch.object(main.config.Application.Concurrency, 'ARCGIS_GROUP_WORKER_COUNT', 4),
+            mock.patch.object(main, 'logger', logging.getLogger(__name__)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        main.closeAllCourseLoggerHandlers()
+        for courseLogger in main.courseLoggers.values():
+            courseLogger.handlers = []
+        shutil.rmtree(self.logDirectory)
+
+    def test_one_course_logger_for_concurrent_callers(self):
+        barrier = threading.Barrier(8)
+
+        def getLogger(_):
+            barrier.wait()
+            return main.getCourseLogger(4321, 'Geo 101')
+
+        courseLoggers = [result for (_, result, _) in main.util.mapConcurrently(getLogger, range(8), 8)]
+
+        self.assertEqual(len(set(map(id, courseLoggers))), 1)
+        self.assertEqual(courseLoggers[0].handlers, [main.courseLogBuffer])
+
+    def test_groups_updated_concurrently(self):
+        course = Namespace(id=1234, name='Geo 101')
+        assignments = [Namespace(id=assignmentID, name='Lab', course_id=course.id) for assignmentID in range(6)]
+        barrier = threading.Barrier(4, timeout=10)
+
+        def updateGroup(arcGIS, courseUserDictionary, groupTags, assignment, course, *args):
+            if assignment.id < 4:
+                barrier.wait()  # Only passes if 4 groups are being updated at the same time.
+            if assignment.id == 5:
+                raise RuntimeError('ArcGIS is unavailable')
+            return 'synced'
+
+        with mock.patch.object(main, 'updateArcGISGroupForAssignment', updateGroup):
+            counts = main.updateArcGISGroupsForAssignments(Namespace(groups=FakeGroupManager()), assignments,
+                                                           {course.id: course}, {course.id: []})
+
+        self.assertEqual(counts, {'synced': 5, 'failed': 1})
+
+    def test_course_log_written_after_its_last_group(self):
+        courses = [Namespace(id=courseID, name='Geo {}'.format(courseID)) for courseID in (1234, 5678)]
+        assignments = [Namespace(id=assignmentID, name='Lab', course_id=courses[assignmentID % 2].id)
+                       for assignmentID in range(6)]
+        courseLogPath = os.path.join(self.logDirectory, '1234.log')
+        courseLogExisted = []
+
+        def updateGroup(arcGIS, courseUserDictionary, groupTags, assignment, course, *args):
+            main.getCourseLogger(course.id, course.name).info('Updated group for assignment {}'.format(assignment.id))
+            if assignment.id == 4:
+                courseLogExisted.append(os.path.exists(courseLogPath))
+            return 'synced'
+
+        with mock.patch.object(main.config.Application.Concurrency, 'ARCGIS_GROUP_WORKER_COUNT', 1), \
+                mock.patch.object(main, 'updateArcGISGroupForAssignment', updateGroup):
+            main.updateArcGISGroupsForAssignments(Namespace(groups=FakeGroupManager()), assignments,
+                                                  dict((course.id, course) for course in courses),
+                                                  dict((course.id, []) for course in courses))
+
+        self.assertEqual(courseLogExisted, [False])
+        with open(courseLogPath) as courseLogFile:
+            courseLog = courseLogFile.read()
+        self.assertEqual(courseLog.count('Running at: '), 3)
+        self.assertIn('Updated group for assignment 4\n', courseLog)
+        self.assertNotIn('assignment 5', courseLog)
+
+    def test_users_not_added_sent_again_when_group_unchanged(self):
+        course = Namespace(id=1234, name='Geo 101')
+        assignment = Namespace(id=1, name='Lab', course_id=course.id)
+        courseUserDictionary = {course.id: [Namespace(login_id=loginID) for loginID in ('alice', 'noaccount1')]}
+        group = FakeGroup('Geo 101_1234_Lab_1')
+        syncState = SyncState(os.path.join(self.logDirectory, 'sync-state.sqlite'))
+        self.addCleanup(syncState.close)
+        courseLogger = mock.Mock()
+
+        def updateGroup():
+            del group.calls[:]
+            courseLogger.reset_mock()
+            return main.updateArcGISGroupForAssignment(None, courseUserDictionary, '', assignment, course, '',
+                                                       syncState=syncState)
+
+        with mock.patch.object(main.arcgisUM, 'lookForExistingArcGISGroup', return_value=group), \
+                mock.patch.object(main, 'getCourseLogger', return_value=courseLogger):
+            self.assertEqual(updateGroup(), 'notAddable')
+            state = syncState.getAssignmentState(course.id, assignment.id)
+            self.assertEqual((state.members, state.usersNotAdded), ({'alice'}, {'noaccount1'}))
+
+            # Adding users modified the group, but not since the state was recorded.  Its members aren't
+            # fetched, but the users ArcGIS wouldn't add are sent again, and the instructors are told again.
+            self.assertEqual(updateGroup(), 'notAddable')
+            self.assertEqual(group.calls, ['add_users'])
+            self.assertIn('need ArcGIS accounts created for them):\n* noaccount1_',
+                          courseLogger.info.call_args[0][0])
+            state = syncState.getAssignmentState(course.id, assignment.id)
+            self.assertEqual((state.members, state.usersNotAdded, state.outcome),
+                             ({'alice'}, {'noaccount1'}, 'notAddable'))
+
+            group.accountsCreated.add('noaccount1')
+            self.assertEqual(updateGroup(), 'synced')
+            self.assertEqual(group.calls, ['add_users'])
+            state = syncState.getAssignmentState(course.id, assignment.id)
+            self.assertEqual((state.members, state.usersNotAdded), ({'alice', 'noaccount1'}, set()))
+
+            # Nothing is left to add, so the group is skipped.
+            self.assertEqual(updateGroup(), 'skipped')
+            self.assertEqual(group.calls, [])
+
+            courseUserDictionary[course.id].append(Namespace(login_id='bob'))
+            self.assertEqual(updateGroup(), 'synced')
+            self.assertEqual(group.calls, ['add_users'])
+            self.assertEqual(syncState.getAssignmentState(course.id, assignment.id).members,
+                             {'alice', 'bob', 'noaccount1'})
+
+    def test_unchanged_groups_skipped_unless_full_resync(self):
+        course = Namespace(id=1234, name='Geo 101')
+        assignments = [Namespace(id=assignmentID, name='Lab', course_id=course.id) for assignmentID in range(3)]
+        courseUserDictionary = {course.id: [Namespace(login_id=loginID) for loginID in ('alice', 'bob')]}
+        arcGIS = Namespace(groups=FakeGroupManager())
+        syncState = SyncState(os.path.join(self.logDirectory, 'sync-state.sqlite'))
+        self.addCleanup(syncState.close)
+
+        def updateGroups(fullResync=False):
+            for group in arcGIS.groups.groups:
+                del group.calls[:]
+            return main.updateArcGISGroupsForAssignments(arcGIS, assignments, {course.id: course},
+                                                         courseUserDictionary, syncState, fullResync)
+
+        self.assertEqual(updateGroups(), {'synced': 3})
+        self.assertEqual(updateGroups(), {'skipped': 3})
+        self.assertEqual([group.calls for group in arcGIS.groups.groups], [[], [], []])
+
+        # Changed in ArcGIS by someone else, so its members are fetched again.
+        arcGIS.groups.groups[1].modified = int(time.time() * 1000) + 60000
+        self.assertEqual(updateGroups(), {'synced': 1, 'skipped': 2})
+        self.assertEqual([group.calls for group in arcGIS.groups.groups], [[], ['get_members'], []])
+
+        self.assertEqual(updateGroups(fullResync=True), {'synced': 3})
+        self.assertEqual([group.calls for group in arcGIS.groups.groups], [['get_members']] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from RequestsPlus import RequestsPlus, HTTPCache
+
+httpCacheModule = sys.modules['RequestsPlus.HTTPCache']
+
+
+# Serve a small JSON body per path, with an ETag.  Honor If-None-Match.
+class ETagHandler(BaseHTTPRequestHandler):
+    sentBodies = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        etag = '"{}"'.format(self.path)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        ETagHandler.sentBodies += 1
+        body = json.dumps([{'path': self.path, 'padding': 'x' * 100}]).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HTTPCacheTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), ETagHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.baseURL = 'http://127.0.0.1:{}/api/v1'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.cacheDirectory = tempfile.mkdtemp()
+        ETagHandler.sentBodies = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDirectory)
+
+    def test_not_modified_served_from_disk(self):
+        httpCache = HTTPCache(self.cacheDirectory)
+        api = RequestsPlus(self.baseURL, httpCache=httpCache)
+
+        first = api.get('/outcomes/1').json()
+        second = api.get('/outcomes/1')
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first)
+        self.assertEqual(ETagHandler.sentBodies, 1)
+        stats = httpCache.getStats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['stores']), (1, 1, 1))
+        self.assertEqual(stats['bytesSaved'], len(second.content))
+
+    def test_cache_survives_new_instance(self):
+        RequestsPlus(self.baseURL, httpCache=HTTPCache(self.cacheDirectory)).get('/courses/1')
+        httpCache = HTTPCache(self.cacheDirectory)
+        RequestsPlus(self.baseURL, httpCache=httpCache).get('/courses/1')
+
+        self.assertEqual(ETagHandler.sentBodies, 1)
+        self.assertEqual(httpCache.getStats()['hits'], 1)
+
+    def test_least_recently_used_evicted(self):
+        httpCache = HTTPCache(self.cacheDirectory, maxBytes=330)
+        api = RequestsPlus(self.baseURL, httpCache=httpCache)
+
+        for path in ('/courses/1', '/courses/2', '/courses/3'):
+            api.get(path)
+
+        stats = httpCache.getStats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytesCached'], 330)
+
+        api.get('/courses/1')
+        self.assertEqual(ETagHandler.sentBodies, 4)
+
+    def test_eviction_leaves_room(self):
+        httpCache = HTTPCache(self.cacheDirectory, maxBytes=1100)
+        api = RequestsPlus(self.baseURL, httpCache=httpCache)
+
+        for number in range(7):
+            api.get('/courses/{}'.format(number))
+        api.get('/courses/0')  # Served from the cache, so now the most recently used.
+        api.get('/courses/7')
+
+        stats = httpCache.getStats()
+        self.assertEqual(stats['evictions'], 2)
+        self.assertLessEqual(stats['bytesCached'], 1100 * httpCacheModule.EVICTION_LOW_WATER_FRACTION)
+        self.assertEqual(len(os.listdir(self.cacheDirectory)), 2 * 6)
+
+        sentBodies = ETagHandler.sentBodies
+        api.get('/courses/0')
+        api.get('/courses/1')
+        self.assertEqual(ETagHandler.sentBodies, sentBodies + 1)
+
+    def test_files_readable_only_by_owner(self):
+        cacheDirectory = os.path.join(self.cacheDirectory, 'http-cache')
+        RequestsPlus(self.baseURL, httpCache=HTTPCache(cacheDirectory)).get('/users/1')
+
+        self.assertEqual(stat.S_IMODE(os.stat(cacheDirectory).st_mode), 0o700)
+        for fileName in os.listdir(cacheDirectory):
+            self.assertEqual(stat.S_IMODE(os.stat(os.path.join(cacheDirectory, fileName)).st_mode), 0o600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import smtplib
+import socketserver
+import threading
+import unittest
+
+from mailDispatcher import MailDispatcher
+
+
+class ThreadingSMTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+# Just enough of SMTP for smtplib.SMTP.sendmail(), recording each session's commands and messages.
+class SMTPHandler(socketserver.StreamRequestHandler):
+    sessions = []
+    messages = []
+    closeAfterMessages = None  # Close sessions after this many messages, like a server with a limit
+
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode('ascii'))
+
+    def handle(self):
+        commands = []
+        self.sessions.append(commands)
+        messageCount = 0
+        self.reply('220 localhost test SMTP')
+
+        for line in self.rfile:
+            command = line.decode('ascii').strip().split(' ')[0].upper()
+            commands.append(command)
+            if command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for dataLine in self.rfile:
+                    if dataLine.rstrip(b'\r\n') == b'.':
+                        break
+                    data.append(dataLine)
+                self.messages.append(b''.join(data))
+                self.reply('250 OK')
+                messageCount += 1
+                if self.closeAfterMessages is not None and messageCount >= self.closeAfterMessages:
+                    return
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class MailDispatcherTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingSMTPServer(('127.0.0.1', 0), SMTPHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.smtpServer = '127.0.0.1:{}'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        SMTPHandler.sessions = []
+        SMTPHandler.messages = []
+        SMTPHandler.closeAfterMessages = None
+
+    def makeMessages(self, count):
+        return [('sender@umich.edu', ['user{}@umich.edu'.format(number)], 'Subject: {}\r\n\r\nLog'.format(number))
+                for number in range(count)]
+
+    def test_messages_share_sessions(self):
+        with MailDispatcher(self.smtpServer, connectionCount=2) as mailDispatcher:
+            results = mailDispatcher.sendAll(self.makeMessages(20))
+
+        self.assertEqual([exception for (_, _, exception) in results], [None] * 20)
+        self.assertEqual(len(SMTPHandler.messages), 20)
+        self.assertLessEqual(mailDispatcher.connectCount, 2)
+        self.assertEqual((mailDispatcher.sentCount, len(SMTPHandler.sessions)), (20, mailDispatcher.connectCount))
+
+    def test_reconnect_after_server_closes_session(self):
+        SMTPHandler.closeAfterMessages = 2
+
+        with MailDispatcher(self.smtpServer) as mailDispatcher:
+            for message in self.makeMessages(5):
+                mailDispatcher.send(*message)
+
+        self.assertEqual(len(SMTPHandler.messages), 5)
+        self.assertEqual(mailDispatcher.connectCount, 3)
+
+    def test_idle_session_checked_with_noop(self):
+        with MailDispatcher(self.smtpServer, keepAliveSeconds=0) as mailDispatcher:
+            for message in self.makeMessages(2):
+                mailDispatcher.send(*message)
+
+        self.assertEqual(mailDispatcher.connectCount, 1)
+        self.assertIn('NOOP', SMTPHandler.sessions[0])
+
+    def test_refused_message_keeps_session(self):
+        with MailDispatcher(self.smtpServer) as mailDispatcher:
+            with self.assertRaises(smtplib.SMTPRecipientsRefused):
+                mailDispatcher.send('sender@umich.edu', [], 'Subject: none\r\n\r\n')
+            mailDispatcher.send(*self.makeMessages(1)[0])
+
+        self.assertEqual(mailDispatcher.connectCount, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import smtplib
+import tempfile
+import unittest
+from email.mime.text import MIMEText
+from unittest import mock
+
+import mailOutbox
+import main
+from mailOutbox import MailOutbox
+
+
+# Sends like MailDispatcher.sendAll(), recording the messages and failing for some recipients.
+class FakeMailDispatcher(object):
+    def __init__(self, failingRecipients=()):
+        self.failingRecipients = set(failingRecipients)
+        self.sent = []
+
+    def sendAll(self, messages):
+        results = []
+        for (sender, recipients, message) in messages:
+            if self.failingRecipients.intersection(recipients):
+                results.append(((sender, recipients, message), None,
+                                smtplib.SMTPServerDisconnected('Connection unexpectedly closed')))
+            else:
+                self.sent.append((sender, recipients, message))
+                results.append(((sender, recipients, message), {}, None))
+        return results
+
+
+class MailOutboxTestCase(unittest.TestCase):
+    def setUp(self):
+        self.stateDirectory = tempfile.mkdtemp()
+        self.mailOutbox = MailOutbox(os.path.join(self.stateDirectory, 'outbox'), maxAttempts=2, retrySeconds=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.stateDirectory)
+
+    def putMessage(self, recipient):
+        message = MIMEText('Course log for {}'.format(recipient), 'plain', 'utf-8')
+        message['Subject'] = 'ArcGIS-Canvas logs'
+        self.mailOutbox.put('sender@umich.edu', [recipient], message)
+        return message
+
+    def test_delivered_messages_removed(self):
+        message = self.putMessage('teacher@umich.edu')
+        self.putMessage('other@umich.edu')
+
+        # The caller's message isn't changed, and a new outbox finds the messages.
+        self.assertNotIn(mailOutbox.ENVELOPE_SENDER_HEADER, message)
+        self.assertEqual(len(MailOutbox(self.mailOutbox.directory)), 2)
+
+        mailDispatcher = FakeMailDispatcher()
+        stats = self.mailOutbox.deliver(mailDispatcher)
+
+        self.assertEqual(stats, {'sent': 2, 'retrying': 0, 'failed': 0, 'waiting': 0})
+        self.assertEqual([recipients for (_, recipients, _) in mailDispatcher.sent],
+                         [['teacher@umich.edu'], ['other@umich.edu']])
+        (sender, _, sentMessage) = mailDispatcher.sent[0]
+        self.assertEqual(sender, 'sender@umich.edu')
+        self.assertIn('Subject: ArcGIS-Canvas logs', sentMessage)
+        self.assertNotIn('X-Kartograafr', sentMessage)
+
+    def test_failed_message_retried_later_then_moved(self):
+        self.putMessage('teacher@umich.edu')
+        self.putMessage('unreachable@umich.edu')
+
+        stats = self.mailOutbox.deliver(FakeMailDispatcher(failingRecipients=['unreachable@umich.edu']))
+        self.assertEqual(stats, {'sent': 1, 'retrying': 1, 'failed': 0, 'waiting': 1})
+
+        # Not due yet.
+        mailDispatcher = FakeMailDispatcher()
+        self.assertEqual(self.mailOutbox.deliver(mailDispatcher)['sent'], 0)
+
+        for key in self.mailOutbox.maildir.keys():
+            message = self.mailOutbox.maildir[key]
+            self.assertEqual(message[mailOutbox.ATTEMPTS_HEADER], '1')
+            del message[mailOutbox.NEXT_ATTEMPT_HEADER]
+            message[mailOutbox.NEXT_ATTEMPT_HEADER] = '0'
+            self.mailOutbox.maildir[key] = message
+
+        stats = self.mailOutbox.deliver(FakeMailDispatcher(failingRecipients=['unreachable@umich.edu']))
+        self.assertEqual(stats, {'sent': 0, 'retrying': 0, 'failed': 1, 'waiting': 0})
+        self.assertEqual(len(self.mailOutbox.maildir.get_folder(mailOutbox.FAILED_FOLDER_NAME)), 1)
+
+    def test_drain_of_empty_outbox_is_quiet(self):
+        with mock.patch.object(main, 'getMailOutbox', return_value=self.mailOutbox), \
+                mock.patch.object(main, 'getMailDispatcher') as getMailDispatcher, \
+                mock.patch.object(main, 'logger') as logger:
+            self.assertIsNone(main.drainOutbox())
+
+        getMailDispatcher.assert_not_called()
+        logger.info.assert_not_called()
+
+        self.putMessage('teacher@umich.edu')
+        mailDispatcher = FakeMailDispatcher()
+        mailDispatcher.connectCount = 1
+        with mock.patch.object(main, 'getMailOutbox', return_value=self.mailOutbox), \
+                mock.patch.object(main, 'getMailDispatcher', return_value=mock.MagicMock(
+                    __enter__=mock.Mock(return_value=mailDispatcher))), \
+                mock.patch.object(main, 'logger'):
+            self.assertEqual(main.drainOutbox()['sent'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from metrics import MetricsRegistry
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.metricsRegistry = MetricsRegistry()
+
+    def test_prometheus_text(self):
+        self.metricsRegistry.increment('http_requests_total', endpoint='/courses/{courseID}', method='GET',
+                                       status='200')
+        self.metricsRegistry.increment('http_requests_total', 2, endpoint='/courses/{courseID}', method='GET',
+                                       status='200')
+        for seconds in (0.01, 0.3, 60):
+            self.metricsRegistry.observe('http_request_duration_seconds', seconds, endpoint='/courses/{courseID}',
+                                         method='GET')
+
+        lines = self.metricsRegistry.getPrometheusText().splitlines()
+
+        self.assertIn('# TYPE kartograafr_http_requests_total counter', lines)
+        self.assertIn('kartograafr_http_requests_total{endpoint="/courses/{courseID}",method="GET",status="200"} 3',
+                      lines)
+        self.assertIn('# TYPE kartograafr_http_request_duration_seconds histogram', lines)
+        bucketPrefix = 'kartograafr_http_request_duration_seconds_bucket{endpoint="/courses/{courseID}",method="GET",'
+        self.assertIn(bucketPrefix + 'le="0.05"} 1', lines)
+        self.assertIn(bucketPrefix + 'le="0.5"} 2', lines)
+        self.assertIn(bucketPrefix + 'le="30.0"} 2', lines)
+        self.assertIn(bucketPrefix + 'le="+Inf"} 3', lines)
+        self.assertIn('kartograafr_http_request_duration_seconds_count{endpoint="/courses/{courseID}",method="GET"} 3',
+                      lines)
+        self.assertNotIn('# TYPE kartograafr_arcgis_operations_total counter', lines)
+
+    def test_arcgis_operation_errors_counted(self):
+        with self.metricsRegistry.timeOperation('groups.search'):
+            pass
+        with self.assertRaises(RuntimeError):
+            with self.metricsRegistry.timeOperation('groups.search'):
+                raise RuntimeError('ArcGIS is unavailable')
+
+        summary = self.metricsRegistry.getSummary()
+        self.assertEqual([(series['labels']['result'], series['value'])
+                          for series in summary['kartograafr_arcgis_operations_total']], [('error', 1), ('ok', 1)])
+        self.assertEqual(summary['kartograafr_arcgis_operation_errors_total'][0]['value'], 1)
+        self.assertEqual(summary['kartograafr_arcgis_operation_duration_seconds'][0]['count'], 2)
+
+    def test_files_written(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.metricsRegistry.observe('response_collection_pages', 3, endpoint='/courses/{courseID}/users')
+
+        textfilePath = os.path.join(directory, 'metrics', 'kartograafr.prom')
+        jsonPath = os.path.join(directory, 'metrics', 'kartograafr.json')
+        self.metricsRegistry.writePrometheusTextfile(textfilePath)
+        self.metricsRegistry.writeJSONSummary(jsonPath)
+
+        with open(textfilePath) as textfile:
+            self.assertEqual(textfile.read(), self.metricsRegistry.getPrometheusText())
+        with open(jsonPath) as jsonFile:
+            self.assertEqual(json.load(jsonFile)['kartograafr_response_collection_pages'][0]['buckets']['5'], 1)
+        self.assertEqual(sorted(os.listdir(os.path.join(directory, 'metrics'))),
+                         ['kartograafr.json', 'kartograafr.prom'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import copy
+import pickle
+import unittest
+from argparse import Namespace
+
+from CanvasAPI.models import CanvasObject, Assignment, User, makeCanvasObjects
+from RequestsPlus.ResponseCollection import makeNamespaces
+
+USER_JSON = {
+    'id': 7,
+    'name': 'Ada Lovelace',
+    'login_id': 'ada',
+    'email': 'ada@example.edu',
+    'enrollments': [{'type': 'TeacherEnrollment', 'grades': {'current_score': 90}}],
+    'avatar_url': 'https://example.edu/ada.png',
+}
+
+
+class ModelsTestCase(unittest.TestCase):
+    def test_canvas_object_missing_attribute_is_none(self):
+        canvasObject = CanvasObject(id=1, name='x')
+        self.assertEqual(canvasObject.name, 'x')
+        self.assertIsNone(canvasObject.title)
+        self.assertEqual(str(canvasObject), '"x" (1)')
+
+    def test_record_keeps_only_projected_fields(self):
+        user = User.fromJSON(USER_JSON, ('id', 'login_id'))
+        self.assertEqual((user.id, user.login_id), (7, 'ada'))
+        self.assertIsNone(user.email)
+        self.assertIsNone(user.avatar_url)
+        self.assertFalse(hasattr(user, '__dict__'))
+        self.assertIsInstance(user, User)
+
+    def test_default_fields_and_nested_objects(self):
+        user = User.fromJSON(USER_JSON)
+        self.assertEqual(user.email, 'ada@example.edu')
+        self.assertEqual(user.enrollments[0].type, 'TeacherEnrollment')
+        self.assertEqual(user.enrollments[0].grades.current_score, 90)
+        self.assertIsNone(user.avatar_url)
+
+    def test_projected_types_reused(self):
+        self.assertIs(type(User.fromJSON(USER_JSON, ('id',))), type(User.fromJSON({'id': 8}, ['id'])))
+        self.assertIsNot(type(User.fromJSON(USER_JSON, ('id',))), type(Assignment.fromJSON({'id': 8}, ('id',))))
+
+    def test_record_copy_and_pickle(self):
+        user = User.fromJSON(USER_JSON, ('id', 'login_id'))
+        for userCopy in (copy.deepcopy(user), pickle.loads(pickle.dumps(user))):
+            self.assertIs(type(userCopy), type(user))
+            self.assertEqual(userCopy.toJSON(), {'id': 7, 'login_id': 'ada'})
+
+    def test_json_objects_made_of_class(self):
+        for (makeObjects, objectClass) in ((makeCanvasObjects, CanvasObject), (makeNamespaces, Namespace)):
+            [user] = makeObjects([USER_JSON])
+            self.assertIs(type(user), objectClass)
+            self.assertIs(type(user.enrollments[0].grades), objectClass)
+            self.assertEqual(user.enrollments[0].grades.current_score, 90)
+            self.assertEqual(makeObjects('ada'), 'ada')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from CanvasAPI import CanvasObjectCache, cachedObjects
+from CanvasAPI.models import CanvasObject, OutcomeLink, User
+
+objectCacheModule = sys.modules['CanvasAPI.ObjectCache']
+
+USER_JSON = {
+    'id': 7,
+    'name': 'Ada Lovelace',
+    'login_id': 'ada',
+    'email': 'ada@example.edu',
+    'enrollments': [{'type': 'TeacherEnrollment', 'grades': {'current_score': 90}}],
+}
+
+
+# Stands in for CanvasAPI, counting the requests each method would make.
+class FakeCanvas(object):
+    def __init__(self, objectCache):
+        self.objectCache = objectCache
+        self.requests = []
+
+    @cachedObjects('COURSES')
+    def getCourseObject(self, courseID, fields=None):
+        self.requests.append(('COURSES', courseID, fields))
+        return CanvasObject(id=courseID, name='Geo {}'.format(courseID), fields=fields)
+
+    @cachedObjects('OUTCOMES')
+    def getOutcomeObject(self, outcomeID):
+        self.requests.append(('OUTCOMES', outcomeID))
+        return CanvasObject(id=outcomeID, title='ArcGIS Mapping Skills')
+
+    @cachedObjects('COURSES_OUTCOME_GROUP_LINKS', OutcomeLink)
+    def getCoursesOutcomeGroupLinksObjects(self, courseID, fields=None):
+        self.requests.append(('COURSES_OUTCOME_GROUP_LINKS', courseID, fields))
+        return OutcomeLink.fromJSONList([{'outcome': {'id': 2501}, 'context_id': courseID}], fields)
+
+    @cachedObjects('COURSES_USERS', User)
+    def getCoursesUsersObjects(self, courseID, fields=None):
+        self.requests.append(('COURSES_USERS', courseID, fields))
+        return User.fromJSONList([USER_JSON], fields)
+
+
+class ObjectCacheTestCase(unittest.TestCase):
+    TIMES_TO_LIVE = {'COURSES': 60, 'OUTCOMES': 3600, 'COURSES_OUTCOME_GROUP_LINKS': 60, 'COURSES_USERS': 60}
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.databasePath = os.path.join(self.directory, 'state', 'canvas-objects.sqlite')
+        self.now = 1000000.0
+        patch = mock.patch.object(objectCacheModule.time, 'time', lambda: self.now)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def makeCanvas(self, timesToLive=None, refresh=False):
+        return FakeCanvas(CanvasObjectCache(self.databasePath, timesToLive or self.TIMES_TO_LIVE, refresh))
+
+    def test_times_to_live_by_kind(self):
+        canvas = self.makeCanvas()
+        canvas.getCourseObject(1)
+        canvas.getOutcomeObject(2501)
+
+        self.now += 59
+        self.assertEqual(canvas.getCourseObject(1).name, 'Geo 1')
+        self.now += 2
+        canvas.getCourseObject(1)
+        canvas.getOutcomeObject(2501)
+
+        self.assertEqual(canvas.requests, [('COURSES', 1, None), ('OUTCOMES', 2501), ('COURSES', 1, None)])
+        self.assertEqual(canvas.objectCache.getStats(), {'hits': 2, 'misses': 3})
+
+    def test_kinds_without_time_to_live_not_cached(self):
+        canvas = self.makeCanvas({'OUTCOMES': 3600, 'COURSES': 0})
+        canvas.getCourseObject(1)
+        canvas.getCourseObject(1)
+
+        self.assertEqual(len(canvas.requests), 2)
+        self.assertEqual(canvas.objectCache.getStats(), {'hits': 0, 'misses': 0})
+
+    def test_expired_objects_removed_when_opened(self):
+        self.makeCanvas().getCourseObject(1)
+        self.now += 61
+        canvas = self.makeCanvas()
+
+        self.assertEqual(canvas.objectCache._connection.execute('SELECT COUNT(*) FROM canvas_objects').fetchone(),
+                         (0,))
+
+    def test_refresh_bypasses_cached_objects_but_stores_new_ones(self):
+        self.makeCanvas().getOutcomeObject(2501)
+
+        self.now += 1000
+        refreshingCanvas = self.makeCanvas(refresh=True)
+        refreshingCanvas.getOutcomeObject(2501)
+        refreshingCanvas.getOutcomeObject(2501)
+        self.assertEqual(len(refreshingCanvas.requests), 2)
+
+        # Expired if it had been stored only by the first run.
+        self.now += 3000
+        canvas = self.makeCanvas()
+        canvas.getOutcomeObject(2501)
+        self.assertEqual(canvas.requests, [])
+
+    def test_key_made_from_arguments(self):
+        canvas = self.makeCanvas()
+        canvas.getCourseObject(1, fields=['id', 'name'])
+        canvas.getCourseObject(1, fields=('id', 'name'))  # Same JSON as the list
+        canvas.getCourseObject(1)
+        canvas.getCourseObject(1, fields=['name', 'id'])
+        canvas.getCourseObject(2, fields=['id', 'name'])
+        # Arguments passed by keyword instead of position are a different key.
+        canvas.getCourseObject(courseID=1, fields=['id', 'name'])
+        canvas.getCourseObject(fields=['id', 'name'], courseID=1)
+
+        self.assertEqual(canvas.requests, [('COURSES', 1, ['id', 'name']), ('COURSES', 1, None),
+                                           ('COURSES', 1, ['name', 'id']), ('COURSES', 2, ['id', 'name']),
+                                           ('COURSES', 1, ['id', 'name'])])
+        self.assertEqual(canvas.getCourseObject(1, fields=['id', 'name']).fields, ['id', 'name'])
+
+    def test_records_round_trip(self):
+        fields = ('id', 'login_id', 'enrollments')
+        users = self.makeCanvas().getCoursesUsersObjects(1, fields=fields)
+
+        canvas = self.makeCanvas()
+        cachedUsers = canvas.getCoursesUsersObjects(1, fields=fields)
+
+        self.assertEqual(canvas.requests, [])
+        self.assertIs(type(cachedUsers[0]), type(users[0]))
+        self.assertIsInstance(cachedUsers[0], User)
+        self.assertEqual(cachedUsers[0].FIELDS, fields)
+        self.assertEqual(cachedUsers[0].login_id, 'ada')
+        self.assertIsNone(cachedUsers[0].email)
+        self.assertEqual(cachedUsers[0].enrollments[0].type, 'TeacherEnrollment')
+        self.assertEqual(cachedUsers[0].enrollments[0].grades.current_score, 90)
+
+        links = self.makeCanvas().getCoursesOutcomeGroupLinksObjects(1)
+        cachedLinks = self.makeCanvas().getCoursesOutcomeGroupLinksObjects(1)
+        self.assertEqual(cachedLinks[0].toJSON(), links[0].toJSON())
+        self.assertEqual(cachedLinks[0].outcome.id, 2501)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+import util
+from phaseTimer import PhaseTimer
+
+
+def busyWork(count):
+    return sum(number * number for number in range(count))
+
+
+def allocate(count):
+    return [str(number) for number in range(count)]
+
+
+class PhaseTimerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_phases_timed(self):
+        phaseTimer = PhaseTimer()
+        phaseTimer.startPhase('first')
+        busyWork(10000)
+        phaseTimer.startPhase('second')
+        self.assertEqual(phaseTimer.phase, 'second')
+        phaseTimer.startPhase('first')
+        phaseTimer.stop()
+
+        self.assertIsNone(phaseTimer.phase)
+        self.assertEqual(list(phaseTimer.phaseTimes), ['first', 'second'])
+        self.assertGreater(phaseTimer.phaseTimes['first']['wallSeconds'], 0)
+        self.assertGreaterEqual(phaseTimer.phaseTimes['first']['cpuSeconds'], 0)
+        self.assertEqual([line.split()[0] for line in phaseTimer.getReport()], ['Phase', 'first', 'second', 'total'])
+
+        reportPath = os.path.join(self.directory, 'timing', 'timing.json')
+        phaseTimer.writeReport(reportPath)
+        with open(reportPath) as reportFile:
+            self.assertEqual(list(json.load(reportFile)['phases']), ['first', 'second'])
+
+    def test_phases_profiled_with_workers(self):
+        phaseTimer = PhaseTimer(profileDirectory=self.directory)
+        phaseTimer.startPhase('course data')
+        util.mapConcurrently(busyWork, [1000, 2000, 3000], 3)
+        phaseTimer.startPhase('group sync')
+        kept = allocate(20000)
+        phaseTimer.stop()
+
+        self.assertIsNone(util.workerCallWrapper)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['01-course-data-allocations.txt', '01-course-data.pstats',
+                          '02-group-sync-allocations.txt', '02-group-sync.pstats'])
+
+        # The workers' calls are in the phase's statistics.
+        workerCalls = [callCount for ((_, _, functionName), (callCount, _, _, _, _))
+                       in pstats.Stats(os.path.join(self.directory, '01-course-data.pstats')).stats.items()
+                       if functionName == 'busyWork']
+        self.assertEqual(workerCalls, [3])
+
+        with open(os.path.join(self.directory, '02-group-sync-allocations.txt')) as allocationsFile:
+            self.assertIn('phaseTimerTest.py', allocationsFile.read())
+        self.assertEqual(len(kept), 20000)
+
+
+if __name__ == '__main__':
+    unittest.main()
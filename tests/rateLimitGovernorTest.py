@@ -0,0 +1,72 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from RequestsPlus import RequestsPlus, RateLimitGovernor, RetryPolicy
+
+
+# Report a shrinking quota, refusing one request as Canvas does when the quota runs out.
+class QuotaHandler(BaseHTTPRequestHandler):
+    remaining = 100.0
+    throttleNext = False
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if QuotaHandler.throttleNext:
+            QuotaHandler.throttleNext = False
+            body = b'403 Forbidden (Rate Limit Exceeded)\n'
+            self.send_response(403)
+        else:
+            QuotaHandler.remaining -= 30
+            body = b'[]'
+            self.send_response(200)
+            self.send_header('X-Rate-Limit-Remaining', str(QuotaHandler.remaining))
+        self.send_header('X-Request-Cost', '1.5')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RateLimitGovernorTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), QuotaHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.baseURL = 'http://127.0.0.1:{}/api/v1'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        QuotaHandler.remaining = 100.0
+        QuotaHandler.throttleNext = False
+        self.governor = RateLimitGovernor(maxInFlight=8, lowRemaining=50, highRemaining=60, leakRate=10000)
+        self.api = RequestsPlus(self.baseURL, rateLimitGovernor=self.governor,
+                                retryPolicy=RetryPolicy(baseDelay=0.01))
+
+    def test_limit_follows_quota(self):
+        self.api.get('/a')
+        self.assertEqual((self.governor.remaining, self.governor.inFlightLimit), (70, 8))
+
+        self.api.get('/b')
+        self.assertEqual((self.governor.remaining, self.governor.inFlightLimit), (40, 4))
+
+    def test_throttled_request_sent_again(self):
+        self.governor.setPhase('users')
+        QuotaHandler.throttleNext = True
+
+        response = self.api.get('/users')
+
+        self.assertEqual(response.status_code, 200)
+        # Halved by the throttled request, then raised by the plentiful quota of the next one.
+        self.assertEqual(self.governor.inFlightLimit, 5)
+        stats = self.governor.getStats()['phases']['users']
+        self.assertEqual((stats['requests'], stats['throttled'], stats['cost']), (2, 1, 3.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import json
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+from unittest import mock
+
+from RequestsPlus import RequestsPlus, getNumberedPageURLs
+from metrics import MetricsRegistry
+
+# The package exports the ResponseCollection class under the same name as its module.
+responseCollectionModule = sys.modules['RequestsPlus.ResponseCollection']
+
+PAGE_COUNT = 5
+PAGE_SIZE = 3
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+# Serve PAGE_COUNT pages of items, with Canvas-style "Link" headers.
+# Bookmark pages use opaque page values instead of page numbers.
+class PagingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections open
+    requestedPaths = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requestedPaths.append(self.path)
+        url = urlparse(self.path)
+        # Like Canvas (Rails), the last of any repeated parameters is used.
+        pageValue = parse_qs(url.query).get('page', ['1'])[-1]
+        bookmarked = url.path.endswith('/bookmarked')
+        pageNumber = int(pageValue.replace('bookmark:', ''))
+        baseURL = 'http://127.0.0.1:{}{}'.format(self.server.server_port, url.path)
+
+        def pageLink(number, relation):
+            value = 'bookmark:{}'.format(number) if bookmarked else number
+            return '<{}?page={}&per_page={}>; rel="{}"'.format(baseURL, value, PAGE_SIZE, relation)
+
+        links = []
+        if pageNumber < PAGE_COUNT:
+            links.append(pageLink(pageNumber + 1, 'next'))
+        if not bookmarked:
+            links.append(pageLink(PAGE_COUNT, 'last'))
+
+        body = json.dumps([{'id': pageNumber * 10 + item} for item in range(PAGE_SIZE)]).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if links:
+            self.send_header('Link', ', '.join(links))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ResponseCollectionTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PagingHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.baseURL = 'http://127.0.0.1:{}/api/v1'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        PagingHandler.requestedPaths = []
+
+    def expectedIDs(self):
+        return [pageNumber * 10 + item for pageNumber in range(1, PAGE_COUNT + 1) for item in range(PAGE_SIZE)]
+
+    def collectIDs(self, path, pageWorkerCount):
+        api = RequestsPlus(self.baseURL, pageWorkerCount=pageWorkerCount)
+        response = api.get(path)
+        return [item['id'] for item in api.responseCollection(response).collectAllResponsePages().json()]
+
+    def test_numbered_page_urls(self):
+        pageURLs = getNumberedPageURLs('https://x.edu/users?a=b&page=2&per_page=10',
+                                       'https://x.edu/users?a=b&page=4&per_page=10')
+        self.assertEqual(pageURLs, ['https://x.edu/users?a=b&page=2&per_page=10',
+                                    'https://x.edu/users?a=b&page=3&per_page=10',
+                                    'https://x.edu/users?a=b&page=4&per_page=10'])
+
+    def test_bookmark_page_urls(self):
+        self.assertIsNone(getNumberedPageURLs('https://x.edu/users?page=bookmark:WzE',
+                                              'https://x.edu/users?page=bookmark:WzI'))
+        self.assertIsNone(getNumberedPageURLs('https://x.edu/users?page=2', None))
+
+    def test_sequential_pages(self):
+        self.assertEqual(self.collectIDs('/numbered', 1), self.expectedIDs())
+
+    def test_concurrent_pages_in_order(self):
+        self.assertEqual(self.collectIDs('/numbered', 4), self.expectedIDs())
+        self.assertEqual(len(PagingHandler.requestedPaths), PAGE_COUNT)
+
+    def test_bookmark_pages_followed(self):
+        self.assertEqual(self.collectIDs('/bookmarked', 4), self.expectedIDs())
+
+    def test_pages_reuse_pooled_connection(self):
+        api = RequestsPlus(self.baseURL)
+        collection = api.responseCollection(api.get('/numbered'))
+        collection.collectAllResponsePages()
+
+        self.assertIs(collection._session, api.session)
+        self.assertEqual(api.getConnectionStats(), {'newConnections': 1, 'reusedConnections': PAGE_COUNT - 1})
+
+    def test_iter_json_streams_pages(self):
+        api = RequestsPlus(self.baseURL)
+        collection = api.responseCollection(api.get('/numbered'))
+        self.assertEqual([item['id'] for item in collection.iterJSON()], self.expectedIDs())
+        self.assertEqual(len(collection.getAllResponses()), 1)
+
+    def test_iter_objects_stops_early(self):
+        api = RequestsPlus(self.baseURL)
+        collection = api.responseCollection(api.get('/numbered'))
+        firstOnSecondPage = next(item for item in collection.iterObjects() if item.id >= 20)
+        self.assertEqual(firstOnSecondPage.id, 20)
+        self.assertEqual(len(PagingHandler.requestedPaths), 2)
+
+    def test_metrics_labeled_by_endpoint_template(self):
+        metricsRegistry = MetricsRegistry()
+        api = RequestsPlus(self.baseURL, pageWorkerCount=4, metricsRegistry=metricsRegistry,
+                           endpointTemplates=['/numbered', '/courses/{courseID}/users'])
+        api.responseCollection(api.get('/numbered')).collectAllResponsePages()
+        api.get('/courses/1234/users')
+        api.get('/courses/1234/pages')
+
+        summary = metricsRegistry.getSummary()
+        self.assertEqual([(series['labels']['endpoint'], series['labels']['status'], series['value'])
+                          for series in summary['kartograafr_http_requests_total']],
+                         [('/courses/{courseID}/users', '200', 1), ('/numbered', '200', PAGE_COUNT), ('other', '200', 1)])
+        self.assertEqual([(series['labels'], series['count'], series['sum'])
+                          for series in summary['kartograafr_response_collection_pages']],
+                         [({'endpoint': '/numbered'}, 1, PAGE_COUNT)])
+        self.assertEqual(sum(series['count'] for series in summary['kartograafr_http_request_duration_seconds']),
+                         PAGE_COUNT + 2)
+        self.assertGreater(summary['kartograafr_http_response_bytes_total'][0]['value'], 0)
+
+    def test_pages_decoded_once(self):
+        api = RequestsPlus(self.baseURL)
+        collection = api.responseCollection(api.get('/numbered')).collectAllResponsePages()
+
+        with mock.patch.object(responseCollectionModule, 'decodeResponseJSON',
+                               wraps=responseCollectionModule.decodeResponseJSON) as decodeResponseJSON:
+            self.assertEqual([item['id'] for item in collection.json()], self.expectedIDs())
+            self.assertEqual([item.id for item in collection.jsonObjects()], self.expectedIDs())
+            self.assertEqual(decodeResponseJSON.call_count, PAGE_COUNT)
+
+    def test_json_objects_with_object_hook(self):
+        api = RequestsPlus(self.baseURL)
+        collection = api.responseCollection(api.get('/numbered'))
+        objects = collection.jsonObjects(object_hook=lambda jsonObject: tuple(jsonObject.values()))
+        self.assertEqual(objects, [(10,), (11,), (12,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import socket
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from RequestsPlus import RequestsPlus, RetryPolicy
+
+
+# Fail or throttle the first requests for each path, then succeed.
+class FlakyHandler(BaseHTTPRequestHandler):
+    failuresLeft = {}
+    throttlesLeft = {}
+    requestCount = 0
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self):
+        FlakyHandler.requestCount += 1
+        failuresLeft = FlakyHandler.failuresLeft.get(self.path, 0)
+        FlakyHandler.failuresLeft[self.path] = failuresLeft - 1
+        throttlesLeft = FlakyHandler.throttlesLeft.get(self.path, 0)
+        FlakyHandler.throttlesLeft[self.path] = throttlesLeft - 1
+        body = b'[]'
+        if failuresLeft > 0:
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+        elif throttlesLeft > 0:
+            body = b'403 Forbidden (Rate Limit Exceeded)'
+            self.send_response(403)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = respond
+    do_POST = respond
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.baseURL = 'http://127.0.0.1:{}/api/v1'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FlakyHandler.failuresLeft = {}
+        FlakyHandler.throttlesLeft = {}
+        FlakyHandler.requestCount = 0
+
+    def test_get_retried_until_ok(self):
+        FlakyHandler.failuresLeft['/api/v1/courses'] = 2
+        retryPolicy = RetryPolicy(baseDelay=0.01)
+
+        response = RequestsPlus(self.baseURL, retryPolicy=retryPolicy).get('/courses')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(retryPolicy.getStats(), {'retries': 2, 'retriesRefused': 0, 'throttledRetries': 0})
+
+    def test_attempts_limited(self):
+        FlakyHandler.failuresLeft['/api/v1/courses'] = 5
+
+        with self.assertRaises(RuntimeError):
+            RequestsPlus(self.baseURL, retryPolicy=RetryPolicy(maxAttempts=3, baseDelay=0.01)).get('/courses')
+        self.assertEqual(FlakyHandler.requestCount, 3)
+
+    def test_budget_shared_by_requests(self):
+        FlakyHandler.failuresLeft['/api/v1/a'] = 1
+        FlakyHandler.failuresLeft['/api/v1/b'] = 1
+        retryPolicy = RetryPolicy(baseDelay=0.01, retryBudget=1)
+        api = RequestsPlus(self.baseURL, retryPolicy=retryPolicy)
+
+        self.assertEqual(api.get('/a').status_code, 200)
+        with self.assertRaises(RuntimeError):
+            api.get('/b')
+        self.assertEqual(retryPolicy.getStats(), {'retries': 1, 'retriesRefused': 1, 'throttledRetries': 0})
+
+    def test_post_not_retried(self):
+        FlakyHandler.failuresLeft['/api/v1/courses'] = 1
+
+        response = RequestsPlus(self.baseURL, retryPolicy=RetryPolicy(baseDelay=0.01)).post('/courses')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(FlakyHandler.requestCount, 1)
+
+    def test_connection_error_retried(self):
+        unusedSocket = socket.socket()
+        unusedSocket.bind(('127.0.0.1', 0))
+        closedURL = 'http://127.0.0.1:{}/api/v1'.format(unusedSocket.getsockname()[1])
+        unusedSocket.close()
+        retryPolicy = RetryPolicy(maxAttempts=2, baseDelay=0.01)
+
+        with self.assertRaises(RuntimeError):
+            RequestsPlus(closedURL, retryPolicy=retryPolicy).get('/courses')
+        self.assertEqual(retryPolicy.getStats()['retries'], 1)
+
+    def test_throttled_requests_not_taken_from_budget(self):
+        FlakyHandler.failuresLeft['/api/v1/a'] = 1
+        FlakyHandler.throttlesLeft['/api/v1/b'] = 3
+        FlakyHandler.throttlesLeft['/api/v1/graphql'] = 1
+        retryPolicy = RetryPolicy(baseDelay=0.01, retryBudget=1, maxThrottledAttempts=4)
+        api = RequestsPlus(self.baseURL, retryPolicy=retryPolicy)
+
+        self.assertEqual(api.get('/a').status_code, 200)
+        # The budget is used up, but throttled requests are still retried, even POSTs.
+        self.assertEqual(api.get('/b').status_code, 200)
+        self.assertEqual(api.post('/graphql').status_code, 200)
+        self.assertEqual(retryPolicy.getStats(), {'retries': 1, 'retriesRefused': 0, 'throttledRetries': 4})
+
+    def test_throttled_attempts_limited(self):
+        FlakyHandler.throttlesLeft['/api/v1/courses'] = 5
+
+        with self.assertRaises(RuntimeError):
+            RequestsPlus(self.baseURL, retryPolicy=RetryPolicy(baseDelay=0.01, maxThrottledAttempts=3)).get('/courses')
+        self.assertEqual(FlakyHandler.requestCount, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import syncState
+from syncState import SyncState
+
+
+class SyncStateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.databasePath = os.path.join(self.directory, 'state', 'sync-state.sqlite')
+        self.syncState = SyncState(self.databasePath)
+
+    def tearDown(self):
+        self.syncState.close()
+        shutil.rmtree(self.directory)
+
+    def test_schema_versioned(self):
+        connection = sqlite3.connect(self.databasePath)
+        self.assertEqual(connection.execute('PRAGMA user_version').fetchone()[0], syncState.SCHEMA_VERSION)
+        connection.close()
+
+        # Opening again doesn't migrate again.
+        SyncState(self.databasePath).close()
+
+    def test_schema_migrated(self):
+        databasePath = os.path.join(self.directory, 'old-sync-state.sqlite')
+        connection = sqlite3.connect(databasePath)
+        connection.executescript(syncState._SCHEMA_MIGRATIONS[0] + 'PRAGMA user_version = 1;')
+        connection.execute("INSERT INTO assignment_groups VALUES (1, 10, 'abc', 't', 111, '[\"a\"]', 0, 'synced')")
+        connection.commit()
+        connection.close()
+
+        oldState = SyncState(databasePath)
+        state = oldState.getAssignmentState(1, 10)
+        oldState.close()
+        self.assertEqual((state.members, state.usersNotAdded), ({'a'}, set()))
+
+    def test_assignment_state(self):
+        self.assertIsNone(self.syncState.getAssignmentState(1, 10))
+
+        self.syncState.putAssignmentState(1, 10, 'abc', 'Geo_1_Map_10', 111, ['b', 'a'], 'synced')
+        state = self.syncState.getAssignmentState(1, 10)
+        self.assertEqual((state.groupID, state.groupModified, state.members, state.outcome),
+                         ('abc', 111, {'a', 'b'}, 'synced'))
+
+        self.syncState.putAssignmentState(1, 10, 'abc', 'Geo_1_Map_10', 222, None, 'failed')
+        self.assertIsNone(self.syncState.getAssignmentState(1, 10).members)
+
+        self.syncState.putAssignmentState(1, 10, 'abc', 'Geo_1_Map_10', 333, ['a'], 'notAddable', ['c'])
+        state = self.syncState.getAssignmentState(1, 10)
+        self.assertEqual((state.members, state.usersNotAdded, state.outcome), ({'a'}, {'c'}, 'notAddable'))
+
+    def test_state_describes_group(self):
+        self.syncState.putAssignmentState(1, 10, 'abc', 'Geo_1_Map_10', 111, ['a'], 'synced')
+        state = self.syncState.getAssignmentState(1, 10)
+
+        self.assertTrue(state.describesGroup('abc', 111))
+        self.assertFalse(state.describesGroup('def', 111))
+        # Modified by the update that recorded the state, or by someone else later.
+        self.assertTrue(state.describesGroup('abc', int(state.syncedAt * 1000) - 1))
+        self.assertFalse(state.describesGroup('abc', int(state.syncedAt * 1000) + 60000))
+        self.assertFalse(state.describesGroup('abc', None))
+
+    def test_remove_other_assignments(self):
+        for (courseID, assignmentID) in ((1, 10), (1, 11), (2, 20)):
+            self.syncState.putAssignmentState(courseID, assignmentID, 'g', 't', None, [], 'synced')
+
+        self.assertEqual(self.syncState.removeOtherAssignments([1], [10]), 1)
+        self.assertIsNone(self.syncState.getAssignmentState(1, 11))
+        self.assertIsNotNone(self.syncState.getAssignmentState(2, 20))
+
+    def test_failed_transaction_rolled_back(self):
+        with self.assertRaises(sqlite3.Error):
+            self.syncState._transaction([
+                ('INSERT INTO runs (started_at, status, full_resync) VALUES (?, ?, ?)', (0, 'running', 0)),
+                ('INSERT INTO no_such_table VALUES (?)', (1,)),
+            ])
+        self.assertEqual(self.syncState.getRecentRuns(), [])
+
+    def test_run_history(self):
+        firstRunID = self.syncState.startRun()
+        secondRunID = self.syncState.startRun(fullResync=True)
+        self.syncState.finishRun(secondRunID, {'synced': 2, 'skipped': 3})
+
+        (secondRun, firstRun) = self.syncState.getRecentRuns()
+        self.assertEqual((firstRun['runID'], firstRun['status']), (firstRunID, syncState.RUN_STATUS_INTERRUPTED))
+        self.assertEqual(secondRun['status'], syncState.RUN_STATUS_FINISHED)
+        self.assertTrue(secondRun['fullResync'])
+        self.assertEqual(secondRun['outcomeCounts'], {'synced': 2, 'skipped': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 import util
 
@@ -28,3 +30,37 @@ class WidgetTestCase(unittest.TestCase):
     def test_darn_long_string(self):
         answer = util.elideString("Return version of string with the middle removed.  This allows identifying")
         self.assertEqual(answer,"Ret...ing")
+
+    def test_chunk_list(self):
+        self.assertEqual(util.chunkList([1, 2, 3, 4, 5], 2), [[1, 2], [3, 4], [5]])
+        self.assertEqual(util.chunkList([1, 2, 3], None), [[1, 2, 3]])
+        self.assertEqual(util.chunkList([], 2), [])
+
+    def test_map_concurrently_keeps_order(self):
+        # Later items finish first.
+        results = util.mapConcurrently(lambda item: time.sleep(0.01 * (5 - item)) or item * 10, range(5),
+                                       workerCount=5)
+        self.assertEqual(results, [(item, item * 10, None) for item in range(5)])
+
+    def test_map_concurrently_captures_exceptions(self):
+        def function(item):
+            if item == 2:
+                raise ValueError(item)
+            return item
+
+        for workerCount in (1, 3):
+            results = util.mapConcurrently(function, [1, 2, 3], workerCount=workerCount)
+            self.assertEqual([(item, result) for (item, result, _) in results], [(1, 1), (2, None), (3, 3)])
+            self.assertIsInstance(results[1][2], ValueError)
+            self.assertEqual([exception for (_, _, exception) in (results[0], results[2])], [None, None])
+
+    def test_map_concurrently_serial(self):
+        for workerCount in (None, 0, 1):
+            threads = []
+            util.mapConcurrently(lambda item: threads.append(threading.current_thread()), range(3),
+                                 workerCount=workerCount)
+            self.assertEqual(threads, [threading.current_thread()] * 3)
+
+        threads = set()
+        util.mapConcurrently(lambda item: threads.add(threading.current_thread()), range(3), workerCount=3)
+        self.assertNotIn(threading.current_thread(), threads)
@@ -10,6 +10,8 @@ logger = logging.getLogger(__name__)
 
 import sys
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import StringIO
 
 # Method names are now hard-coded so this is a no-op.
@@ -33,6 +35,64 @@ def stringContainsAllCharacters(string, characters):
     return False not in [character in string for character in characters]
 
 
+# While set, threads of mapConcurrently() call workerCallWrapper(function, item) instead of function(item),
+# e.g. to profile each call in its thread.
+workerCallWrapper = None
+
+
+def _callCapturingException(function, item):
+    try:
+        return item, function(item), None
+    except Exception as exception:
+        return item, None, exception
+
+
+def mapConcurrently(function, items, workerCount=1):
+    """
+    Call 'function' once for each of 'items', using up to 'workerCount' threads
+    at the same time.  Exceptions are caught separately for each item, so one
+    failure doesn't prevent the remaining items from being processed.
+
+    :param function: Function taking a single item as its argument
+    :type function: callable
+    :param items: Items to be passed to the function
+    :type items: Any iterable
+    :param workerCount: Maximum number of threads to use.  1 or less calls the function serially.
+    :type workerCount: int
+    :return: (item, result, exception) for each item, in the same order as 'items'.
+        Either result or exception will be None.
+    :rtype: list of tuple
+    """
+    items = list(items)
+
+    if workerCount is None or workerCount <= 1 or len(items) <= 1:
+        return [_callCapturingException(function, item) for item in items]
+
+    if workerCallWrapper is not None:
+        function = partial(workerCallWrapper, function)
+
+    with ThreadPoolExecutor(max_workers=min(workerCount, len(items))) as executor:
+        futures = [executor.submit(_callCapturingException, function, item) for item in items]
+
+    return [future.result() for future in futures]
+
+
+def chunkList(items, chunkSize):
+    """
+    Split 'items' into lists of at most 'chunkSize' items, in order.
+
+    :param items: Items to be split
+    :type items: list
+    :param chunkSize: Most items in each chunk.  None or less than 1 keeps all items in one chunk.
+    :type chunkSize: int
+    :return: The chunks
+    :rtype: list of list
+    """
+    if chunkSize is None or chunkSize < 1:
+        return [list(items)] if items else []
+    return [items[start:start + chunkSize] for start in range(0, len(items), chunkSize)]
+
+
 def formatNameAndID(objectA):
      return '"{}" ({})'.format(objectA.title, objectA.id)
 